@@ -1,5 +1,4 @@
 import streamlit as st
-import requests
 import pandas as pd
 import numpy as np
 import plotly.express as px
@@ -9,8 +8,38 @@ from datetime import datetime, timedelta
 import matplotlib.pyplot as plt
 import seaborn as sns
 from collections import Counter
+from functools import partial
 import json
 
+from meteo.alerts import generate_recommendations, generate_weather_alerts, get_aqi_label
+from meteo.aqi import NAMES as POLLUTANT_NAMES, STANDARDS, US_EPA, aqi_label, category, compute_aqi
+from meteo.anomaly import anomaly_alerts
+from meteo.batcher import default_batcher
+from meteo.client import default_client
+from meteo.climatology import default_climatology
+from meteo.compare import (
+    RADAR_CATEGORIES, city_conditions, comparison_frame, radar_values, record_conditions
+)
+from meteo.correction import default_corrections
+from meteo.derived import DERIVED, TEMPERATURES
+from meteo.cpuprofile import (
+    MODES as PROFILE_MODES, admin_allowed, collapsed, default_cpu_profiler, render_flamegraph, requested_mode,
+    top_functions,
+)
+from meteo.grid import MAX_SPAN_DEG, TILE_DEG, VARIABLES, BBox, default_sampler
+from meteo.ingest import default_partitions
+from meteo.live import DEFAULT_INTERVAL, MIN_INTERVAL, default_poller
+from meteo.paging import COLUMNS as EXPLORER_COLUMNS, Table, export_rows, fetch_page, mask, materialize
+from meteo.session import (
+    COMPARE_SIZE, FAVORITES_SIZE, SEARCH_HISTORY_SIZE, BoundedOrderedSet, default_profiler, release
+)
+from meteo.store import default_store
+from meteo.units import convert_temp, get_temp_symbol
+from meteo.workers import default_pool
+from meteo.theme import (
+    THEME_COLOR, DARK_BG, TEXT_PRIMARY, ACCENT_COLOR, SUCCESS_COLOR, WARNING_COLOR
+)
+
 # ------------------ SETTINGS & THEME ------------------
 st.set_page_config(
     page_title="Weather Analytics Dashboard",
@@ -19,24 +48,26 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Initialize session state for history tracking
+# Memory checkpoints of this run (no-op unless profiling is enabled)
+mem_run = default_profiler().begin_run()
+# CPU profile of this run (?profile=sample|cprofile or the sidebar toggle; no-op otherwise)
+cpu_run = default_cpu_profiler().begin_run(requested_mode(st.query_params, st.session_state.get('cpu_profile')),
+                                           root=__file__)
+
+# Initialize session state for history tracking (capped, de-duplicated, O(1) lookups)
 if 'search_history' not in st.session_state:
-    st.session_state.search_history = []
+    st.session_state.search_history = BoundedOrderedSet(SEARCH_HISTORY_SIZE)
 if 'favorite_cities' not in st.session_state:
-    st.session_state.favorite_cities = []
+    st.session_state.favorite_cities = BoundedOrderedSet(FAVORITES_SIZE)
 if 'temp_unit' not in st.session_state:
     st.session_state.temp_unit = 'Celsius'
+if 'aqi_standard' not in st.session_state:
+    st.session_state.aqi_standard = US_EPA.name
 if 'compare_cities' not in st.session_state:
-    st.session_state.compare_cities = []
-
-# Custom Theme Colors
-THEME_COLOR = "#00d4ff"
-DARK_BG = "#0a0e27"
-CARD_BG = "#1a1f3a"
-TEXT_PRIMARY = "#ffffff"
-ACCENT_COLOR = "#ff6b9d"
-SUCCESS_COLOR = "#00ff88"
-WARNING_COLOR = "#ff9500"
+    st.session_state.compare_cities = BoundedOrderedSet(COMPARE_SIZE)
+if 'explorer_cursor' not in st.session_state:
+    st.session_state.explorer_cursor = (None, None)
+    st.session_state.explorer_query = None
 
 # ------------------ CUSTOM CSS ------------------
 st.markdown(f"""
@@ -388,141 +419,140 @@ st.markdown(f"""
 """, unsafe_allow_html=True)
 
 # ------------------ API UTILITIES ------------------
-API_KEY = "67b92f0af5416edbfe58458f502b0a31"
+def fetch_comparison(cities):
+    """Current weather and air quality per city; current weather is batched into group requests"""
+    client = default_client()
+    bundles = {}
+    for city, current in default_batcher().current_many(cities).items():
+        if current is None:
+            continue
+        try:
+            pollution = client.pollution_at(current['coord']['lat'], current['coord']['lon'])
+        except Exception as e:
+            st.error(f"Error fetching data: {e}")
+            pollution = {}
+        bundles[city] = {"current": current, "pollution": pollution}
+    return bundles
 
-def celsius_to_fahrenheit(celsius):
-    """Convert Celsius to Fahrenheit"""
-    return (celsius * 9/5) + 32
+def load_city(city):
+    """Processed, compactly stored forecast record for a city"""
+    return default_store().get(city, on_error=lambda e: st.error(f"Error fetching data: {e}"))
 
-def convert_temp(temp, unit):
-    """Convert temperature based on selected unit"""
-    if unit == 'Fahrenheit':
-        return celsius_to_fahrenheit(temp)
-    return temp
+def set_explorer_cursor(direction, cursor):
+    st.session_state.explorer_cursor = (direction, cursor)
 
-def get_temp_symbol(unit):
-    """Get temperature symbol"""
-    return '°F' if unit == 'Fahrenheit' else '°C'
+def explorer_export(table, keep, sort_by, descending, columns, unit, fmt):
+    """Every row matching the Data Explorer filters, serialized in chunks"""
+    chunks = []
+    for chunk in export_rows(table, keep, sort_by, descending, columns):
+        for name in TEMPERATURES:
+            if name in chunk:
+                chunk[name] = convert_temp(chunk[name], unit)
+        chunks.append(chunk)
+    frame = pd.concat(chunks, ignore_index=True) if chunks else materialize(table, np.empty(0, dtype=np.int64), columns)
+    if fmt == 'csv':
+        return frame.to_csv(index=False).encode('utf-8')
+    return frame.to_json(orient='records', date_format='iso')
 
-def fetch_weather_data(city):
-    """Unified data fetching"""
-    curr_url = f"https://api.openweathermap.org/data/2.5/weather?q={city}&appid={API_KEY}&units=metric"
-    fore_url = f"https://api.openweathermap.org/data/2.5/forecast?q={city}&appid={API_KEY}&units=metric"
-    
-    try:
-        curr_res = requests.get(curr_url).json()
-        fore_res = requests.get(fore_url).json()
-        
-        if curr_res.get("cod") != 200:
-            return None
-            
-        lat, lon = curr_res['coord']['lat'], curr_res['coord']['lon']
-        
-        # Air Pollution
-        poll_url = f"http://api.openweathermap.org/data/2.5/air_pollution?lat={lat}&lon={lon}&appid={API_KEY}"
-        poll_res = requests.get(poll_url).json()
-        
-        return {
-            "current": curr_res,
-            "forecast": fore_res,
-            "pollution": poll_res
-        }
-    except Exception as e:
-        st.error(f"Error fetching data: {e}")
-        return None
+# ------------------ LIVE CONDITIONS ------------------
+def render_kpi_cards(cw, poll):
+    """Current-condition KPI cards"""
+    temp_symbol = get_temp_symbol(st.session_state.temp_unit)
+    current_temp = convert_temp(cw['main']['temp'], st.session_state.temp_unit)
+    feels_like_temp = convert_temp(cw['main']['feels_like'], st.session_state.temp_unit)
+    
+    kpi1, kpi2, kpi3, kpi4, kpi5 = st.columns(5)
 
-# ------------------ ANALYTICS ENGINE ------------------
-def process_forecast(forecast_data):
-    """Convert raw forecast to meaningful pandas analysis"""
-    rows = []
-    for item in forecast_data['list']:
-        rows.append({
-            "timestamp": datetime.fromtimestamp(item['dt']),
-            "temp": item['main']['temp'],
-            "feels_like": item['main']['feels_like'],
-            "humidity": item['main']['humidity'],
-            "pressure": item['main']['pressure'],
-            "wind_speed": item['wind']['speed'],
-            "clouds": item['clouds']['all'],
-            "weather": item['weather'][0]['main'],
-            "description": item['weather'][0]['description']
-        })
-    df = pd.DataFrame(rows)
-    df['date'] = df['timestamp'].dt.date
-    df['hour'] = df['timestamp'].dt.hour
-    return df
+    with kpi1:
+        st.markdown(f"""
+        <div class='metric-card'>
+            <div class='kpi-label'>Temperature</div>
+            <div class='kpi-value'>{current_temp:.1f}{temp_symbol}</div>
+            <div class='kpi-subtitle' style='color:{SUCCESS_COLOR};'>Feels like {feels_like_temp:.1f}{temp_symbol}</div>
+        </div>
+        """, unsafe_allow_html=True)
 
-def get_aqi_label(aqi):
-    labels = {
-        1: ("Good", SUCCESS_COLOR),
-        2: ("Fair", "#a3e635"),
-        3: ("Moderate", WARNING_COLOR),
-        4: ("Poor", "#fb923c"),
-        5: ("Very Poor", ACCENT_COLOR)
-    }
-    return labels.get(aqi, ("Unknown", "#888"))
+    with kpi2:
+        status, color = get_aqi_label(poll['main']['aqi']) if poll else ("N/A", "#888")
+        st.markdown(f"""
+        <div class='metric-card'>
+            <div class='kpi-label'>Air Quality</div>
+            <div class='kpi-value'>{poll['main']['aqi'] if poll else '--'}</div>
+            <div class='status-badge' style='background:{color}; color:#000'>{status}</div>
+        </div>
+        """, unsafe_allow_html=True)
 
-def generate_weather_alerts(cw, poll):
-    """Generate weather alerts based on conditions"""
-    alerts = []
-    
-    # Temperature alerts
-    temp = cw['main']['temp']
-    if temp > 35:
-        alerts.append(("⚠️ Extreme Heat Warning", f"Temperature is {temp}°C. Stay hydrated and avoid outdoor activities.", "danger"))
-    elif temp < 5:
-        alerts.append(("❄️ Cold Weather Alert", f"Temperature is {temp}°C. Dress warmly and protect against frostbite.", "warning"))
-    
-    # Wind alerts
-    wind_speed = cw['wind']['speed']
-    if wind_speed > 15:
-        alerts.append(("💨 High Wind Advisory", f"Wind speed is {wind_speed} m/s. Secure loose objects.", "warning"))
-    
-    # Humidity alerts
-    humidity = cw['main']['humidity']
-    if humidity > 85:
-        alerts.append(("💧 High Humidity Alert", f"Humidity is {humidity}%. May feel uncomfortable.", "warning"))
-    
-    # Air quality alerts
-    if poll:
-        aqi = poll['main']['aqi']
-        if aqi >= 4:
-            alerts.append(("🏭 Poor Air Quality", "Air quality is poor. Limit outdoor exposure and wear a mask.", "danger"))
-        elif aqi == 3:
-            alerts.append(("🌫️ Moderate Air Quality", "Air quality is moderate. Sensitive groups should limit prolonged outdoor activities.", "warning"))
-    
-    return alerts
+    with kpi3:
+        st.markdown(f"""
+        <div class='metric-card'>
+            <div class='kpi-label'>Humidity</div>
+            <div class='kpi-value'>{cw['main']['humidity']}%</div>
+            <div class='kpi-subtitle' style='color:{THEME_COLOR};'>Pressure: {cw['main']['pressure']} hPa</div>
+        </div>
+        """, unsafe_allow_html=True)
 
-def generate_recommendations(cw, df, poll):
-    """Generate personalized recommendations"""
-    recommendations = []
-    temp = cw['main']['temp']
-    weather = cw['weather'][0]['main']
-    
-    # Clothing recommendations
-    if temp > 25:
-        recommendations.append(("👕 Clothing", "Light, breathable clothing recommended. Don't forget sunscreen!"))
-    elif temp < 15:
-        recommendations.append(("🧥 Clothing", "Warm layers recommended. Consider a jacket or coat."))
-    else:
-        recommendations.append(("👔 Clothing", "Comfortable casual wear. A light jacket might be useful."))
-    
-    # Activity recommendations
-    if weather in ['Clear', 'Clouds'] and temp > 15 and temp < 30:
-        recommendations.append(("🏃 Activities", "Perfect weather for outdoor activities! Great for jogging, cycling, or picnics."))
-    elif weather == 'Rain':
-        recommendations.append(("☔ Activities", "Indoor activities recommended. Carry an umbrella if going out."))
-    
-    # Best time to go out
-    best_hour = df.loc[df['temp'].idxmax()]
-    worst_hour = df.loc[df['temp'].idxmin()]
-    recommendations.append((
-        "⏰ Best Time", 
-        f"Warmest at {best_hour['timestamp'].strftime('%I:%M %p')} ({best_hour['temp']:.1f}°C), "
-        f"Coolest at {worst_hour['timestamp'].strftime('%I:%M %p')} ({worst_hour['temp']:.1f}°C)"
+    with kpi4:
+        st.markdown(f"""
+        <div class='metric-card'>
+            <div class='kpi-label'>Wind Speed</div>
+            <div class='kpi-value'>{cw['wind']['speed']} <span style='font-size:0.9rem'>m/s</span></div>
+            <div class='kpi-subtitle' style='color:rgba(255,255,255,0.5);'>Direction: {cw['wind'].get('deg', 'N/A')}°</div>
+        </div>
+        """, unsafe_allow_html=True)
+
+    with kpi5:
+        weather_emoji = '☀️' if cw['weather'][0]['main'] == 'Clear' else '☁️' if cw['weather'][0]['main'] == 'Clouds' else '🌧️' if cw['weather'][0]['main'] == 'Rain' else '⛈️' if cw['weather'][0]['main'] == 'Thunderstorm' else '🌫️' if cw['weather'][0]['main'] == 'Mist' else '🌦️'
+        st.markdown(f"""
+        <div class='metric-card'>
+            <div class='kpi-label'>Conditions</div>
+            <div style='font-size:1.8rem; line-height:1; margin:6px 0; text-align:center;'>{weather_emoji}</div>
+            <div class='kpi-subtitle' style='color:rgba(255,255,255,0.7); text-align:center;'>{cw['weather'][0]['description'].title()}</div>
+        </div>
+        """, unsafe_allow_html=True)
+
+
+def render_live_trace(snapshots):
+    """Compact trace of the observations received while live mode is on"""
+    temp_symbol = get_temp_symbol(st.session_state.temp_unit)
+    times = [datetime.fromtimestamp(s.observed_at) for s in snapshots]
+    fig = go.Figure(go.Scatter(
+        x=times,
+        y=[convert_temp(s.current['main']['temp'], st.session_state.temp_unit) for s in snapshots],
+        mode='lines+markers',
+        line=dict(color=THEME_COLOR, width=2),
+        hovertemplate=f'<b>Observed</b>: %{{y:.1f}}{temp_symbol}<br>%{{x}}<extra></extra>'
     ))
-    
-    return recommendations
+    fig.update_layout(
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+        font=dict(color=TEXT_PRIMARY),
+        margin=dict(l=0, r=0, t=10, b=0),
+        height=180,
+        xaxis=dict(gridcolor='rgba(255,255,255,0.05)'),
+        yaxis=dict(gridcolor='rgba(255,255,255,0.05)', title=temp_symbol)
+    )
+    st.plotly_chart(fig, use_container_width=True)
+
+
+def live_conditions(city, record, live, interval):
+    """KPI cards that, in live mode, refresh on their own without rerunning the page"""
+    def panel():
+        cw = record.current
+        snapshots = []
+        if live:
+            poller = default_poller()
+            poller.watch(city, interval, seed=record.current)
+            snapshots = poller.since(city)
+            if snapshots and snapshots[-1].observed_at > cw['dt']:
+                cw = snapshots[-1].current
+        render_kpi_cards(cw, record.pollution)
+        if live:
+            observed = datetime.fromtimestamp(cw['dt']).strftime('%H:%M:%S')
+            st.caption(f"🟢 Live • observed {observed} • checking every {interval:.0f}s")
+            if len(snapshots) > 1:
+                render_live_trace(snapshots)
+    
+    st.fragment(panel, run_every=interval if live else None)()
 
 # ------------------ SIDEBAR ------------------
 with st.sidebar:
@@ -535,6 +565,9 @@ with st.sidebar:
     
     # Temperature Unit Toggle
     st.session_state.temp_unit = st.radio("🌡️ Temperature Unit", ["Celsius", "Fahrenheit"], horizontal=True)
+    st.session_state.aqi_standard = st.radio(
+        "🏭 AQI Standard", list(STANDARDS), format_func=lambda k: STANDARDS[k].label, horizontal=True
+    )
     
     st.divider()
     
@@ -567,7 +600,7 @@ with st.sidebar:
     
     if city_input and city_input not in st.session_state.favorite_cities:
         if st.button("⭐ Add to Favorites", use_container_width=True):
-            st.session_state.favorite_cities.append(city_input)
+            st.session_state.favorite_cities.add(city_input)
             st.rerun()
     
     st.divider()
@@ -579,7 +612,7 @@ with st.sidebar:
         compare_city = st.text_input("Add city to compare", placeholder="Enter another city...")
         if compare_city and st.button("Add to Comparison"):
             if compare_city not in st.session_state.compare_cities:
-                st.session_state.compare_cities.append(compare_city)
+                st.session_state.compare_cities.add(compare_city)
                 st.rerun()
         
         if st.session_state.compare_cities:
@@ -594,9 +627,17 @@ with st.sidebar:
                         st.rerun()
             
             if st.button("🗑️ Clear All Comparison", use_container_width=True):
-                st.session_state.compare_cities = []
+                st.session_state.compare_cities.clear()
                 st.rerun()
     
+    st.divider()
+    
+    # Live mode: only the condition cards refresh, on their own timer
+    st.markdown("📡 **Live Mode**")
+    live_mode = st.toggle("Auto-refresh current conditions")
+    live_interval = st.number_input("Refresh every (seconds)", min_value=int(MIN_INTERVAL), max_value=600,
+                                    value=int(DEFAULT_INTERVAL), step=15, disabled=not live_mode)
+    
     st.divider()
     st.info("🔍 System Status: Connected to OpenWeather API")
     
@@ -605,6 +646,44 @@ with st.sidebar:
         with st.expander("📜 Recent Searches"):
             for hist in st.session_state.search_history[-5:]:
                 st.caption(f"• {hist}")
+    
+    # Memory by stage over recent reruns (enabled with METEO_MEMPROFILE=1)
+    profiler = default_profiler()
+    if profiler.enabled and profiler.last():
+        with st.expander("🧠 Memory Profile"):
+            last_profile = profiler.last()
+            st.caption("Traced memory by stage, last completed run")
+            st.dataframe(pd.DataFrame(last_profile['stages']), hide_index=True, use_container_width=True)
+            st.caption(f"Traced MB after each of the last {len(profiler.trend())} runs (flat = steady state)")
+            st.line_chart(profiler.trend(), height=120)
+            if last_profile['growth']:
+                st.caption("Largest allocation changes since the previous run")
+                st.dataframe(pd.DataFrame(last_profile['growth']), hide_index=True, use_container_width=True)
+
+    # Recent CPU profiles (hidden unless ?profile_key matches when METEO_PROFILE_KEY is set)
+    if admin_allowed(st.query_params):
+        with st.expander("🔬 CPU Profiler"):
+            st.selectbox("Profile reruns", ["Off", *PROFILE_MODES], key='cpu_profile',
+                         help="Applies from the next rerun; 'sample' is cheap, 'cprofile' is exact but slower")
+            cpu_profiles = default_cpu_profiler().recent()
+            if cpu_profiles:
+                by_id = {p.id: p for p in cpu_profiles}
+                chosen = by_id[st.selectbox(
+                    "Profile", list(by_id),
+                    format_func=lambda i: f"{datetime.fromtimestamp(by_id[i].started).strftime('%H:%M:%S')} · "
+                                          f"{by_id[i].label} · {by_id[i].mode} · {by_id[i].elapsed_ms:.0f} ms")]
+                st.dataframe(pd.DataFrame(top_functions(chosen.stacks, 10)), hide_index=True, use_container_width=True)
+                st.download_button("📥 Flamegraph (HTML)",
+                                   data=partial(render_flamegraph, chosen.stacks, f"{chosen.label} ({chosen.mode})", chosen.unit),
+                                   file_name=f"flamegraph_{chosen.id}.html", mime='text/html')
+                st.download_button("📥 Collapsed stacks", data=partial(collapsed, chosen.stacks),
+                                   file_name=f"stacks_{chosen.id}.txt", mime='text/plain')
+                if chosen.stats is not None:
+                    st.download_button("📥 cProfile dump (.prof)", data=chosen.stats,
+                                       file_name=f"profile_{chosen.id}.prof", mime='application/octet-stream')
+            else:
+                st.caption("No profiles yet: turn profiling on, or add ?profile=sample to the URL")
+    mem_run.mark("sidebar")
 
 # ------------------ HEADER ------------------
 st.markdown("<div style='height: 30px;'></div>", unsafe_allow_html=True)
@@ -617,24 +696,23 @@ st.markdown("<div style='margin-bottom: 25px;'></div>", unsafe_allow_html=True)
 
 # ------------------ DATA FETCHING ------------------
 if city_input:
-    # Add to search history
-    if city_input not in st.session_state.search_history:
-        st.session_state.search_history.append(city_input)
+    # Add to search history (re-searching moves a city to the most recent position)
+    st.session_state.search_history.add(city_input)
     
-    data = fetch_weather_data(city_input)
+    record = load_city(city_input)
+    mem_run.mark("fetch")
     
-    if data:
-        cw = data['current']
-        df = process_forecast(data['forecast'])
-        poll = data['pollution']['list'][0] if data['pollution'].get('list') else None
+    if record:
+        cw = record.current
+        df = record.frame()
+        poll = record.pollution
+        summary = record.summary
         
         # Temperature conversion
         temp_symbol = get_temp_symbol(st.session_state.temp_unit)
-        current_temp = convert_temp(cw['main']['temp'], st.session_state.temp_unit)
-        feels_like_temp = convert_temp(cw['main']['feels_like'], st.session_state.temp_unit)
         
         # ------------------ WEATHER ALERTS ------------------
-        alerts = generate_weather_alerts(cw, poll)
+        alerts = generate_weather_alerts(cw, poll) + anomaly_alerts(record.anomalies)
         if alerts:
             st.markdown("### 🚨 Active Weather Alerts")
             # Display alerts in rows of max 3 columns for better alignment
@@ -660,55 +738,8 @@ if city_input:
         # Wrapper container to prevent cutoff
         st.markdown("<div style='padding: 10px 0;'>", unsafe_allow_html=True)
         
-        kpi1, kpi2, kpi3, kpi4, kpi5 = st.columns(5)
+        live_conditions(city_input, record, live_mode, live_interval)
         
-        with kpi1:
-            st.markdown(f"""
-            <div class='metric-card'>
-                <div class='kpi-label'>Temperature</div>
-                <div class='kpi-value'>{current_temp:.1f}{temp_symbol}</div>
-                <div class='kpi-subtitle' style='color:{SUCCESS_COLOR};'>Feels like {feels_like_temp:.1f}{temp_symbol}</div>
-            </div>
-            """, unsafe_allow_html=True)
-            
-        with kpi2:
-            status, color = get_aqi_label(poll['main']['aqi']) if poll else ("N/A", "#888")
-            st.markdown(f"""
-            <div class='metric-card'>
-                <div class='kpi-label'>Air Quality</div>
-                <div class='kpi-value'>{poll['main']['aqi'] if poll else '--'}</div>
-                <div class='status-badge' style='background:{color}; color:#000'>{status}</div>
-            </div>
-            """, unsafe_allow_html=True)
-            
-        with kpi3:
-            st.markdown(f"""
-            <div class='metric-card'>
-                <div class='kpi-label'>Humidity</div>
-                <div class='kpi-value'>{cw['main']['humidity']}%</div>
-                <div class='kpi-subtitle' style='color:{THEME_COLOR};'>Pressure: {cw['main']['pressure']} hPa</div>
-            </div>
-            """, unsafe_allow_html=True)
-            
-        with kpi4:
-            st.markdown(f"""
-            <div class='metric-card'>
-                <div class='kpi-label'>Wind Speed</div>
-                <div class='kpi-value'>{cw['wind']['speed']} <span style='font-size:0.9rem'>m/s</span></div>
-                <div class='kpi-subtitle' style='color:rgba(255,255,255,0.5);'>Direction: {cw['wind'].get('deg', 'N/A')}°</div>
-            </div>
-            """, unsafe_allow_html=True)
-            
-        with kpi5:
-            weather_emoji = '☀️' if cw['weather'][0]['main'] == 'Clear' else '☁️' if cw['weather'][0]['main'] == 'Clouds' else '🌧️' if cw['weather'][0]['main'] == 'Rain' else '⛈️' if cw['weather'][0]['main'] == 'Thunderstorm' else '🌫️' if cw['weather'][0]['main'] == 'Mist' else '🌦️'
-            st.markdown(f"""
-            <div class='metric-card'>
-                <div class='kpi-label'>Conditions</div>
-                <div style='font-size:1.8rem; line-height:1; margin:6px 0; text-align:center;'>{weather_emoji}</div>
-                <div class='kpi-subtitle' style='color:rgba(255,255,255,0.7); text-align:center;'>{cw['weather'][0]['description'].title()}</div>
-            </div>
-            """, unsafe_allow_html=True)
-
         st.markdown("</div>", unsafe_allow_html=True)  # Close wrapper
 
         st.divider()
@@ -730,14 +761,16 @@ if city_input:
         
         st.divider()
         st.markdown("<div style='margin: 10px 0;'></div>", unsafe_allow_html=True)
+        mem_run.mark("overview")
 
         # ------------------ MAIN TABS ------------------
-        tab1, tab2, tab3, tab4, tab5 = st.tabs([
+        tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs([
             "📈 Forecast Trends", 
             "🌬️ Air Quality", 
             "📊 Statistical Analysis", 
             "📄 Data Explorer",
-            "🔄 City Comparison"
+            "🔄 City Comparison",
+            "🗺️ Regional Map"
         ])
 
         with tab1:
@@ -747,6 +780,12 @@ if city_input:
             df_display = df.copy()
             df_display['temp'] = df_display['temp'].apply(lambda x: convert_temp(x, st.session_state.temp_unit))
             df_display['feels_like'] = df_display['feels_like'].apply(lambda x: convert_temp(x, st.session_state.temp_unit))
+
+            # Derived variables are only computed once picked here (from the Celsius frame)
+            overlays = st.multiselect(
+                "Overlay derived variables", [name for name in DERIVED if name in TEMPERATURES],
+                format_func=lambda name: DERIVED[name].label, placeholder="Dew point, heat index, wind chill..."
+            )
             
             # Interactive Plotly Chart
             fig = go.Figure()
@@ -766,6 +805,59 @@ if city_input:
                 line=dict(color=ACCENT_COLOR, width=2, dash='dot'),
                 hovertemplate=f'<b>Feels Like</b>: %{{y:.1f}}{temp_symbol}<br><b>Time</b>: %{{x}}<extra></extra>'
             ))
+            for name, color in zip(overlays, [SUCCESS_COLOR, WARNING_COLOR, '#a855f7', '#f472b6']):
+                label = DERIVED[name].label
+                fig.add_trace(go.Scatter(
+                    x=df_display['timestamp'],
+                    y=convert_temp(df.met[name], st.session_state.temp_unit),
+                    name=label,
+                    line=dict(color=color, width=2, dash='dash'),
+                    hovertemplate=f'<b>{label}</b>: %{{y:.1f}}{temp_symbol}<extra></extra>'
+                ))
+            
+            # Bias-corrected forecast with uncertainty bands, once enough history is collected
+            epochs = record.forecast.epoch.astype(np.int64)
+            correction = default_corrections().model().correct(
+                city_input,
+                lead_hours=(epochs - record.fetched_at) / 3600.0,
+                hour=(epochs // 3600) % 24,
+                forecast=record.forecast.column('temp')
+            )
+            if correction is not None:
+                corrected, lower, upper = (convert_temp(v, st.session_state.temp_unit) for v in correction)
+                fig.add_trace(go.Scatter(
+                    x=df_display['timestamp'], y=upper, name="Upper band",
+                    line=dict(width=0), showlegend=False, hoverinfo='skip'
+                ))
+                fig.add_trace(go.Scatter(
+                    x=df_display['timestamp'], y=lower, name="80% band",
+                    line=dict(width=0), fill='tonexty', fillcolor='rgba(255, 149, 0, 0.12)', hoverinfo='skip'
+                ))
+                fig.add_trace(go.Scatter(
+                    x=df_display['timestamp'], y=corrected, name="Corrected",
+                    line=dict(color=WARNING_COLOR, width=2),
+                    hovertemplate=f'<b>Corrected</b>: %{{y:.1f}}{temp_symbol}<extra></extra>'
+                ))
+
+            # Climatological normal band (p10-p90) for each slot's date and hour
+            climatology = default_climatology()
+            utc_offset = cw.get('timezone', 0)
+            normals = climatology.normals(city_input, epochs, utc_offset)
+            if normals is not None and np.isfinite(normals).any():
+                p10, p50, p90 = (convert_temp(normals[:, i], st.session_state.temp_unit) for i in range(3))
+                fig.add_trace(go.Scatter(
+                    x=df_display['timestamp'], y=p90, name="Normal p90",
+                    line=dict(width=0), showlegend=False, hoverinfo='skip'
+                ))
+                fig.add_trace(go.Scatter(
+                    x=df_display['timestamp'], y=p10, name="Normal range",
+                    line=dict(width=0), fill='tonexty', fillcolor='rgba(160, 174, 192, 0.15)', hoverinfo='skip'
+                ))
+                fig.add_trace(go.Scatter(
+                    x=df_display['timestamp'], y=p50, name="Normal",
+                    line=dict(color='rgba(160, 174, 192, 0.8)', width=1, dash='dash'),
+                    hovertemplate=f'<b>Normal</b>: %{{y:.1f}}{temp_symbol}<extra></extra>'
+                ))
             
             fig.update_layout(
                 paper_bgcolor='rgba(0,0,0,0)',
@@ -778,14 +870,21 @@ if city_input:
                 legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
             )
             st.plotly_chart(fig, use_container_width=True)
+
+            position = climatology.classify(city_input, cw['dt'], cw['main']['temp'], utc_offset)
+            if position is not None:
+                label, (low, median, high) = position
+                low, median, high = (convert_temp(v, st.session_state.temp_unit) for v in (low, median, high))
+                st.caption(f"Right now it is **{label}** for this date and hour: typical range "
+                           f"{low:.1f}–{high:.1f}{temp_symbol} (median {median:.1f}{temp_symbol}).")
             
             # Mini Insights
             c1, c2, c3 = st.columns(3)
             with c1:
                 st.markdown("#### 📊 Temperature Stats")
-                max_temp = convert_temp(df['temp'].max(), st.session_state.temp_unit)
-                min_temp = convert_temp(df['temp'].min(), st.session_state.temp_unit)
-                avg_temp = convert_temp(df['temp'].mean(), st.session_state.temp_unit)
+                max_temp = convert_temp(summary.temp_max, st.session_state.temp_unit)
+                min_temp = convert_temp(summary.temp_min, st.session_state.temp_unit)
+                avg_temp = convert_temp(summary.temp_mean, st.session_state.temp_unit)
                 st.write(f"• Peak: **{max_temp:.1f}{temp_symbol}**")
                 st.write(f"• Low: **{min_temp:.1f}{temp_symbol}**")
                 st.write(f"• Average: **{avg_temp:.1f}{temp_symbol}**")
@@ -793,13 +892,14 @@ if city_input:
             
             with c2:
                 st.markdown("#### 🌡️ Comfort Index")
-                avg_humidity = df['humidity'].mean()
-                avg_wind = df['wind_speed'].mean()
-                comfort_score = 100 - (abs(avg_temp - 22) * 2) - (abs(avg_humidity - 50) * 0.5)
-                comfort_score = max(0, min(100, comfort_score))
+                # Mean of per-slot scores from apparent temperature and humidity
+                comfort = df.met.comfort
+                comfort_score = float(comfort.mean())
                 
                 st.metric("Comfort Score", f"{comfort_score:.0f}/100")
                 st.progress(comfort_score / 100)
+                st.caption(f"Most comfortable: {df['timestamp'][comfort.idxmax()].strftime('%a %H:%M')} "
+                           f"({comfort.max():.0f}/100)")
                 if comfort_score > 70:
                     st.success("Excellent conditions!")
                 elif comfort_score > 50:
@@ -862,22 +962,38 @@ if city_input:
                 showlegend=False
             )
             st.plotly_chart(hourly_fig, use_container_width=True)
+            
+            # Daily rollups materialized at ingest
+            st.markdown("#### 📅 Daily Outlook")
+            daily_df = record.daily.copy()
+            temp_cols = [c for c in daily_df.columns if c.startswith('temp_')]
+            daily_df[temp_cols] = convert_temp(daily_df[temp_cols], st.session_state.temp_unit)
+            daily_df.index = pd.to_datetime(daily_df.index).strftime('%a %d %b')
+            st.dataframe(
+                daily_df.style.format({
+                    **{c: '{:.1f}' + temp_symbol for c in temp_cols},
+                    'humidity_mean': '{:.0f}%',
+                    'wind_speed_mean': '{:.1f} m/s',
+                    'wind_speed_max': '{:.1f} m/s',
+                    'clouds_mean': '{:.0f}%'
+                }).background_gradient(subset=['temp_max'], cmap='Blues'),
+                use_container_width=True
+            )
 
         with tab2:
             st.subheader("🏭 Pollutant Concentration Analysis")
             if poll:
                 comp = poll['components']
+                standard = STANDARDS[st.session_state.aqi_standard]
+                air = compute_aqi(comp, standard)
+                pollutants = list(air.sub_indices)
+                sub_indices = np.array([air.sub_indices[p] for p in pollutants], dtype=np.float64)
+                labels = [aqi_label(v, standard) for v in sub_indices]
                 poll_df = pd.DataFrame({
-                    "Pollutant": ["CO", "NO₂", "O₃", "SO₂", "PM2.5", "PM10"],
-                    "Concentration (μg/m³)": [
-                        comp.get('co', 0), 
-                        comp.get('no2', 0), 
-                        comp.get('o3', 0), 
-                        comp.get('so2', 0), 
-                        comp.get('pm2_5', 0), 
-                        comp.get('pm10', 0)
-                    ],
-                    "Safe Limit": [10000, 200, 180, 350, 25, 50]  # WHO guidelines (approximate)
+                    "Pollutant": [POLLUTANT_NAMES[p] for p in pollutants],
+                    "Concentration (μg/m³)": [comp[p] for p in pollutants],
+                    "Sub-index": sub_indices,
+                    "Category": [label for label, _ in labels],
                 })
                 
                 col_p1, col_p2 = st.columns([2, 1])
@@ -885,22 +1001,23 @@ if city_input:
                     fig_pol = go.Figure()
                     fig_pol.add_trace(go.Bar(
                         x=poll_df["Pollutant"],
-                        y=poll_df["Concentration (μg/m³)"],
-                        name="Current Level",
-                        marker_color=THEME_COLOR
-                    ))
-                    fig_pol.add_trace(go.Scatter(
-                        x=poll_df["Pollutant"],
-                        y=poll_df["Safe Limit"],
-                        name="Safe Limit",
-                        mode='lines+markers',
-                        line=dict(color=ACCENT_COLOR, dash='dash', width=2)
+                        y=poll_df["Sub-index"],
+                        name=f"{standard.label} sub-index",
+                        marker_color=[color for _, color in labels],
+                        customdata=poll_df[["Concentration (μg/m³)", "Category"]],
+                        hovertemplate='<b>%{x}</b>: %{y:.0f} (%{customdata[1]})<br>%{customdata[0]:.1f} μg/m³<extra></extra>'
                     ))
+                    # Band boundaries of the standard
+                    for (lo, _), (label, color) in zip(standard.index[1:], standard.categories[1:]):
+                        if lo <= max(150, np.nanmax(sub_indices) * 1.2):
+                            fig_pol.add_hline(y=lo, line=dict(color=color, dash='dot', width=1),
+                                              annotation_text=label, annotation_font_color=color,
+                                              annotation_position="top left")
                     fig_pol.update_layout(
                         paper_bgcolor='rgba(0,0,0,0)',
                         plot_bgcolor='rgba(0,0,0,0)',
                         font=dict(color=TEXT_PRIMARY),
-                        yaxis=dict(title="Concentration (μg/m³)", gridcolor='rgba(255,255,255,0.05)'),
+                        yaxis=dict(title=f"{standard.label} sub-index", gridcolor='rgba(255,255,255,0.05)'),
                         xaxis=dict(gridcolor='rgba(255,255,255,0.05)'),
                         legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
                     )
@@ -908,27 +1025,31 @@ if city_input:
                 
                 with col_p2:
                     st.markdown("#### 🎯 AQI Breakdown")
-                    aqi_score = poll['main']['aqi']
-                    st.metric("AQI Level", f"{aqi_score}/5")
-                    st.progress(aqi_score / 5.0)
-                    
-                    status, color = get_aqi_label(aqi_score)
+                    aqi_value = float(air.index)
+                    status, color = aqi_label(aqi_value, standard)
+                    if np.isnan(aqi_value):
+                        st.metric(f"{standard.label} AQI", "N/A")
+                    else:
+                        st.metric(f"{standard.label} AQI", f"{aqi_value:.0f}",
+                                  help=f"Dominant pollutant: {POLLUTANT_NAMES[str(air.dominant)]}")
+                        st.progress(min(aqi_value / 500.0, 1.0))
                     st.markdown(f"**Status:** <span style='color:{color}'>{status}</span>", unsafe_allow_html=True)
+                    ow_status, _ = get_aqi_label(poll['main']['aqi'])
+                    st.caption(f"OpenWeather level: {poll['main']['aqi']}/5 ({ow_status})")
                     
                     st.markdown("#### 📋 Health Recommendations")
-                    if aqi_score <= 2:
+                    band = int(category(aqi_value, standard))
+                    if band < 0:
+                        st.info("Not enough pollutant measurements for a health recommendation.")
+                    elif band <= 1:
                         st.success("✅ Air quality is good. Enjoy outdoor activities!")
-                    elif aqi_score == 3:
+                    elif band == 2:
                         st.warning("⚠️ Sensitive groups should limit prolonged outdoor exposure.")
                     else:
                         st.error("🚨 Everyone should reduce outdoor activities. Wear a mask if going out.")
                 
                 # Pollutant details table
                 st.markdown("#### 📊 Detailed Pollutant Analysis")
-                poll_df['Status'] = poll_df.apply(
-                    lambda row: '✅ Safe' if row['Concentration (μg/m³)'] < row['Safe Limit'] else '⚠️ Elevated',
-                    axis=1
-                )
                 st.dataframe(poll_df, use_container_width=True)
             else:
                 st.info("Air quality data not available for this location.")
@@ -941,7 +1062,7 @@ if city_input:
             with col_s1:
                 # Correlation Matrix - Futuristic HUD Style
                 st.markdown("#### 🔗 Variable Correlations")
-                corr_data = df[['temp', 'humidity', 'pressure', 'wind_speed']].corr()
+                corr_data = default_pool().correlation(df, ['temp', 'humidity', 'pressure', 'wind_speed'])
                 fig_corr = px.imshow(
                     corr_data,
                     text_auto='.2f',
@@ -1052,250 +1173,250 @@ if city_input:
                     margin=dict(l=0, r=0, t=30, b=0),
                     height=350,
                     xaxis=dict(gridcolor='rgba(255,255,255,0.05)', title=dict(text="<b>TIMELINE</b>", font=dict(size=10))),
-                    yaxis=dict(gridcolor='rgba(255,255,255,0.05)', title=dict(text="<b>PRESSURE (hPa)</b>", font=dict(size=10)), range=[df['pressure'].min()-5, df['pressure'].max()+5])
+                    yaxis=dict(gridcolor='rgba(255,255,255,0.05)', title=dict(text="<b>PRESSURE (hPa)</b>", font=dict(size=10)), range=[summary.pressure_min-5, summary.pressure_max+5])
                 )
                 st.plotly_chart(fig_pressure, use_container_width=True)
 
         with tab4:
-            st.subheader("🗂️ Forecast Data Explorer")
-            
+            st.subheader("🗂️ Data Explorer")
+
+            # Pages are computed against the stored columns; only the visible rows reach the browser
+            partitions = default_partitions()
+            sources = ["Forecast"] + (["Stored history"] if partitions.months(city_input) else [])
+            source = st.radio("Source", sources, horizontal=True) if len(sources) > 1 else sources[0]
+            table = (Table.from_record(record) if source == "Forecast"
+                     else Table.from_partitions(partitions, city_input))
+            unit = st.session_state.temp_unit
+            to_unit = {'temp': lambda c: convert_temp(c, unit)}
+
             # Filters
             col_f1, col_f2, col_f3 = st.columns(3)
             with col_f1:
                 search_query = st.text_input("🔍 Filter by description", placeholder="e.g., 'cloudy', 'rain'")
             with col_f2:
-                temp_filter = st.slider(f"Temperature Range ({temp_symbol})", 
-                                       float(convert_temp(df['temp'].min(), st.session_state.temp_unit)), 
-                                       float(convert_temp(df['temp'].max(), st.session_state.temp_unit)),
-                                       (float(convert_temp(df['temp'].min(), st.session_state.temp_unit)), 
-                                        float(convert_temp(df['temp'].max(), st.session_state.temp_unit))))
+                t_lo, t_hi = (float(np.floor(convert_temp(t, unit))) for t in table.bounds('temp'))
+                temp_filter = st.slider(f"Temperature Range ({temp_symbol})", t_lo, t_hi + 1, (t_lo, t_hi + 1))
             with col_f3:
-                weather_filter = st.multiselect("Weather Type", df['weather'].unique(), default=df['weather'].unique())
-            
-            # Apply filters
-            display_df = df.copy()
-            display_df['temp'] = display_df['temp'].apply(lambda x: convert_temp(x, st.session_state.temp_unit))
-            display_df['feels_like'] = display_df['feels_like'].apply(lambda x: convert_temp(x, st.session_state.temp_unit))
-            
-            if search_query:
-                display_df = display_df[display_df['description'].str.contains(search_query, case=False, na=False)]
-            
-            display_df = display_df[
-                (display_df['temp'] >= temp_filter[0]) & 
-                (display_df['temp'] <= temp_filter[1]) &
-                (display_df['weather'].isin(weather_filter))
-            ]
-            
-            # Display styled dataframe
-            st.markdown(f"**Showing {len(display_df)} of {len(df)} records**")
+                weather_types = table.labels('weather')
+                weather_filter = st.multiselect("Weather Type", weather_types, default=weather_types)
+
+            # Sorting, paging and projection
+            col_s1, col_s2, col_s3, col_s4 = st.columns([2, 1, 1, 3])
+            with col_s1:
+                sort_by = st.selectbox("Sort by", [*EXPLORER_COLUMNS, *DERIVED])
+            with col_s2:
+                descending = st.toggle("Descending")
+            with col_s3:
+                page_size = st.selectbox("Rows per page", [25, 50, 100, 250], index=1)
+            with col_s4:
+                visible = st.multiselect("Columns", [*EXPLORER_COLUMNS, *DERIVED],
+                                         default=EXPLORER_COLUMNS) or EXPLORER_COLUMNS
+
+            keep = mask(table, contains={'description': search_query}, ranges={'temp': temp_filter},
+                        labels={'weather': weather_filter}, transform=to_unit)
+
+            # A cursor only makes sense for the query that produced it
+            query = (city_input, source, search_query, temp_filter, tuple(weather_filter), sort_by, descending, page_size)
+            if st.session_state.explorer_query != query:
+                st.session_state.explorer_query = query
+                st.session_state.explorer_cursor = (None, None)
+            direction, cursor = st.session_state.explorer_cursor
+            page = fetch_page(table, keep, sort_by, descending, page_size,
+                              after=cursor if direction == 'next' else None,
+                              before=cursor if direction == 'prev' else None,
+                              columns=visible)
+            page_df = page.frame
+            for name in TEMPERATURES:
+                if name in page_df:
+                    page_df[name] = convert_temp(page_df[name], unit)
+
+            # Display styled page
+            first = page.start + 1 if len(page_df) else 0
+            st.markdown(f"**Showing {first}–{page.start + len(page_df)} of {page.total} matching records "
+                        f"({len(table)} in total)**")
+            gradient = [name for name in ('temp', 'humidity') if name in page_df]
             st.dataframe(
-                display_df.style.background_gradient(subset=['temp', 'humidity'], cmap='Blues'),
+                page_df.style.background_gradient(subset=gradient, cmap='Blues') if gradient else page_df,
                 use_container_width=True,
                 height=400
             )
-            
-            # Export Section
+            col_p1, col_p2, _ = st.columns([1, 1, 4])
+            with col_p1:
+                st.button("◀ Previous", disabled=page.prev is None, use_container_width=True,
+                          on_click=set_explorer_cursor, args=('prev', page.prev))
+            with col_p2:
+                st.button("Next ▶", disabled=page.next is None, use_container_width=True,
+                          on_click=set_explorer_cursor, args=('next', page.next))
+
+            # Export Section (every matching row, built only when a download is requested)
             st.divider()
             col_e1, col_e2, col_e3 = st.columns(3)
+            export = (table, keep, sort_by, descending, visible, unit)
             with col_e1:
-                csv = display_df.to_csv(index=False).encode('utf-8')
                 st.download_button(
                     label="📥 Download CSV",
-                    data=csv,
+                    data=partial(explorer_export, *export, fmt='csv'),
                     file_name=f'weather_analysis_{city_input}_{datetime.now().strftime("%Y%m%d")}.csv',
                     mime='text/csv',
                 )
             with col_e2:
-                json_data = display_df.to_json(orient='records', date_format='iso')
                 st.download_button(
                     label="📥 Download JSON",
-                    data=json_data,
+                    data=partial(explorer_export, *export, fmt='json'),
                     file_name=f'weather_analysis_{city_input}_{datetime.now().strftime("%Y%m%d")}.json',
                     mime='application/json',
                 )
             with col_e3:
                 st.markdown("#### 📊 Dataset Info")
-                st.write(f"• Total Records: {len(display_df)}")
-                st.write(f"• Time Span: {(df['timestamp'].max() - df['timestamp'].min()).days} days")
-                st.write(f"• Variables: {len(display_df.columns)}")
+                st.write(f"• Total Records: {page.total}")
+                if len(table):
+                    span = (table.columns['timestamp'].max() - table.columns['timestamp'].min()) / 86400
+                    st.write(f"• Time Span: {span:.1f} days")
+                st.write(f"• Variables: {len(visible)}")
 
         with tab5:
             st.subheader("🔄 Multi-City Comparison")
             
             if compare_mode and st.session_state.compare_cities:
-                comparison_data = []
+                # The searched city comes from its record; the rest share group requests
+                default_batcher().ids.learn(city_input, cw)
+                comparison_data = [record_conditions(record, st.session_state.temp_unit)]
+                compared = fetch_comparison(list(st.session_state.compare_cities))
+                for comp_city, comp_data in compared.items():
+                    comparison_data.append(city_conditions(comp_city, comp_data, st.session_state.temp_unit))
                 
-                # Fetch data for all cities
-                for comp_city in [city_input] + st.session_state.compare_cities:
-                    comp_data = fetch_weather_data(comp_city)
-                    if comp_data:
-                        comp_cw = comp_data['current']
-                        comp_poll = comp_data['pollution']['list'][0] if comp_data['pollution'].get('list') else None
-                        
-                        comparison_data.append({
-                            'City': comp_city.title(),
-                            'Temperature': convert_temp(comp_cw['main']['temp'], st.session_state.temp_unit),
-                            'Feels Like': convert_temp(comp_cw['main']['feels_like'], st.session_state.temp_unit),
-                            'Humidity': comp_cw['main']['humidity'],
-                            'Pressure': comp_cw['main']['pressure'],
-                            'Wind Speed': comp_cw['wind']['speed'],
-                            'AQI': comp_poll['main']['aqi'] if comp_poll else None,
-                            'Weather': comp_cw['weather'][0]['main']
-                        })
+                missing = [c for c in st.session_state.compare_cities if c not in compared]
+                for comp_city in missing:
+                    st.warning(f"Unable to fetch data for {comp_city}; it is left out of the comparison.")
+
+                comp_df = comparison_frame(comparison_data)
                 
-                if comparison_data:
-                    comp_df = pd.DataFrame(comparison_data)
-                    
-                    # Temperature comparison
-                    col_c1, col_c2 = st.columns(2)
-                    with col_c1:
-                        fig_comp_temp = px.bar(
-                            comp_df,
-                            x='City',
-                            y='Temperature',
-                            color='Temperature',
-                            color_continuous_scale='thermal',
-                            title=f'Temperature Comparison ({temp_symbol})'
-                        )
-                        fig_comp_temp.update_layout(
-                            paper_bgcolor='rgba(0,0,0,0)',
-                            plot_bgcolor='rgba(0,0,0,0)',
-                            font=dict(color=TEXT_PRIMARY)
-                        )
-                        st.plotly_chart(fig_comp_temp, use_container_width=True)
-                    
-                    with col_c2:
-                        fig_comp_aqi = px.bar(
-                            comp_df,
-                            x='City',
-                            y='AQI',
-                            color='AQI',
-                            color_continuous_scale='reds',
-                            title='Air Quality Index Comparison'
-                        )
-                        fig_comp_aqi.update_layout(
-                            paper_bgcolor='rgba(0,0,0,0)',
-                            plot_bgcolor='rgba(0,0,0,0)',
-                            font=dict(color=TEXT_PRIMARY)
-                        )
-                        st.plotly_chart(fig_comp_aqi, use_container_width=True)
-                    
-                    # Radar chart for multi-dimensional comparison
-                    st.markdown("#### 🎯 Multi-Dimensional Environmental Profile")
-                    
-                    # Absolute normalization for meaningful comparison
-                    radar_df = comp_df.copy()
-                    
-                    # Define professional ranges for normalization
-                    ranges = {
-                        'Temperature': (0, 50) if st.session_state.temp_unit == "Celsius" else (32, 122),
-                        'Humidity': (0, 100),
-                        'Pressure': (950, 1050),
-                        'Wind Speed': (0, 20),
-                        'AQI': (1, 5)
-                    }
-                    
-                    for col, (min_val, max_val) in ranges.items():
-                        if col in radar_df.columns:
-                            # Clamp values to ranges and normalize to 0-100
-                            vals = radar_df[col].clip(min_val, max_val)
-                            radar_df[f'{col}_norm'] = (vals - min_val) / (max_val - min_val) * 100
-                    
-                    fig_radar = go.Figure()
-                    
-                    # Professional Color Palette for multiple cities
-                    colors = [THEME_COLOR, ACCENT_COLOR, SUCCESS_COLOR, '#FF00A0', '#FFD700']
-                    
-                    categories = ['Temperature', 'Humidity', 'Pressure', 'Wind Speed', 'Air Quality (AQI)']
-                    
-                    for idx, row in radar_df.iterrows():
-                        # Close the circle by repeating the first value
-                        r_values = [
-                            row.get('Temperature_norm', 0), 
-                            row.get('Humidity_norm', 0), 
-                            row.get('Pressure_norm', 0), 
-                            row.get('Wind Speed_norm', 0),
-                            row.get('AQI_norm', 0) if pd.notnull(row.get('AQI_norm')) else 0
-                        ]
-                        r_values.append(r_values[0])
-                        theta_values = categories + [categories[0]]
-                        
-                        fig_radar.add_trace(go.Scatterpolar(
-                            r=r_values,
-                            theta=theta_values,
-                            fill='toself',
-                            name=row['City'],
-                            line=dict(color=colors[idx % len(colors)], width=2),
-                            fillcolor=f"rgba{tuple(list(int(colors[idx % len(colors)].lstrip('#')[i:i+2], 16) for i in (0, 2, 4)) + [0.15])}",
-                            marker=dict(size=8)
-                        ))
+                # Temperature comparison
+                col_c1, col_c2 = st.columns(2)
+                with col_c1:
+                    fig_comp_temp = px.bar(
+                        comp_df,
+                        x='City',
+                        y='Temperature',
+                        color='Temperature',
+                        color_continuous_scale='thermal',
+                        title=f'Temperature Comparison ({temp_symbol})'
+                    )
+                    fig_comp_temp.update_layout(
+                        paper_bgcolor='rgba(0,0,0,0)',
+                        plot_bgcolor='rgba(0,0,0,0)',
+                        font=dict(color=TEXT_PRIMARY)
+                    )
+                    st.plotly_chart(fig_comp_temp, use_container_width=True)
+                
+                with col_c2:
+                    fig_comp_aqi = px.bar(
+                        comp_df,
+                        x='City',
+                        y='AQI',
+                        color='AQI',
+                        color_continuous_scale='reds',
+                        title='Air Quality Index Comparison'
+                    )
+                    fig_comp_aqi.update_layout(
+                        paper_bgcolor='rgba(0,0,0,0)',
+                        plot_bgcolor='rgba(0,0,0,0)',
+                        font=dict(color=TEXT_PRIMARY)
+                    )
+                    st.plotly_chart(fig_comp_aqi, use_container_width=True)
+                
+                # Radar chart for multi-dimensional comparison
+                st.markdown("#### 🎯 Multi-Dimensional Environmental Profile")
+                
+                # Absolute normalization for meaningful comparison
+                radar_df = default_pool().normalize(comp_df, st.session_state.temp_unit)
+                
+                fig_radar = go.Figure()
+                
+                # Professional Color Palette for multiple cities
+                colors = [THEME_COLOR, ACCENT_COLOR, SUCCESS_COLOR, '#FF00A0', '#FFD700']
+                
+                categories = RADAR_CATEGORIES
+                
+                for idx, row in radar_df.iterrows():
+                    # Close the circle by repeating the first value
+                    r_values = radar_values(row)
+                    theta_values = categories + [categories[0]]
                     
-                    fig_radar.update_layout(
-                        polar=dict(
-                            radialaxis=dict(
-                                visible=True, 
-                                range=[0, 100],
-                                showticklabels=False,
-                                gridcolor='rgba(255,255,255,0.1)',
-                                linecolor='rgba(255,255,255,0.1)'
-                            ),
-                            angularaxis=dict(
-                                gridcolor='rgba(255,255,255,0.1)',
-                                linecolor='rgba(255,255,255,0.1)',
-                                tickfont=dict(size=11)
-                            ),
-                            bgcolor='rgba(0,0,0,0)'
+                    fig_radar.add_trace(go.Scatterpolar(
+                        r=r_values,
+                        theta=theta_values,
+                        fill='toself',
+                        name=row['City'],
+                        line=dict(color=colors[idx % len(colors)], width=2),
+                        fillcolor=f"rgba{tuple(list(int(colors[idx % len(colors)].lstrip('#')[i:i+2], 16) for i in (0, 2, 4)) + [0.15])}",
+                        marker=dict(size=8)
+                    ))
+                
+                fig_radar.update_layout(
+                    polar=dict(
+                        radialaxis=dict(
+                            visible=True, 
+                            range=[0, 100],
+                            showticklabels=False,
+                            gridcolor='rgba(255,255,255,0.1)',
+                            linecolor='rgba(255,255,255,0.1)'
                         ),
-                        showlegend=True,
-                        legend=dict(
-                            orientation="h",
-                            yanchor="bottom",
-                            y=-0.2,
-                            xanchor="center",
-                            x=0.5
+                        angularaxis=dict(
+                            gridcolor='rgba(255,255,255,0.1)',
+                            linecolor='rgba(255,255,255,0.1)',
+                            tickfont=dict(size=11)
                         ),
-                        margin=dict(l=40, r=40, t=40, b=40),
-                        paper_bgcolor='rgba(0,0,0,0)',
-                        font=dict(color=TEXT_PRIMARY, size=12)
+                        bgcolor='rgba(0,0,0,0)'
+                    ),
+                    showlegend=True,
+                    legend=dict(
+                        orientation="h",
+                        yanchor="bottom",
+                        y=-0.2,
+                        xanchor="center",
+                        x=0.5
+                    ),
+                    margin=dict(l=40, r=40, t=40, b=40),
+                    paper_bgcolor='rgba(0,0,0,0)',
+                    font=dict(color=TEXT_PRIMARY, size=12)
+                )
+                st.plotly_chart(fig_radar, use_container_width=True)
+                
+                # Comparison table
+                st.markdown("#### 📋 Detailed Comparison Matrix")
+                styled_comp = comp_df.style.format({
+                    'Temperature': '{:.1f}' + temp_symbol,
+                    'Feels Like': '{:.1f}' + temp_symbol,
+                    'Humidity': '{:.0f}%',
+                    'Pressure': '{:.0f} hPa',
+                    'Wind Speed': '{:.1f} m/s',
+                    'AQI': '{:.0f}'
+                }).background_gradient(subset=['Temperature', 'Humidity', 'AQI'], cmap='Blues')
+                
+                st.dataframe(styled_comp, use_container_width=True)
+                
+                # Download Feature for Comparison Data
+                st.markdown("<div style='margin-bottom: 10px;'></div>", unsafe_allow_html=True)
+                c_col1, c_col2, c_col3 = st.columns([1, 1, 2])
+                with c_col1:
+                    csv_comp = comp_df.to_csv(index=False).encode('utf-8')
+                    st.download_button(
+                        label="📥 Export CSV",
+                        data=csv_comp,
+                        file_name=f'city_comparison_{datetime.now().strftime("%Y%m%d")}.csv',
+                        mime='text/csv',
+                        use_container_width=True
+                    )
+                with c_col2:
+                    json_comp = comp_df.to_json(orient='records')
+                    st.download_button(
+                        label="📥 Export JSON",
+                        data=json_comp,
+                        file_name=f'city_comparison_{datetime.now().strftime("%Y%m%d")}.json',
+                        mime='application/json',
+                        use_container_width=True
                     )
-                    st.plotly_chart(fig_radar, use_container_width=True)
-                    
-                    # Comparison table
-                    st.markdown("#### 📋 Detailed Comparison Matrix")
-                    styled_comp = comp_df.style.format({
-                        'Temperature': '{:.1f}' + temp_symbol,
-                        'Feels Like': '{:.1f}' + temp_symbol,
-                        'Humidity': '{:.0f}%',
-                        'Pressure': '{:.0f} hPa',
-                        'Wind Speed': '{:.1f} m/s',
-                        'AQI': '{:.0f}'
-                    }).background_gradient(subset=['Temperature', 'Humidity', 'AQI'], cmap='Blues')
-                    
-                    st.dataframe(styled_comp, use_container_width=True)
-                    
-                    # Download Feature for Comparison Data
-                    st.markdown("<div style='margin-bottom: 10px;'></div>", unsafe_allow_html=True)
-                    c_col1, c_col2, c_col3 = st.columns([1, 1, 2])
-                    with c_col1:
-                        csv_comp = comp_df.to_csv(index=False).encode('utf-8')
-                        st.download_button(
-                            label="📥 Export CSV",
-                            data=csv_comp,
-                            file_name=f'city_comparison_{datetime.now().strftime("%Y%m%d")}.csv',
-                            mime='text/csv',
-                            use_container_width=True
-                        )
-                    with c_col2:
-                        json_comp = comp_df.to_json(orient='records')
-                        st.download_button(
-                            label="📥 Export JSON",
-                            data=json_comp,
-                            file_name=f'city_comparison_{datetime.now().strftime("%Y%m%d")}.json',
-                            mime='application/json',
-                            use_container_width=True
-                        )
-                else:
-                    st.warning("Unable to fetch data for comparison cities.")
             else:
                 st.info("👆 Enable 'Comparison Mode' in the sidebar and add cities to compare weather conditions across multiple locations.")
                 
@@ -1309,6 +1430,175 @@ if city_input:
                 5. 📊 View side-by-side comparisons here!
                 """)
 
+        with tab6:
+            st.subheader("🗺️ Regional Site Map")
+            
+            store = default_store()
+            center_lat, center_lon = record.coord['lat'], record.coord['lon']
+            
+            col_m1, col_m2 = st.columns([1, 3])
+            with col_m1:
+                radius_km = st.slider("Radius (km)", 10, 1000, 50, step=10)
+                max_regional = st.slider("Sites to compare", 2, 12, 6)
+                st.caption(f"{len(store.sites)} monitored sites indexed")
+                nearby = store.sites.index().within(center_lat, center_lon, radius_km)
+                st.metric("Sites in radius", len(nearby))
+                load_region = st.button("📡 Load regional conditions", use_container_width=True)
+            
+            if load_region:
+                # Nearest sites first; each lookup goes through the cached store
+                for hit in nearby[:max_regional]:
+                    store.get(hit.name)
+            
+            map_rows = []
+            for hit in nearby:
+                site_record = store.peek(hit.name)
+                map_rows.append({
+                    'Site': hit.name.title(),
+                    'lat': hit.lat,
+                    'lon': hit.lon,
+                    'Distance (km)': round(hit.distance_km, 1),
+                    'Temperature': convert_temp(site_record.current['main']['temp'], st.session_state.temp_unit) if site_record else None
+                })
+            map_df = pd.DataFrame(map_rows, columns=['Site', 'lat', 'lon', 'Distance (km)', 'Temperature'])
+            
+            with col_m2:
+                fig_map = px.scatter_geo(
+                    map_df,
+                    lat='lat',
+                    lon='lon',
+                    hover_name='Site',
+                    hover_data={'Distance (km)': True, 'Temperature': ':.1f', 'lat': False, 'lon': False},
+                    color='Temperature',
+                    color_continuous_scale=[[0, THEME_COLOR], [1, ACCENT_COLOR]]
+                )
+                fig_map.update_traces(marker=dict(size=10, line=dict(width=1, color='rgba(255,255,255,0.4)')))
+                fig_map.update_geos(
+                    fitbounds="locations" if len(map_df) > 1 else False,
+                    center=dict(lat=center_lat, lon=center_lon),
+                    projection_scale=1 if len(map_df) > 1 else 8,
+                    bgcolor='rgba(0,0,0,0)',
+                    showcountries=True, countrycolor='rgba(255,255,255,0.2)',
+                    showland=True, landcolor='rgba(255,255,255,0.03)',
+                    showocean=True, oceancolor='rgba(0,212,255,0.04)'
+                )
+                fig_map.update_layout(
+                    paper_bgcolor='rgba(0,0,0,0)',
+                    font=dict(color=TEXT_PRIMARY),
+                    margin=dict(l=0, r=0, t=10, b=0),
+                    height=420,
+                    coloraxis_colorbar=dict(title=temp_symbol, thickness=12)
+                )
+                st.plotly_chart(fig_map, use_container_width=True)
+            
+            # Regional comparison over the loaded nearby sites
+            regional = [(hit, store.peek(hit.name)) for hit in nearby]
+            regional = [(hit, r) for hit, r in regional if r is not None]
+            if len(regional) > 1:
+                st.markdown("#### 📍 Regional Comparison")
+                region_df = comparison_frame(record_conditions(r, st.session_state.temp_unit) for _, r in regional)
+                region_df.insert(1, 'Distance (km)', [round(hit.distance_km, 1) for hit, _ in regional])
+                fig_region = px.bar(
+                    region_df,
+                    x='City',
+                    y='Temperature',
+                    color='Temperature',
+                    color_continuous_scale='thermal',
+                    hover_data=['Distance (km)', 'Humidity', 'AQI'],
+                    title=f'Temperature within {radius_km} km ({temp_symbol})'
+                )
+                fig_region.update_layout(
+                    paper_bgcolor='rgba(0,0,0,0)',
+                    plot_bgcolor='rgba(0,0,0,0)',
+                    font=dict(color=TEXT_PRIMARY)
+                )
+                st.plotly_chart(fig_region, use_container_width=True)
+                st.dataframe(region_df, use_container_width=True)
+            else:
+                st.info("Load regional conditions to compare the sites around this city. "
+                        "Set METEO_SITES_PATH to a city,lat,lon CSV to index your monitored sites.")
+            
+            # Gridded heatmap interpolated from point samples; tiles are cached so panning only fetches new ones
+            st.markdown("#### 🌡️ Regional Heatmap")
+            if st.session_state.get('heatmap_city') != city_input:
+                st.session_state.heatmap_city = city_input
+                st.session_state.heatmap_center = (center_lat, center_lon)
+                st.session_state.heatmap_on = False
+            
+            col_h1, col_h2 = st.columns([1, 3])
+            with col_h1:
+                heat_var = st.selectbox("Variable", list(VARIABLES), format_func=lambda k: VARIABLES[k].label)
+                span_deg = st.slider("Span (°)", TILE_DEG, MAX_SPAN_DEG, 1.5, step=TILE_DEG)
+                heat_method = st.selectbox("Interpolation", ["linear", "cubic", "rbf"])
+                if st.button("🗺️ Build heatmap", use_container_width=True):
+                    st.session_state.heatmap_on = True
+                
+                h_lat, h_lon = st.session_state.heatmap_center
+                step = span_deg / 2
+                p1, p2, p3 = st.columns(3)
+                if p2.button("⬆️", use_container_width=True):
+                    h_lat = min(h_lat + step, 89.0)
+                if p1.button("⬅️", use_container_width=True):
+                    h_lon -= step
+                if p3.button("➡️", use_container_width=True):
+                    h_lon += step
+                if p2.button("⬇️", use_container_width=True):
+                    h_lat = max(h_lat - step, -89.0)
+                st.session_state.heatmap_center = (h_lat, h_lon)
+            
+            if st.session_state.heatmap_on:
+                try:
+                    with st.spinner("Sampling regional grid..."):
+                        field = default_sampler().field(BBox.around(h_lat, h_lon, span_deg), heat_var, method=heat_method)
+                except ValueError as e:
+                    field = None
+                    st.warning(str(e))
+                
+                if field is not None and len(field.sample_values):
+                    var = VARIABLES[heat_var]
+                    z, unit_label = field.values, var.unit
+                    sample_z = field.sample_values
+                    if heat_var == 'temp':
+                        z, sample_z, unit_label = convert_temp(z, st.session_state.temp_unit), convert_temp(sample_z, st.session_state.temp_unit), temp_symbol
+                    
+                    fig_heat = go.Figure(go.Heatmap(
+                        x=field.lon, y=field.lat, z=z,
+                        colorscale='RdYlGn_r' if heat_var == 'aqi' else 'thermal',
+                        colorbar=dict(title=unit_label, thickness=12),
+                        hovertemplate=f'<b>{var.label}</b>: %{{z:.1f}} {unit_label}<br>%{{y:.2f}}, %{{x:.2f}}<extra></extra>'
+                    ))
+                    fig_heat.add_trace(go.Scatter(
+                        x=field.sample_lon, y=field.sample_lat, mode='markers', name='Samples',
+                        marker=dict(size=4, color='rgba(255,255,255,0.5)'), hoverinfo='skip'
+                    ))
+                    fig_heat.add_trace(go.Scatter(
+                        x=[center_lon], y=[center_lat], mode='markers+text', text=[city_input.title()],
+                        textposition='top center', name=city_input.title(),
+                        marker=dict(size=12, symbol='star', color=ACCENT_COLOR)
+                    ))
+                    fig_heat.update_layout(
+                        paper_bgcolor='rgba(0,0,0,0)',
+                        plot_bgcolor='rgba(0,0,0,0)',
+                        font=dict(color=TEXT_PRIMARY),
+                        margin=dict(l=0, r=0, t=10, b=0),
+                        height=460,
+                        showlegend=False,
+                        xaxis=dict(title="Longitude", range=[field.lon[0], field.lon[-1]]),
+                        yaxis=dict(title="Latitude", range=[field.lat[0], field.lat[-1]], scaleanchor='x')
+                    )
+                    with col_h2:
+                        st.plotly_chart(fig_heat, use_container_width=True)
+                    with col_h1:
+                        st.caption(f"{len(field.sample_values)} samples from {field.tiles} tiles "
+                                   f"({field.tiles_fetched} fetched, {field.tiles - field.tiles_fetched} cached)")
+                elif field is not None:
+                    st.warning("No samples could be fetched for this region.")
+            else:
+                with col_h2:
+                    st.info("Build a heatmap to sample a grid around this city. Use the arrows to pan; "
+                            "only tiles not seen before are fetched.")
+        mem_run.mark("tabs")
+
     else:
         st.error("⚠️ City not found! Please check the spelling and try again.")
         st.info("💡 Try searching for major cities like: Mumbai, Delhi, New York, London, Tokyo, Paris")
@@ -1403,3 +1693,18 @@ st.markdown(f"""
     </div>
     <div style='margin-bottom: 40px;'></div>
 """, unsafe_allow_html=True)
+
+# ------------------ RELEASE ------------------
+# Drop this run's frames, figures and arrays now instead of keeping them alive until the next rerun
+RUN_FRAMES = (
+    'df', 'df_display', 'daily_df', 'hourly_df', 'poll_df', 'map_df', 'page_df', 'comp_df', 'radar_df',
+    'region_df', 'styled_comp', 'corr_data', 'cond_counts', 'table', 'page', 'keep', 'epochs', 'normals',
+    'sub_indices', 'field', 'sample_z', 'comfort', 'row',
+    'fig', 'hourly_fig', 'fig_corr', 'fig_map', 'fig_pie', 'fig_pol', 'fig_pressure', 'fig_scatter',
+    'fig_wind', 'fig_comp_temp', 'fig_comp_aqi', 'fig_radar', 'fig_region', 'fig_heat',
+)
+mem_run.mark("render")
+release(globals(), RUN_FRAMES)
+mem_run.mark("release")
+mem_run.finish()
+cpu_run.finish(city_input or "no city")
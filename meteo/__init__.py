@@ -0,0 +1,46 @@
+"""UI-free weather analytics core shared by the dashboard and headless jobs.
+
+Nothing here imports Streamlit, and heavy dependencies (requests, pandas)
+are only loaded when the submodule needing them is first used, so
+``import meteo`` stays cheap for workers and process pools::
+
+    from meteo import WeatherClient, process_forecast, generate_weather_alerts
+"""
+
+import importlib
+
+_EXPORTS = {
+    "API_KEY": "client",
+    "WeatherClient": "client",
+    "current_pollution": "client",
+    "default_client": "client",
+    "fetch_weather_data": "client",
+    "process_forecast": "forecast",
+    "generate_recommendations": "alerts",
+    "generate_weather_alerts": "alerts",
+    "get_aqi_label": "alerts",
+    "city_conditions": "compare",
+    "comparison_frame": "compare",
+    "normalize_comparison": "compare",
+    "convert_temp": "units",
+    "get_temp_symbol": "units",
+    "Alert": "models",
+    "CityConditions": "models",
+    "Recommendation": "models",
+    "WeatherData": "models",
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
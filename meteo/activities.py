@@ -0,0 +1,182 @@
+"""Vectorized activity scoring over forecast slots.
+
+Every forecast slot gets a 0-100 score per activity from weighted comfort
+terms (temperature, wind, humidity, cloud cover), scaled down for rain and
+snow, poor air quality and hours outside the activity's usual time of day.
+Windows are runs of ``slots`` consecutive slots, ranked by their mean score;
+:func:`top_windows` picks the best non-overlapping ones.
+
+All functions broadcast over leading axes, so a ``(cities, slots)`` stack
+of forecasts is scored in one call (see :func:`score_cities`).
+"""
+from __future__ import annotations
+
+from datetime import timedelta
+from typing import TYPE_CHECKING, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+WET_CONDITIONS = ("Rain", "Drizzle", "Thunderstorm", "Snow")
+SLOT = timedelta(hours=3)
+TOP_K = 3
+
+
+class Activity(NamedTuple):
+    name: str
+    label: str
+    temp_range: Tuple[float, float]       # °C scoring 1.0
+    temp_falloff: float                   # °C outside the range where the score drops to ~0.37
+    wind_calm: float                      # m/s scoring 1.0
+    wind_max: float                       # m/s scoring 0.0
+    humidity_ok: float                    # % up to which humidity costs nothing
+    clouds_pref: float                    # preferred cloud cover, %
+    weights: Tuple[float, float, float, float]                  # temp, wind, humidity, clouds
+    aqi_factors: Tuple[float, float, float, float, float]      # multiplier for AQI 1..5
+    wet_factor: float                     # multiplier in rain or snow
+    hours: Tuple[int, int]                # local hours [start, end) the activity is done in
+    slots: int                            # window length in forecast slots
+
+
+ACTIVITIES: Tuple[Activity, ...] = (
+    Activity("running", "🏃 Running", (8, 18), 8, 4, 12, 60, 50,
+             (0.45, 0.2, 0.25, 0.1), (1.0, 0.9, 0.6, 0.3, 0.1), 0.15, (5, 21), 1),
+    Activity("cycling", "🚴 Cycling", (14, 24), 8, 3, 10, 70, 40,
+             (0.35, 0.4, 0.15, 0.1), (1.0, 0.92, 0.7, 0.4, 0.15), 0.1, (6, 20), 1),
+    Activity("outdoor_events", "🎪 Outdoor events", (18, 27), 7, 5, 14, 65, 25,
+             (0.4, 0.2, 0.15, 0.25), (1.0, 0.95, 0.8, 0.5, 0.25), 0.05, (9, 23), 2),
+)
+
+
+class ActivityWindow(NamedTuple):
+    activity: str
+    label: str
+    start: "pd.Timestamp"
+    end: "pd.Timestamp"
+    score: float
+    temp: float          # mean over the window
+    wind_speed: float
+
+
+def _params(activities: Sequence[Activity], ndim: int) -> Dict[str, np.ndarray]:
+    """Profile fields as ``(A, 1, ..., 1)`` arrays broadcasting against slot arrays"""
+    shape = (len(activities),) + (1,) * ndim
+    fields = {}
+    for field in ("temp_falloff", "wind_calm", "wind_max", "humidity_ok", "clouds_pref", "wet_factor", "slots"):
+        fields[field] = np.array([getattr(a, field) for a in activities], dtype=np.float64).reshape(shape)
+    for i, field in enumerate(("temp_lo", "temp_hi")):
+        fields[field] = np.array([a.temp_range[i] for a in activities], dtype=np.float64).reshape(shape)
+    for i, field in enumerate(("hour_start", "hour_end")):
+        fields[field] = np.array([a.hours[i] for a in activities], dtype=np.float64).reshape(shape)
+    weights = np.array([a.weights for a in activities], dtype=np.float64)
+    weights /= weights.sum(axis=1, keepdims=True)
+    fields["weights"] = weights.reshape((len(activities), 4) + (1,) * ndim)
+    fields["aqi_factors"] = np.array([a.aqi_factors for a in activities], dtype=np.float64)
+    return fields
+
+
+def slot_scores(temp, wind_speed, humidity, clouds, wet, hour, aqi=None,
+                activities: Sequence[Activity] = ACTIVITIES) -> np.ndarray:
+    """``(activities, *slot_shape)`` scores in 0-100
+
+    ``wet`` is a boolean array (rain or snow in the slot); ``aqi`` is a 1-5
+    level broadcastable to the slots (for example one value per city with
+    shape ``(cities, 1)``), or None when unknown.
+    """
+    temp, wind_speed, humidity, clouds, hour = np.broadcast_arrays(
+        *(np.asarray(v, dtype=np.float64) for v in (temp, wind_speed, humidity, clouds, hour)))
+    p = _params(activities, temp.ndim)
+
+    below = np.clip(p["temp_lo"] - temp, 0, None)
+    above = np.clip(temp - p["temp_hi"], 0, None)
+    temp_score = np.exp(-((below + above) / p["temp_falloff"]) ** 2)
+    wind_score = np.clip((p["wind_max"] - wind_speed) / (p["wind_max"] - p["wind_calm"]), 0, 1)
+    humidity_score = np.clip((100 - humidity) / (100 - p["humidity_ok"]), 0, 1)
+    clouds_score = 1 - np.abs(clouds - p["clouds_pref"]) / 100
+
+    w = p["weights"]
+    comfort = (w[:, 0] * temp_score + w[:, 1] * wind_score
+               + w[:, 2] * humidity_score + w[:, 3] * clouds_score)
+    comfort = comfort * np.where(np.asarray(wet, dtype=bool), p["wet_factor"], 1.0)
+    comfort = comfort * ((hour >= p["hour_start"]) & (hour < p["hour_end"]))
+    if aqi is not None:
+        level = np.clip(np.nan_to_num(np.asarray(aqi, dtype=np.float64), nan=1), 1, 5).astype(np.int64) - 1
+        factors = p["aqi_factors"][:, level]            # (A, *aqi_shape)
+        comfort = comfort * factors.reshape(factors.shape + (1,) * (temp.ndim - level.ndim))
+    scores = 100 * comfort
+    # Missing measurements (NaN) must not look like a perfect slot
+    return np.where(np.isnan(temp) | np.isnan(wind_speed), np.nan, scores)
+
+
+def window_means(scores: np.ndarray, slots: int) -> np.ndarray:
+    """Mean score of every run of ``slots`` consecutive slots (last axis), NaN-padded at the end"""
+    n = scores.shape[-1]
+    means = np.full(scores.shape, np.nan)
+    if slots > n:
+        return means
+    filled = np.nan_to_num(scores, nan=0.0)
+    csum = np.concatenate([np.zeros(scores.shape[:-1] + (1,)), np.cumsum(filled, axis=-1)], axis=-1)
+    valid = np.concatenate([np.zeros(scores.shape[:-1] + (1,)), np.cumsum(~np.isnan(scores), axis=-1)], axis=-1)
+    sums = csum[..., slots:] - csum[..., :-slots]
+    complete = (valid[..., slots:] - valid[..., :-slots]) == slots
+    means[..., :n - slots + 1] = np.where(complete, sums / slots, np.nan)
+    return means
+
+
+def top_windows(means: np.ndarray, slots: int, k: int = TOP_K) -> Tuple[np.ndarray, np.ndarray]:
+    """Start indices and scores of the ``k`` best non-overlapping windows (last axis)
+
+    Returns ``(starts, scores)`` of shape ``means.shape[:-1] + (k,)``; missing
+    windows have start -1 and a NaN score.
+    """
+    remaining = np.where(np.isnan(means), -np.inf, means)
+    idx = np.arange(means.shape[-1])
+    starts = np.full(means.shape[:-1] + (k,), -1, dtype=np.int64)
+    values = np.full(means.shape[:-1] + (k,), np.nan)
+    for j in range(k):
+        best = np.argmax(remaining, axis=-1)
+        value = np.take_along_axis(remaining, best[..., None], axis=-1)[..., 0]
+        found = np.isfinite(value)
+        starts[..., j] = np.where(found, best, -1)
+        values[..., j] = np.where(found, value, np.nan)
+        remaining = np.where(np.abs(idx - best[..., None]) < slots, -np.inf, remaining)
+    return starts, values
+
+
+def score_cities(columns: Dict[str, np.ndarray], aqi=None, k: int = TOP_K,
+                 activities: Sequence[Activity] = ACTIVITIES) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+    """Top-k windows per activity for a ``(cities, slots)`` stack of forecasts
+
+    ``columns`` holds ``temp``, ``wind_speed``, ``humidity``, ``clouds``,
+    ``wet`` and ``hour``, NaN-padded for shorter forecasts; ``aqi`` has one
+    level per city. Returns ``{activity: (starts, scores)}``, each ``(cities, k)``.
+    """
+    aqi = None if aqi is None else np.asarray(aqi, dtype=np.float64)[:, None]
+    scores = slot_scores(columns["temp"], columns["wind_speed"], columns["humidity"], columns["clouds"],
+                         columns["wet"], columns["hour"], aqi, activities)
+    return {a.name: top_windows(window_means(scores[i], a.slots), a.slots, k)
+            for i, a in enumerate(activities)}
+
+
+def best_windows(df: "pd.DataFrame", aqi: Optional[int] = None, k: int = TOP_K,
+                 activities: Sequence[Activity] = ACTIVITIES) -> Dict[str, List[ActivityWindow]]:
+    """Top-k windows per activity of one ``process_forecast`` frame"""
+    wet = df['weather'].isin(WET_CONDITIONS).to_numpy()
+    scores = slot_scores(df['temp'], df['wind_speed'], df['humidity'], df['clouds'], wet,
+                         df['timestamp'].dt.hour, aqi, activities)
+    timestamps = df['timestamp'].reset_index(drop=True)
+    temp = df['temp'].to_numpy(dtype=np.float64)
+    wind = df['wind_speed'].to_numpy(dtype=np.float64)
+    windows = {}
+    for i, activity in enumerate(activities):
+        starts, values = top_windows(window_means(scores[i], activity.slots), activity.slots, k)
+        windows[activity.name] = [
+            ActivityWindow(activity.name, activity.label, timestamps[s],
+                           timestamps[s + activity.slots - 1] + SLOT, round(float(v), 1),
+                           round(float(temp[s:s + activity.slots].mean()), 1),
+                           round(float(wind[s:s + activity.slots].mean()), 1))
+            for s, v in zip(starts, values) if s >= 0
+        ]
+    return windows
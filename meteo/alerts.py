@@ -0,0 +1,96 @@
+"""Alert and recommendation engines, AQI labelling"""
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, List, Optional, Tuple
+
+from .activities import ACTIVITIES, WET_CONDITIONS, best_windows
+from .models import Alert, Payload, Recommendation
+from .theme import ACCENT_COLOR, SUCCESS_COLOR, WARNING_COLOR
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+GOOD_WINDOW_SCORE = 50   # activity windows scoring lower are not recommended
+
+
+def get_aqi_label(aqi: Optional[int]) -> Tuple[str, str]:
+    """Map OpenWeather's 1-5 AQI to a (label, colour) pair"""
+    labels = {
+        1: ("Good", SUCCESS_COLOR),
+        2: ("Fair", "#a3e635"),
+        3: ("Moderate", WARNING_COLOR),
+        4: ("Poor", "#fb923c"),
+        5: ("Very Poor", ACCENT_COLOR)
+    }
+    return labels.get(aqi, ("Unknown", "#888"))
+
+
+def generate_weather_alerts(cw: Payload, poll: Optional[Payload]) -> List[Alert]:
+    """Generate weather alerts based on conditions"""
+    alerts = []
+
+    # Temperature alerts
+    temp = cw['main']['temp']
+    if temp > 35:
+        alerts.append(Alert("⚠️ Extreme Heat Warning", f"Temperature is {temp}°C. Stay hydrated and avoid outdoor activities.", "danger"))
+    elif temp < 5:
+        alerts.append(Alert("❄️ Cold Weather Alert", f"Temperature is {temp}°C. Dress warmly and protect against frostbite.", "warning"))
+
+    # Wind alerts
+    wind_speed = cw['wind']['speed']
+    if wind_speed > 15:
+        alerts.append(Alert("💨 High Wind Advisory", f"Wind speed is {wind_speed} m/s. Secure loose objects.", "warning"))
+
+    # Humidity alerts
+    humidity = cw['main']['humidity']
+    if humidity > 85:
+        alerts.append(Alert("💧 High Humidity Alert", f"Humidity is {humidity}%. May feel uncomfortable.", "warning"))
+
+    # Air quality alerts
+    if poll:
+        aqi = poll['main']['aqi']
+        if aqi >= 4:
+            alerts.append(Alert("🏭 Poor Air Quality", "Air quality is poor. Limit outdoor exposure and wear a mask.", "danger"))
+        elif aqi == 3:
+            alerts.append(Alert("🌫️ Moderate Air Quality", "Air quality is moderate. Sensitive groups should limit prolonged outdoor activities.", "warning"))
+
+    return alerts
+
+
+def generate_recommendations(cw: Payload, df: pd.DataFrame, poll: Optional[Payload]) -> List[Recommendation]:
+    """Generate personalized recommendations"""
+    recommendations = []
+    temp = cw['main']['temp']
+    weather = cw['weather'][0]['main']
+
+    # Clothing recommendations
+    if temp > 25:
+        recommendations.append(Recommendation("👕 Clothing", "Light, breathable clothing recommended. Don't forget sunscreen!"))
+    elif temp < 15:
+        recommendations.append(Recommendation("🧥 Clothing", "Warm layers recommended. Consider a jacket or coat."))
+    else:
+        recommendations.append(Recommendation("👔 Clothing", "Comfortable casual wear. A light jacket might be useful."))
+
+    # Activity recommendations: best scored window per activity over the forecast
+    windows = best_windows(df, poll['main']['aqi'] if poll else None)
+    best = [w[0] for w in windows.values() if w]
+    good = [w for w in best if w.score >= GOOD_WINDOW_SCORE]
+    if good:
+        message = ", ".join(f"{w.label} {_window_span(w)} ({w.score:.0f})" for w in good)
+        recommendations.append(Recommendation("🏃 Activities", f"Best windows: {message}."))
+    elif weather in WET_CONDITIONS:
+        recommendations.append(Recommendation("☔ Activities", "Indoor activities recommended. Carry an umbrella if going out."))
+    else:
+        recommendations.append(Recommendation("🏠 Activities", "No good outdoor windows in the forecast. Plan indoor alternatives."))
+
+    # Best time to go out: top windows for spending time outside
+    outdoor = windows.get(ACTIVITIES[-1].name, [])
+    if outdoor:
+        spans = ", ".join(f"{_window_span(w)} ({w.temp:.0f}°C)" for w in outdoor)
+        recommendations.append(Recommendation("⏰ Best Time", f"Nicest times outside: {spans}"))
+
+    return recommendations
+
+
+def _window_span(window) -> str:
+    return f"{window.start.strftime('%a %I %p')}–{window.end.strftime('%I %p')}"
@@ -0,0 +1,230 @@
+"""Streaming anomaly detection over current-weather snapshots.
+
+Fixed thresholds treat 35 °C the same in Delhi and London. Instead, each
+city keeps running statistics per hour of day for every tracked metric and
+new snapshots are scored against them. Updates are O(1) per observation and
+never rescan history:
+
+* ``"welford"``: exact running mean/variance (Welford's algorithm)
+* ``"ewm"``: exponentially weighted mean/variance that follow slow drift
+
+An hour slot needs ``MIN_COUNT`` observations before it can flag, which is
+weeks of polling, so the state is meant to outlive the process:
+:meth:`AnomalyDetector.save` / :meth:`~AnomalyDetector.load` persist it as
+``.npz`` and :meth:`AnomalyDetector.fit` folds in imported history (see
+``python -m meteo.ingest --anomalies``).
+"""
+from __future__ import annotations
+
+import os
+import threading
+from typing import Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+from .client import WeatherClient
+from .models import Alert, Payload
+
+METRICS = ("temp", "humidity", "pressure", "wind_speed")
+Z_THRESHOLD = 3.0
+MIN_COUNT = 20        # observations needed in an hour slot before it can flag
+EWM_ALPHA = 0.05
+
+
+class Anomaly(NamedTuple):
+    city: str
+    metric: str
+    value: float
+    mean: float
+    std: float
+    z: float
+    hour: int  # UTC hour of day of the observation
+    threshold: float = Z_THRESHOLD  # |z| the detector flagged beyond
+
+
+def _metric_values(cw: Payload) -> np.ndarray:
+    return np.array([cw['main']['temp'], cw['main']['humidity'], cw['main']['pressure'],
+                     cw['wind']['speed']], dtype=np.float64)
+
+
+class _CityState:
+    __slots__ = ("count", "mean", "m2", "last_dt", "last_anomalies")
+
+    def __init__(self):
+        self.count = np.zeros(24)
+        self.mean = np.zeros((24, len(METRICS)))
+        self.m2 = np.zeros((24, len(METRICS)))  # sum of squares (welford) or variance (ewm)
+        self.last_dt = None
+        self.last_anomalies: List[Anomaly] = []  # what the observation at last_dt raised
+
+
+class AnomalyDetector:
+    """Per-city, per-hour running statistics with z-score flagging"""
+
+    def __init__(self, mode: str = "welford", threshold: float = Z_THRESHOLD,
+                 min_count: int = MIN_COUNT, alpha: float = EWM_ALPHA):
+        if mode not in ("welford", "ewm"):
+            raise ValueError("mode must be 'welford' or 'ewm'")
+        self.mode = mode
+        self.threshold = threshold
+        self.min_count = min_count
+        self.alpha = alpha
+        self._states: Dict[str, _CityState] = {}
+        self._lock = threading.Lock()
+
+    def _std(self, state: _CityState, hour: int) -> np.ndarray:
+        if self.mode == "ewm":
+            return np.sqrt(state.m2[hour])
+        n = state.count[hour]
+        return np.sqrt(state.m2[hour] / (n - 1)) if n > 1 else np.zeros(len(METRICS))
+
+    def update(self, city: str, cw: Payload) -> List[Anomaly]:
+        """Score one snapshot against its city/hour statistics, then fold it in
+
+        A snapshot with the observation time last seen is not folded in
+        again, so a re-fetched cached payload does not count twice; it gets
+        the anomalies it raised the first time.
+        """
+        values = _metric_values(cw)
+        hour = int(cw['dt'] // 3600 % 24)
+        key = WeatherClient.cache_key(city)
+        with self._lock:
+            state = self._states.get(key)
+            if state is None:
+                state = self._states[key] = _CityState()
+            if state.last_dt == cw['dt']:
+                return list(state.last_anomalies)
+            state.last_dt = cw['dt']
+
+            # Score before updating so a value is never compared against itself
+            mean = state.mean[hour].copy()
+            std = self._std(state, hour)
+            anomalies = []
+            if state.count[hour] >= self.min_count:
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    z = np.where(std > 0, (values - mean) / std, 0.0)
+                for i in np.flatnonzero(np.abs(z) > self.threshold):
+                    anomalies.append(Anomaly(city, METRICS[i], float(values[i]), float(mean[i]),
+                                             float(std[i]), float(z[i]), hour, self.threshold))
+
+            self._fold(state, hour, values)
+            state.last_anomalies = anomalies
+        return anomalies
+
+    def _fold(self, state: _CityState, hour: int, values: np.ndarray) -> None:
+        state.count[hour] += 1
+        delta = values - state.mean[hour]
+        if self.mode == "welford":
+            state.mean[hour] += delta / state.count[hour]
+            state.m2[hour] += delta * (values - state.mean[hour])
+        elif state.count[hour] == 1:
+            state.mean[hour] = values
+        else:
+            state.mean[hour] += self.alpha * delta
+            state.m2[hour] = (1 - self.alpha) * (state.m2[hour] + self.alpha * delta ** 2)
+
+    def fit(self, city: str, dt: np.ndarray, values: np.ndarray) -> int:
+        """Fold in past observations without scoring them; returns how many were used
+
+        ``dt`` are UTC epoch seconds and ``values`` has one column per
+        metric in :data:`METRICS` order. Rows with a missing metric and rows
+        not newer than the last observation already seen are skipped, so
+        fitting the same history twice counts it once. Welford state is
+        merged per hour in one pass (Chan et al.); EWM state is order
+        dependent and folded row by row.
+        """
+        dt = np.asarray(dt, dtype=np.int64)
+        values = np.asarray(values, dtype=np.float64).reshape(len(dt), len(METRICS))
+        key = WeatherClient.cache_key(city)
+        with self._lock:
+            state = self._states.get(key)
+            if state is None:
+                state = self._states[key] = _CityState()
+            use = ~np.isnan(values).any(axis=1)
+            if state.last_dt is not None:
+                use &= dt > state.last_dt
+            order = np.flatnonzero(use)[np.argsort(dt[use], kind="stable")]
+            if not len(order):
+                return 0
+            dt, values = dt[order], values[order]
+            hours = dt // 3600 % 24
+            if self.mode == "welford":
+                n_b = np.bincount(hours, minlength=24).astype(np.float64)
+                sums = np.stack([np.bincount(hours, values[:, i], minlength=24) for i in range(len(METRICS))], axis=1)
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    mean_b = np.where(n_b[:, None] > 0, sums / n_b[:, None], 0.0)
+                dev = values - mean_b[hours]
+                m2_b = np.stack([np.bincount(hours, dev[:, i] ** 2, minlength=24) for i in range(len(METRICS))], axis=1)
+                n_a = state.count
+                n = n_a + n_b
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    delta = mean_b - state.mean
+                    share = np.where(n > 0, n_b / n, 0.0)[:, None]
+                    state.m2 = state.m2 + m2_b + delta ** 2 * (n_a * share[:, 0])[:, None]
+                state.mean = state.mean + delta * share
+                state.count = n
+            else:
+                for hour, row in zip(hours, values):
+                    self._fold(state, int(hour), row)
+            state.last_dt = int(dt[-1])
+            state.last_anomalies = []
+            return len(dt)
+
+    def save(self, path: str) -> None:
+        """Persist every city's state to a single ``.npz`` archive"""
+        with self._lock:
+            arrays = {"mode": np.array(self.mode)}
+            for key, state in self._states.items():
+                arrays[f"count::{key}"] = state.count
+                arrays[f"mean::{key}"] = state.mean
+                arrays[f"m2::{key}"] = state.m2
+                arrays[f"last_dt::{key}"] = np.array(np.nan if state.last_dt is None else state.last_dt)
+        with open(path + ".tmp", "wb") as fh:
+            np.savez_compressed(fh, **arrays)
+        os.replace(path + ".tmp", path)
+
+    @classmethod
+    def load(cls, path: str, **options) -> "AnomalyDetector":
+        """Detector with the saved state (and mode); ``options`` as for the constructor"""
+        with np.load(path) as archive:
+            detector = cls(mode=str(archive["mode"]), **options)
+            for name in archive.files:
+                kind, _, key = name.partition("::")
+                if kind != "count":
+                    continue
+                state = detector._states[key] = _CityState()
+                state.count = archive[name].copy()
+                state.mean = archive[f"mean::{key}"].copy()
+                state.m2 = archive[f"m2::{key}"].copy()
+                last_dt = float(archive[f"last_dt::{key}"])
+                state.last_dt = None if np.isnan(last_dt) else int(last_dt)
+        return detector
+
+    def baseline(self, city: str, hour: int) -> Optional[Dict[str, tuple]]:
+        """``{metric: (mean, std, count)}`` for one city and UTC hour"""
+        with self._lock:
+            state = self._states.get(WeatherClient.cache_key(city))
+            if state is None or state.count[hour] == 0:
+                return None
+            std = self._std(state, hour)
+            return {m: (float(state.mean[hour, i]), float(std[i]), int(state.count[hour]))
+                    for i, m in enumerate(METRICS)}
+
+
+ANOMALY_TEXT = {
+    "temp": ("🌡️ Unusually {dir} for this hour", "Temperature is {value:.1f}°C vs a typical {mean:.1f}°C"),
+    "humidity": ("💧 Unusual Humidity", "Humidity is {value:.0f}% vs a typical {mean:.0f}%"),
+    "pressure": ("📉 Unusual Pressure", "Pressure is {value:.0f} hPa vs a typical {mean:.0f} hPa"),
+    "wind_speed": ("💨 Unusual Wind", "Wind is {value:.1f} m/s vs a typical {mean:.1f} m/s"),
+}
+
+
+def anomaly_alerts(anomalies: List[Anomaly]) -> List[Alert]:
+    """Render anomalies in the same shape as :func:`~meteo.alerts.generate_weather_alerts`"""
+    alerts = []
+    for a in anomalies:
+        title, message = ANOMALY_TEXT[a.metric]
+        title = title.format(dir="warm" if a.z > 0 else "cold")
+        message = message.format(value=a.value, mean=a.mean) + f" (z = {a.z:+.1f})."
+        alerts.append(Alert(title, message, "danger" if abs(a.z) > 2 * a.threshold else "warning"))
+    return alerts
@@ -0,0 +1,290 @@
+"""Local JSON API serving the dashboard's processed forecasts, AQI labels and alerts.
+
+Usage::
+
+    python -m meteo.api --host 127.0.0.1 --port 8601
+
+Endpoints (all GET, ``city`` for one city or ``cities=a,b,c`` for a batch)::
+
+    /health
+    /forecast?city=Mumbai          processed 3-hourly forecast + current conditions
+    /forecast?cities=Mumbai,Delhi  batch of the above
+    /alerts?cities=Mumbai,Delhi    AQI labels (OpenWeather, US EPA, India NAQI) and alerts per city
+    /rollups?city=Mumbai&freq=D    precomputed daily (D) or weekly (W) aggregates
+    /activities?cities=Mumbai,Pune best running/cycling/outdoor windows (k=3 per activity)
+    /sites?city=Pune&radius_km=50  monitored sites near a city or lat/lon (or k=5 nearest)
+    /sites?bbox=S,W,N,E            monitored sites inside a map viewport
+    /stats                         stored cities, bytes per city and shared-cache counters
+
+Responses carry an ETag; send it back in ``If-None-Match`` to get a bodyless
+304 when nothing changed. Lookups go through the same forecast store and
+cached client as the dashboard, so repeated requests do not hit OpenWeather.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from .activities import ACTIVITIES, SLOT, WET_CONDITIONS, score_cities
+from .alerts import generate_weather_alerts, get_aqi_label
+from .aqi import STANDARDS, aqi_label, compute_aqi
+from .anomaly import anomaly_alerts
+from .compact import VOCABULARY
+from .httpserver import HTTPError, Request, Response, json_response, serve
+from .store import CityRecord, ForecastStore, default_store
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8601
+MAX_BATCH = 50
+MAX_SITES = 1000
+FETCH_WORKERS = 16
+
+
+class ForecastAPI:
+    """Route handlers bound to a forecast store and a fetch thread pool"""
+
+    def __init__(self, store: Optional[ForecastStore] = None, workers: int = FETCH_WORKERS):
+        self.store = store if store is not None else default_store()
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="api-fetch")
+        self.started = time.time()
+
+    @property
+    def routes(self):
+        return {
+            "/health": self.health,
+            "/forecast": self.forecast,
+            "/alerts": self.alerts,
+            "/rollups": self.rollups,
+            "/activities": self.activities,
+            "/sites": self.sites,
+            "/stats": self.stats,
+        }
+
+    async def _fetch(self, city: str) -> Optional[CityRecord]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.pool, self.store.get, city)
+
+    async def _batch(self, cities: List[str], build) -> Dict[str, Any]:
+        if not cities:
+            raise HTTPError(400, "missing 'city' or 'cities' parameter")
+        if len(cities) > MAX_BATCH:
+            raise HTTPError(400, f"at most {MAX_BATCH} cities per request")
+        cities = list(dict.fromkeys(cities))
+        records = await asyncio.gather(*(self._fetch(c) for c in cities))
+        results, errors = {}, {}
+        for city, record in zip(cities, records):
+            if record is None:
+                errors[city] = "not_found"
+            else:
+                results[city] = build(record)
+        return {"results": results, "errors": errors}
+
+    @staticmethod
+    def _cities(request: Request) -> List[str]:
+        return request.list_arg("cities") or request.list_arg("city")
+
+    async def health(self, request: Request) -> Response:
+        return json_response({"status": "ok", "uptime_s": round(time.time() - self.started, 1)})
+
+    async def forecast(self, request: Request) -> Response:
+        cities = self._cities(request)
+        payload = await self._batch(cities, forecast_document)
+        if "cities" not in request.query and len(cities) == 1:
+            # Single-city form returns the document itself
+            if payload["errors"]:
+                raise HTTPError(404, f"city not found: {cities[0]}")
+            payload = next(iter(payload["results"].values()))
+        return json_response(payload, request)
+
+    async def alerts(self, request: Request) -> Response:
+        cities = self._cities(request)
+        return json_response(await self._batch(cities, alerts_document), request)
+
+    async def rollups(self, request: Request) -> Response:
+        freq = (request.arg("freq") or "D").upper()
+        if freq not in ("D", "W"):
+            raise HTTPError(400, "freq must be D or W")
+        payload = await self._batch(self._cities(request), lambda record: rollup_document(record, freq))
+        return json_response(payload, request)
+
+    async def activities(self, request: Request) -> Response:
+        try:
+            k = min(max(int(request.arg("k", "3")), 1), 10)
+        except ValueError:
+            raise HTTPError(400, "k must be an integer")
+        payload = await self._batch(self._cities(request), lambda record: record)
+        payload["results"] = activities_documents(payload["results"], k)
+        return json_response(payload, request)
+
+    async def sites(self, request: Request) -> Response:
+        index = self.store.sites.index()
+        try:
+            if request.arg("bbox"):
+                south, west, north, east = (float(v) for v in request.arg("bbox").split(","))
+                hits = index.in_bbox(south, west, north, east)
+            else:
+                if request.arg("city"):
+                    center = self.store.sites.locate(request.arg("city"))
+                    if center is None:
+                        raise HTTPError(404, f"unknown site: {request.arg('city')}")
+                    lat, lon = center
+                else:
+                    lat, lon = float(request.arg("lat")), float(request.arg("lon"))
+                if request.arg("k"):
+                    hits = index.nearest(lat, lon, int(request.arg("k")))
+                else:
+                    hits = index.within(lat, lon, float(request.arg("radius_km", "50")))
+        except (TypeError, ValueError):
+            raise HTTPError(400, "expected bbox=S,W,N,E or city/lat+lon with radius_km or k")
+
+        sites = []
+        for hit in hits[:MAX_SITES]:
+            site = hit._asdict()
+            site["distance_km"] = round(hit.distance_km, 2)
+            record = self.store.peek(hit.name)
+            if record is not None:
+                site.update(temp=record.current['main']['temp'], **_aqi_fields(record))
+            sites.append(site)
+        return json_response({"count": len(hits), "sites": sites}, request)
+
+    async def stats(self, request: Request) -> Response:
+        report = self.store.memory_report()
+        return json_response({
+            "cities": len(report),
+            "frame_bytes_per_city": round(report["frame_bytes"].mean(), 1) if len(report) else None,
+            "compact_bytes_per_city": round(report["compact_bytes"].mean(), 1) if len(report) else None,
+            "cached_bytes_per_city": round(report["cached_bytes"].mean(), 1) if len(report) else None,
+            "shared": self.store.shared.stats() if self.store.shared is not None else None,
+        }, request)
+
+
+def _aqi_fields(record: CityRecord) -> Dict[str, Any]:
+    aqi = record.pollution['main']['aqi'] if record.pollution else None
+    fields = {"aqi": aqi, "aqi_label": get_aqi_label(aqi)[0] if record.pollution else None}
+    for name, standard in STANDARDS.items():
+        value, dominant = None, None
+        if record.pollution:
+            air = compute_aqi(record.pollution['components'], standard)
+            if not np.isnan(air.index):
+                value, dominant = int(air.index), str(air.dominant)
+        fields[f"aqi_{name}"] = {
+            "value": value,
+            "label": aqi_label(value, standard)[0],
+            "dominant": dominant,
+        }
+    return fields
+
+
+def alerts_document(record: CityRecord) -> Dict[str, Any]:
+    cw = record.current
+    alerts = generate_weather_alerts(cw, record.pollution) + anomaly_alerts(record.anomalies)
+    return {
+        "city": cw.get('name', record.city),
+        "observed_at": cw.get('dt'),
+        **_aqi_fields(record),
+        "alerts": [a._asdict() for a in alerts],
+    }
+
+
+def forecast_document(record: CityRecord) -> Dict[str, Any]:
+    cw = record.current
+    df = record.frame()
+    df = df.assign(
+        timestamp=df['timestamp'].dt.strftime('%Y-%m-%dT%H:%M:%S'),
+        date=df['date'].astype(str),
+    )
+    return {
+        "city": cw.get('name', record.city),
+        "coord": cw.get('coord'),
+        "current": {
+            "observed_at": cw.get('dt'),
+            "temp": cw['main']['temp'],
+            "feels_like": cw['main']['feels_like'],
+            "humidity": cw['main']['humidity'],
+            "pressure": cw['main']['pressure'],
+            "wind_speed": cw['wind']['speed'],
+            "weather": cw['weather'][0]['main'],
+            "description": cw['weather'][0]['description'],
+        },
+        **_aqi_fields(record),
+        "forecast": df.to_dict(orient='records'),
+    }
+
+
+def activities_documents(records: Dict[str, CityRecord], k: int) -> Dict[str, Any]:
+    """Top-k activity windows for many cities, scored as one stack"""
+    if not records:
+        return {}
+    names = list(records)
+    width = max(len(r.forecast) for r in records.values())
+    columns = {name: np.full((len(names), width), np.nan) for name in ("temp", "wind_speed", "humidity", "clouds", "hour")}
+    columns["wet"] = np.zeros((len(names), width), dtype=bool)
+    stamps = []
+    for i, record in enumerate(records.values()):
+        n = len(record.forecast)
+        for name in ("temp", "wind_speed", "humidity", "clouds"):
+            columns[name][i, :n] = record.forecast.column(name)
+        timestamps = record.forecast.timestamps()
+        columns["hour"][i, :n] = timestamps.hour
+        columns["wet"][i, :n] = np.isin(VOCABULARY.decode(record.forecast.weather), WET_CONDITIONS)
+        stamps.append(timestamps)
+    aqi = [r.pollution['main']['aqi'] if r.pollution else np.nan for r in records.values()]
+
+    documents = {name: {"city": records[name].current.get('name', records[name].city), "activities": {}}
+                 for name in names}
+    windows = score_cities(columns, aqi, k)
+    for activity in ACTIVITIES:
+        starts, scores = windows[activity.name]
+        for i, name in enumerate(names):
+            documents[name]["activities"][activity.name] = [
+                {"start": stamps[i][s].strftime('%Y-%m-%dT%H:%M:%S'),
+                 "end": (stamps[i][s + activity.slots - 1] + SLOT).strftime('%Y-%m-%dT%H:%M:%S'),
+                 "score": round(float(v), 1)}
+                for s, v in zip(starts[i], scores[i]) if s >= 0
+            ]
+    return documents
+
+
+def rollup_document(record: CityRecord, freq: str) -> Dict[str, Any]:
+    table = record.daily if freq == "D" else record.weekly
+    table = table.reset_index()
+    table[table.columns[0]] = table[table.columns[0]].dt.strftime('%Y-%m-%d')
+    summary = record.summary
+    return {
+        "city": record.current.get('name', record.city),
+        "summary": {
+            "temp_max": round(summary.temp_max, 2),
+            "temp_min": round(summary.temp_min, 2),
+            "temp_mean": round(summary.temp_mean, 2),
+            "humidity_mean": round(summary.humidity_mean, 2),
+            "wind_speed_mean": round(summary.wind_speed_mean, 2),
+            "span_days": summary.span_days,
+        },
+        "rollups": table.to_dict(orient='records'),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve processed forecasts as JSON")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    api = ForecastAPI()
+    try:
+        asyncio.run(serve(api.routes, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
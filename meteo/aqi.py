@@ -0,0 +1,235 @@
+"""Regulatory AQI sub-indices from pollutant concentrations.
+
+OpenWeather's ``main.aqi`` is a coarse 1-5 level. This module computes the
+standard indices instead (US EPA AQI, India NAQI) from the ``components``
+of an air pollution sample. Each pollutant's sub-index is interpolated
+linearly inside its breakpoint band::
+
+    I = (I_hi - I_lo) / (C_hi - C_lo) * (C - C_lo) + I_lo
+
+and the overall index is the highest sub-index (the "dominant" pollutant).
+Bands are located with ``np.searchsorted`` over whole arrays, so a history
+of thousands of samples converts in one call.
+
+OpenWeather reports every component in µg/m³; gases are converted to the
+units of each table (ppb/ppm at 25 °C, 1 atm). Concentrations are used as
+given: the standards define the breakpoints on 1-, 8- or 24-hour averages,
+so pass averaged series where that matters.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from functools import lru_cache
+from typing import Any, Dict, Mapping, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .models import Payload
+from .theme import SUCCESS_COLOR, WARNING_COLOR
+
+POLLUTANTS = ("pm2_5", "pm10", "o3", "no2", "so2", "co", "nh3")
+NAMES = {"pm2_5": "PM2.5", "pm10": "PM10", "o3": "O₃", "no2": "NO₂", "so2": "SO₂", "co": "CO", "nh3": "NH₃"}
+MOLAR_MASS = {"o3": 48.00, "no2": 46.01, "so2": 64.07, "co": 28.01, "nh3": 17.03}   # g/mol
+MOLAR_VOLUME = 24.45     # litres per mole at 25 °C and 1 atm
+MAX_INDEX = 500
+
+
+class Standard(NamedTuple):
+    name: str
+    label: str
+    index: Tuple[Tuple[int, int], ...]                  # (I_lo, I_hi) per band
+    categories: Tuple[Tuple[str, str], ...]             # (label, colour) per band
+    # pollutant -> (unit, truncation step, (C_lo, C_hi) per band)
+    pollutants: Dict[str, Tuple[str, float, Tuple[Tuple[float, float], ...]]]
+    min_pollutants: int = 1                             # sub-indices needed for an overall index
+    requires: Tuple[str, ...] = ()                      # at least one of these must be present
+    # pollutant -> (I_lo, I_hi) per band, where its bands do not follow ``index``
+    band_index: Mapping[str, Tuple[Tuple[int, int], ...]] = {}
+
+
+US_EPA = Standard(
+    "us_epa", "US EPA",
+    ((0, 50), (51, 100), (101, 150), (151, 200), (201, 300), (301, 500)),
+    (("Good", SUCCESS_COLOR), ("Moderate", "#facc15"), ("Unhealthy for Sensitive Groups", WARNING_COLOR),
+     ("Unhealthy", "#ef4444"), ("Very Unhealthy", "#a855f7"), ("Hazardous", "#9f1239")),
+    {
+        "pm2_5": ("ug/m3", 0.1, ((0.0, 9.0), (9.1, 35.4), (35.5, 55.4), (55.5, 125.4), (125.5, 225.4), (225.5, 325.4))),
+        "pm10": ("ug/m3", 1, ((0, 54), (55, 154), (155, 254), (255, 354), (355, 424), (425, 604))),
+        # The 8-hour ozone table stops at 200 ppb (Very Unhealthy); above it EPA has the AQI
+        # taken from the 1-hour table, whose 205 ppb edge is lowered to meet the 8-hour top
+        "o3": ("ppb", 1, ((0, 54), (55, 70), (71, 85), (86, 105), (106, 200),
+                          (201, 404), (405, 504), (505, 604))),
+        "no2": ("ppb", 1, ((0, 53), (54, 100), (101, 360), (361, 649), (650, 1249), (1250, 2049))),
+        "so2": ("ppb", 1, ((0, 35), (36, 75), (76, 185), (186, 304), (305, 604), (605, 1004))),
+        "co": ("ppm", 0.1, ((0.0, 4.4), (4.5, 9.4), (9.5, 12.4), (12.5, 15.4), (15.5, 30.4), (30.5, 50.4))),
+    },
+    band_index={"o3": ((0, 50), (51, 100), (101, 150), (151, 200), (201, 300),
+                       (201, 300), (301, 400), (401, 500))},
+)
+
+# The "Severe" band is open-ended; its upper concentrations only set the slope up to 500
+IN_NAQI = Standard(
+    "in_naqi", "India NAQI",
+    ((0, 50), (51, 100), (101, 200), (201, 300), (301, 400), (401, 500)),
+    (("Good", SUCCESS_COLOR), ("Satisfactory", "#a3e635"), ("Moderately Polluted", "#facc15"),
+     ("Poor", WARNING_COLOR), ("Very Poor", "#ef4444"), ("Severe", "#9f1239")),
+    {
+        "pm2_5": ("ug/m3", 1, ((0, 30), (31, 60), (61, 90), (91, 120), (121, 250), (251, 380))),
+        "pm10": ("ug/m3", 1, ((0, 50), (51, 100), (101, 250), (251, 350), (351, 430), (431, 600))),
+        "o3": ("ug/m3", 1, ((0, 50), (51, 100), (101, 168), (169, 208), (209, 748), (749, 1000))),
+        "no2": ("ug/m3", 1, ((0, 40), (41, 80), (81, 180), (181, 280), (281, 400), (401, 800))),
+        "so2": ("ug/m3", 1, ((0, 40), (41, 80), (81, 380), (381, 800), (801, 1600), (1601, 2620))),
+        "co": ("mg/m3", 0.1, ((0.0, 1.0), (1.1, 2.0), (2.1, 10.0), (10.1, 17.0), (17.1, 34.0), (34.1, 50.0))),
+        "nh3": ("ug/m3", 1, ((0, 200), (201, 400), (401, 800), (801, 1200), (1201, 1800), (1801, 2400))),
+    },
+    min_pollutants=3,
+    requires=("pm2_5", "pm10"),
+)
+
+STANDARDS: Dict[str, Standard] = {s.name: s for s in (US_EPA, IN_NAQI)}
+
+
+class AirQuality(NamedTuple):
+    index: np.ndarray                   # overall index, NaN where it cannot be computed
+    dominant: np.ndarray                # pollutant with the highest sub-index ('' where none)
+    sub_indices: Dict[str, np.ndarray]
+
+
+def _standard(standard) -> Standard:
+    """A :class:`Standard` from itself or its name"""
+    return STANDARDS[standard if isinstance(standard, str) else standard.name]
+
+
+def to_unit(values, pollutant: str, unit: str) -> np.ndarray:
+    """Convert µg/m³ concentrations to ``unit`` (ug/m3, mg/m3, ppb or ppm)"""
+    values = np.asarray(values, dtype=np.float64)
+    if unit == "ug/m3":
+        return values
+    if unit == "mg/m3":
+        return values / 1000
+    ppb = values * MOLAR_VOLUME / MOLAR_MASS[pollutant]
+    if unit == "ppb":
+        return ppb
+    if unit == "ppm":
+        return ppb / 1000
+    raise ValueError(f"unknown unit {unit!r}")
+
+
+@lru_cache(maxsize=None)
+def _bands(name: str, pollutant: str) -> Tuple[str, float, np.ndarray, np.ndarray]:
+    """``(unit, step, concentration bounds (B, 2), index bounds (B, 2))``"""
+    standard = STANDARDS[name]
+    unit, step, bands = standard.pollutants[pollutant]
+    conc = np.array(bands, dtype=np.float64)
+    index = np.array(standard.band_index.get(pollutant, standard.index)[:len(bands)], dtype=np.float64)
+    conc.flags.writeable = index.flags.writeable = False
+    return unit, step, conc, index
+
+
+def sub_index(values, pollutant: str, standard=US_EPA) -> np.ndarray:
+    """Sub-index of µg/m³ concentrations (any shape); NaN stays NaN
+
+    Concentrations are truncated to the table's precision first, as the
+    standards prescribe, which closes the gaps between bands (9.0 | 9.1).
+    Values beyond the top band report :data:`MAX_INDEX`.
+    """
+    unit, step, conc, index = _bands(_standard(standard).name, pollutant)
+    c = to_unit(values, pollutant, unit)
+    c = np.floor(np.clip(c, 0, None) / step + 1e-6) * step
+    band = np.clip(np.searchsorted(conc[:, 0], c, side="right") - 1, 0, len(conc) - 1)
+    c_lo, c_hi = conc[band, 0], conc[band, 1]
+    i_lo, i_hi = index[band, 0], index[band, 1]
+    value = (i_hi - i_lo) / (c_hi - c_lo) * (c - c_lo) + i_lo
+    return np.rint(np.clip(value, 0, MAX_INDEX))
+
+
+def compute_aqi(components: Mapping[str, Any], standard=US_EPA) -> AirQuality:
+    """Sub-indices and overall index of every pollutant the standard covers
+
+    ``components`` maps pollutant names to µg/m³ values: the ``components``
+    dict of one sample, or a DataFrame / dict of arrays for a whole series.
+    """
+    standard = _standard(standard)
+    subs = {p: sub_index(components[p], p, standard)
+            for p in standard.pollutants if p in components}
+    if not subs:
+        return AirQuality(np.array(np.nan), np.array(""), subs)
+
+    names = list(subs)
+    stack = np.stack(np.broadcast_arrays(*subs.values()))
+    present = ~np.isnan(stack)
+    best = np.argmax(np.where(present, stack, -np.inf), axis=0)
+    index = np.take_along_axis(stack, best[None], axis=0)[0]
+
+    valid = present.sum(axis=0) >= standard.min_pollutants
+    if standard.requires:
+        valid &= present[[names.index(p) for p in standard.requires if p in subs]].any(axis=0)
+    index = np.where(valid, index, np.nan)
+    dominant = np.where(valid, np.array(names)[best], "")
+    return AirQuality(index, dominant, subs)
+
+
+def category(index, standard=US_EPA) -> np.ndarray:
+    """Band number (0 = best) of index values; -1 for NaN"""
+    standard = _standard(standard)
+    index = np.asarray(index, dtype=np.float64)
+    lows = np.array([lo for lo, _ in standard.index[1:]], dtype=np.float64)
+    bands = np.searchsorted(lows, np.rint(index), side="right")
+    return np.where(np.isnan(index), -1, bands)
+
+
+def aqi_label(index: Optional[float], standard=US_EPA) -> Tuple[str, str]:
+    """Map one index value to a (label, colour) pair"""
+    standard = _standard(standard)
+    if index is None or np.isnan(index):
+        return ("Unknown", "#888")
+    return standard.categories[int(category(index, standard))]
+
+
+def samples_frame(pollution: Payload) -> pd.DataFrame:
+    """``dt`` plus one column per component of an air pollution response's ``list``"""
+    samples = pollution.get('list') or []
+    frame = pd.DataFrame([sample.get('components', {}) for sample in samples], dtype=np.float64)
+    frame.insert(0, 'dt', pd.to_datetime([sample.get('dt') for sample in samples], unit='s'))
+    return frame
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compute regulatory AQI values for air pollution samples")
+    parser.add_argument("path", help="air_pollution JSON response (current, forecast or history) or a CSV "
+                                     "with one µg/m³ column per pollutant")
+    parser.add_argument("--standard", choices=list(STANDARDS), default=US_EPA.name)
+    parser.add_argument("--out", help="write the indices as CSV here instead of printing a summary")
+    args = parser.parse_args(argv)
+
+    if args.path.endswith(".json"):
+        with open(args.path, encoding="utf-8") as fh:
+            frame = samples_frame(json.load(fh))
+    else:
+        frame = pd.read_csv(args.path)
+    standard = STANDARDS[args.standard]
+    result = compute_aqi(frame, standard)
+
+    out = frame.assign(aqi=result.index, dominant=result.dominant,
+                       **{f"{p}_index": v for p, v in result.sub_indices.items()})
+    if args.out:
+        out.to_csv(args.out, index=False)
+        print(f"Wrote {len(out)} rows to {args.out}")
+        return 0
+
+    print(f"{standard.label}: {len(out)} samples")
+    bands = category(result.index, standard)
+    for i, (label, _) in enumerate(standard.categories):
+        count = int((bands == i).sum())
+        if count:
+            print(f"  {label}: {count}")
+    if len(out) and not np.isnan(result.index).all():
+        print(f"  max {np.nanmax(result.index):.0f}, mean {np.nanmean(result.index):.0f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
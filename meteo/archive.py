@@ -0,0 +1,310 @@
+"""Content-addressed snapshot archive of fetched payloads.
+
+Every ``current``, ``forecast`` and ``pollution`` payload is stored once
+per distinct content: its canonical JSON is hashed (SHA-256) and identical
+pulls only add a 40-byte index entry. Changed payloads are deflated with
+the previous snapshot of the same city and kind as a preset dictionary
+(``zlib`` ``zdict``), so a forecast that moved a few values costs a few
+hundred bytes rather than a full copy. Every ``max_chain``-th blob of a
+stream is stored on its own, which bounds how many blobs a read decodes.
+
+Layout::
+
+    <root>/blobs/ab/abcdef....z          header + deflate stream
+    <root>/index/<city>/<kind>.idx       (fetched_at int64, sha256) records
+    <root>/index/<city>/city.json        display name of the city
+
+``<city>`` is derived from the city key alone, so several processes (the
+dashboard and a fleet run, say) can archive into one root without sharing
+any mutable map.
+
+Enable with ``METEO_ARCHIVE_PATH`` (dashboard) or ``--archive`` (fleet), and
+inspect with ``python -m meteo.archive stats|show``.
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import struct
+import sys
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+
+from .client import WeatherClient
+from .climatology import city_slug
+from .models import Payload, WeatherData
+
+ARCHIVE_PATH = os.environ.get("METEO_ARCHIVE_PATH")
+KINDS = ("current", "forecast", "pollution")
+MAX_CHAIN = 16           # blobs decoded at most to read one snapshot
+LEVEL = 6
+DECODED_CACHE = 256      # decoded blobs kept for reads and as dictionaries
+
+HEADER = struct.Struct(">BBI32s")     # format, chain depth, raw length, base digest
+PLAIN, DELTA = 0, 1
+# Raw digest bytes; "S32" would strip trailing NULs (~1 in 256 digests)
+INDEX_DTYPE = np.dtype([("fetched_at", "<i8"), ("digest", "V32")])
+NO_BASE = b"\0" * 32
+
+
+def canonical(payload: Payload) -> bytes:
+    return json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+class SnapshotArchive:
+    """Deduplicated, delta-compressed payload history per city and kind"""
+
+    def __init__(self, root: str, max_chain: int = MAX_CHAIN, level: int = LEVEL):
+        self.root = root
+        self.max_chain = max_chain
+        self.level = level
+        self._created: Set[str] = set()                             # city directories known to exist
+        self._heads: Dict[Tuple[str, str], Optional[bytes]] = {}    # last digest per stream
+        self._decoded: OrderedDict[bytes, bytes] = OrderedDict()
+        self._lock = threading.Lock()
+
+    # ------------------ Paths ------------------
+
+    def _blob_path(self, digest: bytes) -> str:
+        name = digest.hex()
+        return os.path.join(self.root, "blobs", name[:2], name + ".z")
+
+    def _city_dir(self, city: str) -> str:
+        return os.path.join(self.root, "index", city_slug(WeatherClient.cache_key(city)))
+
+    def _index_path(self, city: str, kind: str, create: bool = False) -> Optional[str]:
+        directory = self._city_dir(city)
+        if directory not in self._created:
+            if not create:
+                return os.path.join(directory, f"{kind}.idx") if os.path.isdir(directory) else None
+            os.makedirs(directory, exist_ok=True)
+            name_path = os.path.join(directory, "city.json")
+            if not os.path.exists(name_path):
+                with open(name_path + ".tmp", "w", encoding="utf-8") as fh:
+                    json.dump({"city": city}, fh)
+                os.replace(name_path + ".tmp", name_path)
+            self._created.add(directory)
+        return os.path.join(directory, f"{kind}.idx")
+
+    def cities(self) -> List[str]:
+        index_root = os.path.join(self.root, "index")
+        try:
+            slugs = sorted(os.listdir(index_root))
+        except FileNotFoundError:
+            return []
+        names = []
+        for slug in slugs:
+            try:
+                with open(os.path.join(index_root, slug, "city.json"), encoding="utf-8") as fh:
+                    names.append(json.load(fh)["city"])
+            except FileNotFoundError:
+                pass
+        return names
+
+    # ------------------ Writing ------------------
+
+    def put(self, city: str, kind: str, payload: Payload, fetched_at: Optional[float] = None) -> str:
+        """Archive one payload; returns its hex digest"""
+        raw = canonical(payload)
+        digest = hashlib.sha256(raw).digest()
+        fetched_at = int(time.time() if fetched_at is None else fetched_at)
+        with self._lock:
+            index_path = self._index_path(city, kind, create=True)
+            stream = (WeatherClient.cache_key(city), kind)
+            if stream not in self._heads:
+                last = self._read_index(index_path)
+                self._heads[stream] = bytes(last["digest"][-1]) if len(last) else None
+            base = self._heads[stream]
+            if not os.path.exists(self._blob_path(digest)):
+                self._write_blob(digest, raw, base)
+            self._remember(digest, raw)
+            self._heads[stream] = digest
+            with open(index_path, "ab") as fh:
+                fh.write(np.array([(fetched_at, digest)], dtype=INDEX_DTYPE).tobytes())
+        return digest.hex()
+
+    def record(self, city: str, data: WeatherData, fetched_at: Optional[float] = None) -> None:
+        """Archive every payload of a fetched bundle"""
+        for kind in KINDS:
+            if data.get(kind) is not None:
+                self.put(city, kind, data[kind], fetched_at)
+
+    def _write_blob(self, digest: bytes, raw: bytes, base: Optional[bytes]) -> None:
+        fmt, depth, zdict = PLAIN, 0, None
+        if base is not None and base != digest:
+            base_depth = self._depth(base)
+            if base_depth is not None and base_depth + 1 < self.max_chain:
+                fmt, depth, zdict = DELTA, base_depth + 1, self._raw(base)
+        if zdict is not None:
+            compressor = zlib.compressobj(self.level, zlib.DEFLATED, 15, 9, zlib.Z_DEFAULT_STRATEGY, zdict)
+        else:
+            compressor = zlib.compressobj(self.level)
+        body = compressor.compress(raw) + compressor.flush()
+        header = HEADER.pack(fmt, depth, len(raw), base if fmt == DELTA else NO_BASE)
+
+        path = self._blob_path(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + ".tmp", "wb") as fh:
+            fh.write(header + body)
+        os.replace(path + ".tmp", path)
+
+    # ------------------ Reading ------------------
+
+    def _header(self, digest: bytes) -> Optional[Tuple[int, int, int, bytes]]:
+        try:
+            with open(self._blob_path(digest), "rb") as fh:
+                return HEADER.unpack(fh.read(HEADER.size))
+        except FileNotFoundError:
+            return None
+
+    def _depth(self, digest: bytes) -> Optional[int]:
+        header = self._header(digest)
+        return header[1] if header else None
+
+    def _remember(self, digest: bytes, raw: bytes) -> None:
+        self._decoded[digest] = raw
+        self._decoded.move_to_end(digest)
+        while len(self._decoded) > DECODED_CACHE:
+            self._decoded.popitem(last=False)
+
+    def _raw(self, digest: bytes) -> bytes:
+        """Canonical JSON bytes of a blob, decoding its base chain as needed"""
+        raw = self._decoded.get(digest)
+        if raw is not None:
+            self._decoded.move_to_end(digest)
+            return raw
+        with open(self._blob_path(digest), "rb") as fh:
+            data = fh.read()
+        fmt, _, length, base = HEADER.unpack_from(data)
+        if fmt == DELTA:
+            decompressor = zlib.decompressobj(15, zdict=self._raw(base))
+        else:
+            decompressor = zlib.decompressobj()
+        raw = decompressor.decompress(data[HEADER.size:]) + decompressor.flush()
+        if len(raw) != length or hashlib.sha256(raw).digest() != digest:
+            raise ValueError(f"corrupt blob {digest.hex()}")
+        self._remember(digest, raw)
+        return raw
+
+    def get(self, digest: str) -> Payload:
+        with self._lock:
+            return json.loads(self._raw(bytes.fromhex(digest)))
+
+    @staticmethod
+    def _read_index(path: Optional[str]) -> np.ndarray:
+        if path is None or not os.path.exists(path):
+            return np.empty(0, dtype=INDEX_DTYPE)
+        return np.fromfile(path, dtype=INDEX_DTYPE)
+
+    def index(self, city: str, kind: str) -> np.ndarray:
+        """``(fetched_at, digest)`` records of a stream, in write order"""
+        with self._lock:
+            return self._read_index(self._index_path(city, kind))
+
+    def at(self, city: str, kind: str, when: float) -> Optional[Payload]:
+        """Latest snapshot fetched at or before ``when``"""
+        index = self.index(city, kind)
+        order = np.argsort(index["fetched_at"], kind="stable")
+        i = np.searchsorted(index["fetched_at"][order], int(when), side="right") - 1
+        if i < 0:
+            return None
+        return self.get(bytes(index["digest"][order[i]]).hex())
+
+    def history(self, city: str, kind: str, start: Optional[float] = None,
+                end: Optional[float] = None) -> Iterator[Tuple[int, Payload]]:
+        """``(fetched_at, payload)`` in time order; repeated content is decoded once"""
+        index = self.index(city, kind)
+        index = index[np.argsort(index["fetched_at"], kind="stable")]
+        times = index["fetched_at"]
+        lo = 0 if start is None else np.searchsorted(times, int(start), side="left")
+        hi = len(index) if end is None else np.searchsorted(times, int(end), side="right")
+        last_digest, payload = None, None
+        for fetched_at, digest in index[lo:hi]:
+            digest = bytes(digest)
+            if digest != last_digest:
+                payload, last_digest = self.get(digest.hex()), digest
+            yield int(fetched_at), payload
+
+    def stats(self) -> Dict[str, float]:
+        """Snapshot count, unique blobs and raw versus stored bytes"""
+        snapshots, blobs, raw_bytes, stored_bytes, logical_bytes = 0, 0, 0, 0, 0
+        sizes: Dict[bytes, int] = {}
+        blob_root = os.path.join(self.root, "blobs")
+        for dirpath, _, files in os.walk(blob_root):
+            for name in files:
+                if name.endswith(".z"):
+                    path = os.path.join(dirpath, name)
+                    with open(path, "rb") as fh:
+                        _, _, length, _ = HEADER.unpack(fh.read(HEADER.size))
+                    sizes[bytes.fromhex(name[:-2])] = length
+                    blobs += 1
+                    raw_bytes += length
+                    stored_bytes += os.path.getsize(path)
+        index_bytes = 0
+        for dirpath, _, files in os.walk(os.path.join(self.root, "index")):
+            for name in files:
+                if name.endswith(".idx"):
+                    path = os.path.join(dirpath, name)
+                    index = np.fromfile(path, dtype=INDEX_DTYPE)
+                    snapshots += len(index)
+                    index_bytes += os.path.getsize(path)
+                    logical_bytes += sum(sizes.get(bytes(d), 0) for d in index["digest"])
+        stored = stored_bytes + index_bytes
+        return {
+            "snapshots": snapshots,
+            "unique_blobs": blobs,
+            "logical_mb": round(logical_bytes / 1e6, 3),
+            "unique_raw_mb": round(raw_bytes / 1e6, 3),
+            "stored_mb": round(stored / 1e6, 3),
+            "ratio": round(logical_bytes / stored, 1) if stored else 0.0,
+        }
+
+
+_default_archive: Optional[SnapshotArchive] = None
+_default_lock = threading.Lock()
+
+
+def default_archive() -> Optional[SnapshotArchive]:
+    """Process-wide archive at ``METEO_ARCHIVE_PATH``, or None when archiving is off"""
+    global _default_archive
+    if _default_archive is None and ARCHIVE_PATH:
+        with _default_lock:
+            if _default_archive is None:
+                _default_archive = SnapshotArchive(ARCHIVE_PATH)
+    return _default_archive
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect a snapshot archive")
+    parser.add_argument("root", help="archive directory")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("stats", help="snapshot counts and compression ratio")
+    show = sub.add_parser("show", help="print the snapshot of a city at a time")
+    show.add_argument("city")
+    show.add_argument("kind", choices=KINDS)
+    show.add_argument("--at", type=float, help="epoch seconds (default: latest)")
+    args = parser.parse_args(argv)
+
+    archive = SnapshotArchive(args.root)
+    if args.command == "stats":
+        for name, value in archive.stats().items():
+            print(f"{name}: {value}")
+        return 0
+
+    payload = archive.at(args.city, args.kind, time.time() if args.at is None else args.at)
+    if payload is None:
+        print(f"No {args.kind} snapshot for {args.city}", file=sys.stderr)
+        return 1
+    print(json.dumps(payload, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,279 @@
+"""Batched current-conditions lookups through OpenWeather's group endpoint.
+
+``/data/2.5/group?id=...`` returns current weather for up to 20 city IDs in
+one request. :class:`GroupBatcher` collects lookups arriving within a short
+window (or passed together to :meth:`GroupBatcher.current_many`), packs them
+into group calls and hands each caller its own payload.
+
+The group endpoint only takes numeric city IDs, so names are resolved
+through a :class:`CityIds` map. It learns IDs from every ``weather?q=``
+response, can be seeded from OpenWeather's ``city.list.json`` and is kept
+in ``METEO_CITY_IDS_PATH`` between runs when that is set. A name that is
+not in the map yet costs one ``weather?q=`` request, once.
+
+Forecasts and air pollution have no group endpoint and are still fetched
+per city. Current payloads are cached in the batcher itself, with the
+client's TTL, so many batched lookups never evict the client's city
+bundles.
+"""
+from __future__ import annotations
+
+import atexit
+import gzip
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .client import BASE_URL, WeatherClient, default_client
+from .models import Payload
+
+logger = logging.getLogger(__name__)
+
+GROUP_LIMIT = 20         # city IDs per group request (provider limit)
+BATCH_WINDOW = 0.05      # seconds a lookup waits for others to share its request
+LOOKUP_WORKERS = 8       # concurrent single-city requests (ID resolution, fallbacks)
+CURRENT_CACHE_SIZE = 256  # current payloads kept, apart from the client's city bundles
+CITY_IDS_PATH = os.environ.get("METEO_CITY_IDS_PATH")
+
+
+class CityIds:
+    """Thread-safe city name -> OpenWeather city ID map"""
+
+    def __init__(self, ids: Optional[Dict[str, int]] = None):
+        self._ids: Dict[str, int] = dict(ids or {})
+        self._lock = threading.Lock()
+        self.changed = False
+
+    def __len__(self):
+        return len(self._ids)
+
+    def get(self, city: str) -> Optional[int]:
+        with self._lock:
+            return self._ids.get(WeatherClient.cache_key(city))
+
+    def learn(self, city: str, payload: Optional[Payload]) -> None:
+        """Remember the ID of a ``weather?q=city`` response"""
+        if payload and payload.get("id"):
+            key = WeatherClient.cache_key(city)
+            with self._lock:
+                if self._ids.get(key) != payload["id"]:
+                    self._ids[key] = int(payload["id"])
+                    self.changed = True
+
+    def load_city_list(self, path: str) -> int:
+        """Add entries of an OpenWeather ``city.list.json(.gz)`` without overriding learned ones"""
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt", encoding="utf-8") as fh:
+            cities = json.load(fh)
+        added = 0
+        with self._lock:
+            for city in cities:
+                for name in (city["name"], f"{city['name']},{city.get('country', '')}"):
+                    key = WeatherClient.cache_key(name)
+                    if key not in self._ids:
+                        self._ids[key] = int(city["id"])
+                        added += 1
+            self.changed = self.changed or added > 0
+        return added
+
+    def save(self, path: str) -> None:
+        with self._lock:
+            ids = dict(self._ids)
+            self.changed = False
+        with open(path + ".tmp", "w", encoding="utf-8") as fh:
+            json.dump(ids, fh, sort_keys=True)
+        os.replace(path + ".tmp", path)
+
+    @classmethod
+    def load(cls, path: str) -> "CityIds":
+        with open(path, encoding="utf-8") as fh:
+            return cls(json.load(fh))
+
+
+class GroupBatcher:
+    """Coalesces current-weather lookups into group requests of up to ``max_ids`` cities"""
+
+    def __init__(self, client: Optional[WeatherClient] = None, ids: Optional[CityIds] = None,
+                 window: float = BATCH_WINDOW, max_ids: int = GROUP_LIMIT):
+        self.client = client if client is not None else default_client()
+        self.ids = ids if ids is not None else CityIds()
+        self.window = window
+        self.max_ids = max_ids
+        self.requests = 0        # upstream requests sent (group and single)
+        self._cache: OrderedDict[str, Tuple[float, Payload]] = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._pending: OrderedDict[int, List[Tuple[str, Future]]] = OrderedDict()
+        self._opened = 0.0
+        self._urgent = False
+        self._cond = threading.Condition()
+        self._executor = ThreadPoolExecutor(LOOKUP_WORKERS, thread_name_prefix="meteo-group")
+        self._thread: Optional[threading.Thread] = None
+
+    # ------------------ Cache ------------------
+
+    def cached(self, city: str) -> Optional[Payload]:
+        """``city``'s current payload if one was fetched within the client's TTL"""
+        key = WeatherClient.cache_key(city)
+        with self._cache_lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                return None
+            if time.monotonic() - entry[0] > self.client.ttl:
+                del self._cache[key]
+                return None
+            self._cache.move_to_end(key)
+            return entry[1]
+
+    def _store(self, city: str, payload: Payload) -> None:
+        key = WeatherClient.cache_key(city)
+        with self._cache_lock:
+            self._cache[key] = (time.monotonic(), payload)
+            self._cache.move_to_end(key)
+            while len(self._cache) > CURRENT_CACHE_SIZE:
+                self._cache.popitem(last=False)
+
+    # ------------------ Lookups ------------------
+
+    def submit(self, city: str, use_cache: bool = True) -> Future:
+        """Future resolving to ``city``'s current payload, or None if it is unknown"""
+        if use_cache:
+            payload = self.cached(city)
+            if payload is not None:
+                future: Future = Future()
+                future.set_result(payload)
+                return future
+        city_id = self.ids.get(city)
+        if city_id is None:
+            return self._executor.submit(self._resolve, city)
+
+        future = Future()
+        with self._cond:
+            if not self._pending:
+                self._opened = time.monotonic()
+            self._pending.setdefault(city_id, []).append((city, future))
+            self._cond.notify()
+        self._ensure_running()
+        return future
+
+    def current(self, city: str, timeout: Optional[float] = None, use_cache: bool = True) -> Optional[Payload]:
+        return self.submit(city, use_cache).result(timeout)
+
+    def current_many(self, cities: Iterable[str], timeout: Optional[float] = None,
+                     use_cache: bool = True) -> Dict[str, Optional[Payload]]:
+        """Current payloads for many cities, sent without waiting for the batch window
+
+        Cities that have not answered within ``timeout`` are left out.
+        """
+        futures = {city: self.submit(city, use_cache) for city in dict.fromkeys(cities)}
+        self.flush()
+        done, _ = wait(futures.values(), timeout=timeout)
+        results = {}
+        for city, future in futures.items():
+            if future in done and future.exception() is None:
+                results[city] = future.result()
+        return results
+
+    def flush(self) -> None:
+        """Send everything pending now instead of at the end of the window"""
+        with self._cond:
+            if self._pending:
+                self._urgent = True
+                self._cond.notify()
+
+    # ------------------ Dispatch ------------------
+
+    def _ensure_running(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            with self._cond:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name="meteo-group-batcher", daemon=True)
+                    self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                deadline = self._opened + self.window
+                while len(self._pending) < self.max_ids and not self._urgent:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = [self._pending.popitem(last=False) for _ in range(min(self.max_ids, len(self._pending)))]
+                if self._pending:
+                    self._opened = time.monotonic()
+                else:
+                    self._urgent = False
+            self._executor.submit(self._send, batch)
+
+    def _send(self, batch: Sequence[Tuple[int, List[Tuple[str, Future]]]]) -> None:
+        ids = ",".join(str(city_id) for city_id, _ in batch)
+        url = f"{BASE_URL}/data/2.5/group?id={ids}&appid={self.client.api_key}&units=metric"
+        self._count()
+        try:
+            response = self.client.session.get(url, timeout=self.client.timeout).json()
+            if "list" not in response:
+                raise ValueError(response.get("message", "group request failed"))
+        except Exception as exc:
+            # Fall back to one request per city rather than failing every caller
+            logger.warning("Group request for %d cities failed (%s); fetching them one by one", len(batch), exc)
+            for _, waiters in batch:
+                for city, future in waiters:
+                    self._executor.submit(self._settle, future, self._resolve, city)
+            return
+
+        by_id = {payload.get("id"): payload for payload in response["list"]}
+        for city_id, waiters in batch:
+            payload = by_id.get(city_id)
+            if payload is not None:
+                payload.setdefault("cod", 200)
+            for city, future in waiters:
+                if payload is not None:
+                    self._store(city, payload)
+                if not future.done():
+                    future.set_result(payload)
+
+    def _count(self) -> None:
+        with self._cond:
+            self.requests += 1
+
+    @staticmethod
+    def _settle(future: Future, fn, *args) -> None:
+        try:
+            future.set_result(fn(*args))
+        except Exception as exc:
+            future.set_exception(exc)
+
+    def _resolve(self, city: str) -> Optional[Payload]:
+        """Single ``weather?q=`` lookup that also teaches the ID map"""
+        self._count()
+        payload = self.client.fetch_current(city)
+        if payload is not None:
+            self.ids.learn(city, payload)
+            self._store(city, payload)
+        return payload
+
+
+_default_batcher: Optional[GroupBatcher] = None
+_default_lock = threading.Lock()
+
+
+def default_batcher() -> GroupBatcher:
+    """Process-wide batcher on the default client; IDs persist in ``METEO_CITY_IDS_PATH``"""
+    global _default_batcher
+    if _default_batcher is None:
+        with _default_lock:
+            if _default_batcher is None:
+                ids = CityIds()
+                if CITY_IDS_PATH:
+                    if os.path.exists(CITY_IDS_PATH):
+                        ids = CityIds.load(CITY_IDS_PATH)
+                    atexit.register(lambda: ids.changed and ids.save(CITY_IDS_PATH))
+                _default_batcher = GroupBatcher(ids=ids)
+    return _default_batcher
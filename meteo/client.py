@@ -0,0 +1,277 @@
+"""OpenWeather data client"""
+from __future__ import annotations
+
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+import requests
+
+from .models import Payload, WeatherData
+
+API_KEY = os.environ.get("OPENWEATHER_API_KEY", "67b92f0af5416edbfe58458f502b0a31")
+BASE_URL = os.environ.get("OPENWEATHER_BASE_URL", "https://api.openweathermap.org").rstrip("/")
+REQUEST_TIMEOUT = 10
+CACHE_TTL = 600  # OpenWeather refreshes current conditions roughly every 10 minutes
+CACHE_SIZE = 512
+# Upstream calls per second across all users of a client; 0 disables the limit
+RATE_LIMIT = float(os.environ.get("OPENWEATHER_RATE_LIMIT", "50"))
+# Optional archive recording every upstream response, see ``meteo.replay``
+RECORD_PATH = os.environ.get("METEO_RECORD_PATH")
+
+ErrorHandler = Callable[[Exception], None]
+
+
+def fetch_weather_data(city: str, session=None, timeout: float = REQUEST_TIMEOUT,
+                       on_error: Optional[ErrorHandler] = None,
+                       api_key: str = API_KEY, current: Optional[Payload] = None,
+                       deadline: Optional[float] = None) -> Optional[WeatherData]:
+    """Unified data fetching
+
+    Returns a dict with the raw ``current``, ``forecast`` and ``pollution``
+    payloads and their ``fetched_at`` time, or None when the city is unknown
+    or a request fails. Failures
+    are passed to ``on_error`` so callers decide how to surface them. An
+    already fetched ``current`` payload (e.g. from a group request) saves
+    its request. With a ``deadline`` (``time.monotonic()`` value) each
+    request's timeout is cut to the time left, and a request that would
+    start after it fails with :class:`requests.Timeout` instead.
+    """
+    http = session or requests
+
+    def limit() -> float:
+        if deadline is None:
+            return timeout
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise requests.Timeout(f"deadline passed while fetching {city}")
+        return min(timeout, remaining)
+
+    curr_url = f"{BASE_URL}/data/2.5/weather?q={city}&appid={api_key}&units=metric"
+    fore_url = f"{BASE_URL}/data/2.5/forecast?q={city}&appid={api_key}&units=metric"
+
+    try:
+        curr_res = current if current is not None else http.get(curr_url, timeout=limit()).json()
+        fore_res = http.get(fore_url, timeout=limit()).json()
+
+        if curr_res.get("cod") != 200 or str(fore_res.get("cod")) != "200":
+            return None
+
+        lat, lon = curr_res['coord']['lat'], curr_res['coord']['lon']
+
+        # Air Pollution
+        poll_url = f"{BASE_URL}/data/2.5/air_pollution?lat={lat}&lon={lon}&appid={api_key}"
+        poll_res = http.get(poll_url, timeout=limit()).json()
+
+        return {
+            "current": curr_res,
+            "forecast": fore_res,
+            "pollution": poll_res,
+            "fetched_at": time.time(),
+        }
+    except Exception as e:
+        if on_error is not None:
+            on_error(e)
+        return None
+
+
+def current_pollution(data: WeatherData) -> Optional[Payload]:
+    """Latest air pollution sample of a fetched bundle, if any"""
+    return data['pollution']['list'][0] if data['pollution'].get('list') else None
+
+
+def payload_nbytes(obj) -> int:
+    """Approximate memory held by a decoded JSON payload, containers and values included"""
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(payload_nbytes(k) + payload_nbytes(v) for k, v in obj.items())
+    elif isinstance(obj, list):
+        size += sum(payload_nbytes(v) for v in obj)
+    return size
+
+
+class RateLimiter:
+    """Thread-safe token bucket: ``rate`` calls per second with bursts of ``burst``"""
+
+    def __init__(self, rate: float, burst: Optional[int] = None):
+        self.rate = rate
+        self.burst = burst or max(1, int(rate))
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class RateLimitedSession:
+    """Session wrapper that takes a token before every GET"""
+
+    def __init__(self, session, limiter: RateLimiter):
+        self.session = session
+        self.limiter = limiter
+
+    def get(self, url, **kwargs):
+        self.limiter.acquire()
+        return self.session.get(url, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.session, name)
+
+
+class WeatherClient:
+    """Thread-safe client with a shared session and a TTL cache per city
+
+    One instance is meant to be shared by every dashboard session, worker and
+    batch job in a process, so repeated lookups of a city within ``ttl``
+    seconds cost no upstream requests. Consumers that keep their own copy of
+    the forecast (:class:`~meteo.store.ForecastStore`) call
+    :meth:`release_forecast` so the raw forecast JSON, by far the largest
+    payload, is not held twice.
+    """
+
+    def __init__(self, session=None, api_key: str = API_KEY, timeout: float = REQUEST_TIMEOUT,
+                 ttl: float = CACHE_TTL, max_entries: int = CACHE_SIZE,
+                 rate_limit: Optional[float] = RATE_LIMIT):
+        self.session = session or requests.Session()
+        if rate_limit:
+            self.session = RateLimitedSession(self.session, RateLimiter(rate_limit))
+        self.api_key = api_key
+        self.timeout = timeout
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._cache: OrderedDict[str, tuple[float, WeatherData]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def cache_key(city: str) -> str:
+        return " ".join(city.split()).lower()
+
+    def cached(self, city: str) -> Optional[WeatherData]:
+        """Return the cached bundle for ``city`` if it is still fresh"""
+        key = self.cache_key(city)
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                return None
+            if time.monotonic() - entry[0] > self.ttl:
+                del self._cache[key]
+                return None
+            self._cache.move_to_end(key)
+            return entry[1]
+
+    def store(self, city: str, data: WeatherData) -> None:
+        key = self.cache_key(city)
+        with self._lock:
+            self._cache[key] = (time.monotonic(), data)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+    def fetch(self, city: str, timeout: Optional[float] = None,
+              on_error: Optional[ErrorHandler] = None,
+              current: Optional[Payload] = None,
+              deadline: Optional[float] = None) -> Optional[WeatherData]:
+        """Cached equivalent of :func:`fetch_weather_data`"""
+        data = self.cached(city)
+        if data is not None:
+            if 'forecast' in data:
+                return data
+            # Forecast released after ingest: only its requests are repeated
+            current = data['current'] if current is None else current
+        data = fetch_weather_data(city, session=self.session,
+                                  timeout=self.timeout if timeout is None else timeout,
+                                  on_error=on_error, api_key=self.api_key, current=current,
+                                  deadline=deadline)
+        if data is not None:
+            self.store(city, data)
+        return data
+
+    def release_forecast(self, city: str) -> None:
+        """Drop the raw forecast from a cached bundle, keeping current conditions and pollution"""
+        key = self.cache_key(city)
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None and 'forecast' in entry[1]:
+                self._cache[key] = (entry[0], {k: v for k, v in entry[1].items() if k != 'forecast'})
+
+    def cached_nbytes(self, city: str) -> int:
+        """Approximate memory retained by the cache entry of ``city`` (0 when not cached)"""
+        with self._lock:
+            entry = self._cache.get(self.cache_key(city))
+        return payload_nbytes(entry[1]) if entry is not None else 0
+
+    def fetch_current(self, city: str, timeout: Optional[float] = None) -> Optional[Payload]:
+        """Uncached current conditions for ``city``, or None if it is unknown
+
+        One request instead of the three of :meth:`fetch`, for pollers that
+        only need to notice new observations.
+        """
+        url = f"{BASE_URL}/data/2.5/weather?q={city}&appid={self.api_key}&units=metric"
+        payload = self.session.get(url, timeout=self.timeout if timeout is None else timeout).json()
+        return payload if str(payload.get("cod")) == "200" else None
+
+    def _cached_json(self, key: str, url: str, timeout: Optional[float] = None, cache: bool = True) -> Payload:
+        payload = self.cached(key) if cache else None
+        if payload is None:
+            payload = self.session.get(url, timeout=self.timeout if timeout is None else timeout).json()
+            if cache and str(payload.get("cod", 200)) == "200":
+                self.store(key, payload)
+        return payload
+
+    def current_at(self, lat: float, lon: float, timeout: Optional[float] = None,
+                   cache: bool = True) -> Payload:
+        """Current weather at a coordinate (rounded to ~100 m)
+
+        ``cache=False`` bypasses the shared LRU, for callers that keep
+        their own (the regional grid's tiles) and would otherwise evict
+        the city bundles.
+        """
+        lat, lon = round(lat, 3), round(lon, 3)
+        url = f"{BASE_URL}/data/2.5/weather?lat={lat}&lon={lon}&appid={self.api_key}&units=metric"
+        return self._cached_json(f"weather@{lat},{lon}", url, timeout, cache)
+
+    def pollution_at(self, lat: float, lon: float, timeout: Optional[float] = None,
+                     cache: bool = True) -> Payload:
+        """Air pollution sample at a coordinate (rounded to ~100 m); ``cache`` as in :meth:`current_at`"""
+        lat, lon = round(lat, 3), round(lon, 3)
+        url = f"{BASE_URL}/data/2.5/air_pollution?lat={lat}&lon={lon}&appid={self.api_key}"
+        return self._cached_json(f"pollution@{lat},{lon}", url, timeout, cache)
+
+    def invalidate(self, city: Optional[str] = None) -> None:
+        """Drop one city from the cache, or everything when ``city`` is None"""
+        with self._lock:
+            if city is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(self.cache_key(city), None)
+
+
+_default_client: Optional[WeatherClient] = None
+_default_lock = threading.Lock()
+
+
+def default_client() -> WeatherClient:
+    """Process-wide client shared by the dashboard, API and batch jobs"""
+    global _default_client
+    if _default_client is None:
+        with _default_lock:
+            if _default_client is None:
+                session = None
+                if RECORD_PATH:
+                    from .replay import recording_session
+                    session = recording_session(requests.Session(), RECORD_PATH)
+                _default_client = WeatherClient(session=session)
+    return _default_client
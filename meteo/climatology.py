@@ -0,0 +1,309 @@
+"""Climatological baselines: what is normal for a city, date and hour.
+
+Historical observations (CSV exports with ``city``, a time column and any
+of the forecast variables) are reduced once to percentile tables of shape
+``(366 days, 24 hours, p10/p50/p90)`` per city and variable. Each cell pools
+observations within a few days and an hour of it, so a decade of hourly
+data gives well over 100 samples per cell. Tables are saved as ``.npy`` and
+opened memory-mapped, so a lookup is an index into a page-cached file and
+the dashboard never loads more than it touches::
+
+    python -m meteo.climatology build observations.csv --out climatology --utc-offset 19800
+
+``build`` streams the files through :mod:`meteo.ingest` partitions, so even
+multi-gigabyte exports are read in chunks; tables are then built one city
+at a time from the memory-mapped columns.
+
+Times are local wall-clock time: ``timestamp`` columns are taken as local,
+epoch ``dt`` columns are shifted by a ``timezone`` column (seconds east of
+UTC, as in OpenWeather payloads) or by ``--utc-offset``.
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import tempfile
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .client import WeatherClient
+
+CLIMATOLOGY_PATH = os.environ.get("METEO_CLIMATOLOGY_PATH", "climatology")
+VARIABLES = ("temp", "humidity", "pressure", "wind_speed")
+QUANTILES = (0.1, 0.5, 0.9)
+DAYS, HOURS = 366, 24
+DAY_WINDOW = 7           # pool observations within +/- this many days of a cell
+HOUR_WINDOW = 1          # ... and within +/- this many hours
+MIN_SAMPLES = 20         # cells with fewer pooled samples stay NaN
+INDEX_FILE = "index.json"
+
+
+def local_calendar(local_seconds) -> Tuple[np.ndarray, np.ndarray]:
+    """``(day_of_year, hour)`` of local wall-clock times given as epoch-like seconds"""
+    idx = pd.to_datetime(np.asarray(local_seconds, dtype=np.int64), unit="s")
+    return idx.dayofyear.to_numpy(np.int64), idx.hour.to_numpy(np.int64)
+
+
+def percentile_table(doy: np.ndarray, hour: np.ndarray, values: np.ndarray,
+                     day_window: int = DAY_WINDOW, hour_window: int = HOUR_WINDOW,
+                     min_samples: int = MIN_SAMPLES) -> np.ndarray:
+    """``(366, 24, len(QUANTILES))`` float32 table of pooled percentiles
+
+    Every observation is counted in each cell within the day/hour window
+    (wrapping around the year and the day), then all cells are sorted at
+    once and percentiles read off with linear interpolation, as
+    :func:`numpy.percentile` does.
+    """
+    values = np.asarray(values, dtype=np.float32)
+    ok = np.isfinite(values)
+    doy, hour, values = np.asarray(doy)[ok], np.asarray(hour)[ok], values[ok]
+    table = np.full((DAYS * HOURS, len(QUANTILES)), np.nan, dtype=np.float32)
+    if not len(values):
+        return table.reshape(DAYS, HOURS, -1)
+
+    dd = np.arange(-day_window, day_window + 1)
+    dh = np.arange(-hour_window, hour_window + 1)
+    days = (doy[:, None, None] - 1 + dd[None, :, None]) % DAYS
+    hours = (hour[:, None, None] + dh[None, None, :]) % HOURS
+    cells = (days * HOURS + hours).ravel()
+    pooled = np.broadcast_to(values[:, None, None], (len(values), len(dd), len(dh))).ravel()
+
+    order = np.lexsort((pooled, cells))
+    pooled = pooled[order]
+    counts = np.bincount(cells, minlength=DAYS * HOURS)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    filled = counts >= max(min_samples, 1)
+    n, start = counts[filled], starts[filled]
+    for j, q in enumerate(QUANTILES):
+        pos = q * (n - 1)
+        lo = np.floor(pos).astype(np.int64)
+        hi = np.minimum(lo + 1, n - 1)
+        a, b = pooled[start + lo], pooled[start + hi]
+        table[filled, j] = a + (pos - lo) * (b - a)
+    return table.reshape(DAYS, HOURS, -1)
+
+
+def band_label(value: float, p10: float, p90: float) -> str:
+    if value < p10:
+        return "below normal"
+    if value > p90:
+        return "above normal"
+    return "near normal"
+
+
+def city_slug(key: str) -> str:
+    """Filesystem-safe, collision-free file name for a city key"""
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:8]
+    return f"{re.sub(r'[^a-z0-9]+', '_', key).strip('_')[:40]}_{digest}"
+
+
+class ClimatologyStore:
+    """Directory of per-city memory-mapped percentile tables"""
+
+    def __init__(self, root: str = CLIMATOLOGY_PATH):
+        self.root = root
+        self._index: Optional[Dict[str, Dict]] = None
+        self._index_mtime: Optional[int] = None
+        self._tables: Dict[str, np.ndarray] = {}
+        self._lock = threading.Lock()
+
+    # ------------------ Index ------------------
+
+    def _load_index(self) -> Dict[str, Dict]:
+        """The city index, re-read whenever a build elsewhere has replaced it"""
+        path = os.path.join(self.root, INDEX_FILE)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if self._index is None or mtime != self._index_mtime:
+            try:
+                with open(path, encoding="utf-8") as fh:
+                    self._index = json.load(fh)["cities"]
+            except FileNotFoundError:
+                self._index, mtime = {}, None
+            self._index_mtime = mtime
+            self._tables.clear()
+        return self._index
+
+    def _save_index(self) -> None:
+        path = os.path.join(self.root, INDEX_FILE)
+        with open(path + ".tmp", "w", encoding="utf-8") as fh:
+            json.dump({"variables": list(VARIABLES), "quantiles": list(QUANTILES), "cities": self._index},
+                      fh, indent=1, sort_keys=True)
+        os.replace(path + ".tmp", path)
+        self._index_mtime = os.stat(path).st_mtime_ns
+
+    def cities(self) -> List[str]:
+        with self._lock:
+            return [entry["city"] for entry in self._load_index().values()]
+
+    def info(self, city: str) -> Optional[Dict]:
+        with self._lock:
+            entry = self._load_index().get(WeatherClient.cache_key(city))
+            return dict(entry) if entry else None
+
+    # ------------------ Building ------------------
+
+    def build(self, city: str, local_seconds, columns: Dict[str, np.ndarray], **window) -> int:
+        """Replace ``city``'s tables with ones built from local-time observations
+
+        Returns the number of observations used. ``window`` is passed on to
+        :func:`percentile_table`.
+        """
+        local_seconds = np.asarray(local_seconds, dtype=np.int64)
+        doy, hour = local_calendar(local_seconds)
+        tables = np.full((len(VARIABLES), DAYS, HOURS, len(QUANTILES)), np.nan, dtype=np.float32)
+        for v, name in enumerate(VARIABLES):
+            if name in columns:
+                tables[v] = percentile_table(doy, hour, columns[name], **window)
+
+        key = WeatherClient.cache_key(city)
+        filename = city_slug(key) + ".npy"
+        os.makedirs(self.root, exist_ok=True)
+        path = os.path.join(self.root, filename)
+        # Write beside and swap in, so open memory maps keep their (old) file
+        with open(path + ".tmp", "wb") as fh:
+            np.save(fh, tables)
+        os.replace(path + ".tmp", path)
+
+        with self._lock:
+            self._load_index()[key] = {
+                "city": city, "file": filename, "samples": int(len(local_seconds)),
+                "first": int(local_seconds.min()) if len(local_seconds) else None,
+                "last": int(local_seconds.max()) if len(local_seconds) else None,
+                "variables": [name for name in VARIABLES if name in columns],
+            }
+            self._tables.pop(key, None)
+            self._save_index()
+        return int(len(local_seconds))
+
+    def build_frame(self, frame: pd.DataFrame, city: Optional[str] = None, utc_offset: int = 0,
+                    **window) -> Dict[str, int]:
+        """Build tables for every city in an observation frame; returns samples per city"""
+        local = observation_times(frame, utc_offset)
+        cities = frame["city"].astype("string") if "city" in frame.columns else pd.Series(city, index=frame.index)
+        if cities.isna().any():
+            raise ValueError("observations need a 'city' column or an explicit city")
+        keys = cities.map(WeatherClient.cache_key).to_numpy()
+        values = {v: pd.to_numeric(frame[v], errors="coerce").to_numpy(np.float64)
+                  for v in VARIABLES if v in frame.columns}
+        built = {}
+        for positions in pd.Series(keys).groupby(keys, sort=False).indices.values():
+            label = cities.iloc[positions[0]]
+            columns = {v: column[positions] for v, column in values.items()}
+            built[label] = self.build(label, local[positions], columns, **window)
+        return built
+
+    # ------------------ Lookups ------------------
+
+    def table(self, city: str) -> Optional[np.ndarray]:
+        """Memory-mapped ``(variable, day, hour, quantile)`` array, or None"""
+        key = WeatherClient.cache_key(city)
+        with self._lock:
+            table = self._tables.get(key)
+            if table is None:
+                entry = self._load_index().get(key)
+                if entry is None:
+                    return None
+                try:
+                    table = np.load(os.path.join(self.root, entry["file"]), mmap_mode="r")
+                except FileNotFoundError:
+                    return None
+                self._tables[key] = table
+            return table
+
+    def normals(self, city: str, epochs, utc_offset: int = 0, variable: str = "temp") -> Optional[np.ndarray]:
+        """``(n, 3)`` p10/p50/p90 for UTC epochs in a city ``utc_offset`` seconds east of UTC"""
+        table = self.table(city)
+        if table is None:
+            return None
+        doy, hour = local_calendar(np.asarray(epochs, dtype=np.int64) + int(utc_offset))
+        return np.asarray(table[VARIABLES.index(variable), doy - 1, hour], dtype=np.float64)
+
+    def classify(self, city: str, epoch: int, value: float, utc_offset: int = 0,
+                 variable: str = "temp") -> Optional[Tuple[str, np.ndarray]]:
+        """``(label, [p10, p50, p90])`` of one observation, or None without a baseline"""
+        normals = self.normals(city, [epoch], utc_offset, variable)
+        if normals is None or not np.isfinite(normals[0]).all():
+            return None
+        p10, _, p90 = normals[0]
+        return band_label(value, p10, p90), normals[0]
+
+
+def observation_times(frame: pd.DataFrame, utc_offset: int = 0) -> np.ndarray:
+    """Local wall-clock seconds of each observation row"""
+    if "dt" in frame.columns:
+        offset = frame["timezone"].fillna(utc_offset) if "timezone" in frame.columns else utc_offset
+        return (pd.to_numeric(frame["dt"]) + offset).to_numpy(np.int64)
+    if "timestamp" in frame.columns:
+        stamps = pd.to_datetime(frame["timestamp"])
+        return ((stamps - pd.Timestamp(0)) // pd.Timedelta(seconds=1)).to_numpy(np.int64)
+    raise ValueError("observations need a 'dt' (epoch seconds) or 'timestamp' column")
+
+
+_default_climatology: Optional[ClimatologyStore] = None
+_default_lock = threading.Lock()
+
+
+def default_climatology() -> ClimatologyStore:
+    """Process-wide store over ``METEO_CLIMATOLOGY_PATH`` (default ``climatology/``)"""
+    global _default_climatology
+    if _default_climatology is None:
+        with _default_lock:
+            if _default_climatology is None:
+                _default_climatology = ClimatologyStore()
+    return _default_climatology
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build climatology percentile tables from observations")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build = sub.add_parser("build", help="build (or rebuild) tables from observation CSVs")
+    build.add_argument("files", nargs="+", help="CSV files with a time column ('dt' or 'timestamp') "
+                                                "and any of: " + ", ".join(VARIABLES))
+    build.add_argument("--out", default=CLIMATOLOGY_PATH, help="table directory")
+    build.add_argument("--city", help="city name for files without a 'city' column")
+    build.add_argument("--utc-offset", type=int, default=0,
+                       help="seconds east of UTC for 'dt' rows without a 'timezone' column")
+    build.add_argument("--day-window", type=int, default=DAY_WINDOW)
+    build.add_argument("--hour-window", type=int, default=HOUR_WINDOW)
+    build.add_argument("--min-samples", type=int, default=MIN_SAMPLES)
+    build.add_argument("--partitions", help="keep the imported observations in this partition directory "
+                                            "(default: a temporary one)")
+
+    show = sub.add_parser("show", help="list cities with tables")
+    show.add_argument("--out", default=CLIMATOLOGY_PATH, help="table directory")
+    args = parser.parse_args(argv)
+
+    store = ClimatologyStore(args.out)
+    if args.command == "show":
+        for city in store.cities():
+            info = store.info(city)
+            print(f"{city}: {info['samples']} observations ({', '.join(info['variables'])})")
+        return 0
+
+    # Stream the files into columnar partitions first: memory is bounded by the import chunk and
+    # one city's history, not by the size of the files
+    from .ingest import PartitionStore, build_climatology, ingest
+    with tempfile.TemporaryDirectory(prefix="climatology-") as scratch:
+        partitions = PartitionStore(args.partitions or scratch)
+        stats = ingest(args.files, partitions, city=args.city, utc_offset=args.utc_offset)
+        built = build_climatology(partitions, store, stats["cities"], day_window=args.day_window,
+                                  hour_window=args.hour_window, min_samples=args.min_samples)
+    for city, samples in built.items():
+        print(f"{city}: {samples} observations")
+    print(f"Tables for {len(built)} cities written to {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,141 @@
+"""Compact in-memory storage for processed forecast frames.
+
+A ``process_forecast`` frame keeps Python ``datetime``/``date`` objects and
+object-dtype condition strings, which costs several KB per city. The compact
+form keeps the same information in a few contiguous arrays:
+
+* ``epoch``: int32 seconds since 1970 (UTC)
+* ``values``: float32 block, one column per entry of ``MEASURES``
+* ``weather``/``description``: uint16 codes into a process-wide vocabulary
+
+``date`` and ``hour`` are not stored; they are derived when a frame is
+materialized with :meth:`CompactForecast.to_frame`.
+"""
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Sequence
+
+import numpy as np
+import pandas as pd
+from dateutil.tz import tzlocal
+
+from .models import Payload
+
+MEASURES = ("temp", "feels_like", "humidity", "pressure", "wind_speed", "clouds")
+# Measures that OpenWeather reports as integers; restored as int64 on materialization
+INTEGER_MEASURES = ("humidity", "pressure", "clouds")
+FRAME_COLUMNS = ["timestamp", *MEASURES, "weather", "description", "date", "hour"]
+
+
+class Vocabulary:
+    """Process-wide string dictionary shared by every compact frame"""
+
+    def __init__(self):
+        self._labels: List[str] = []
+        self._codes: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def encode(self, values: Sequence[str]) -> np.ndarray:
+        codes = np.empty(len(values), dtype=np.uint16)
+        for i, value in enumerate(values):
+            code = self._codes.get(value)
+            if code is None:
+                with self._lock:
+                    code = self._codes.get(value)
+                    if code is None:
+                        code = len(self._labels)
+                        if code > np.iinfo(np.uint16).max:
+                            raise OverflowError("condition vocabulary is full")
+                        self._labels.append(value)
+                        self._codes[value] = code
+            codes[i] = code
+        return codes
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        return np.asarray(self._labels, dtype=object)[codes]
+
+    def __len__(self):
+        return len(self._labels)
+
+
+VOCABULARY = Vocabulary()
+
+
+@dataclass(frozen=True)
+class CompactForecast:
+    epoch: np.ndarray        # int32, shape (n,)
+    values: np.ndarray       # float32, shape (n, len(MEASURES))
+    weather: np.ndarray      # uint16 codes, shape (n,)
+    description: np.ndarray  # uint16 codes, shape (n,)
+
+    @classmethod
+    def from_payload(cls, forecast_data: Payload) -> "CompactForecast":
+        """Build directly from the raw OpenWeather forecast payload"""
+        items = forecast_data['list']
+        n = len(items)
+        epoch = np.empty(n, dtype=np.int32)
+        values = np.empty((n, len(MEASURES)), dtype=np.float32)
+        weather, description = [], []
+        for i, item in enumerate(items):
+            main = item['main']
+            epoch[i] = item['dt']
+            values[i] = (main['temp'], main['feels_like'], main['humidity'], main['pressure'],
+                         item['wind']['speed'], item['clouds']['all'])
+            weather.append(item['weather'][0]['main'])
+            description.append(item['weather'][0]['description'])
+        return cls(epoch, values, VOCABULARY.encode(weather), VOCABULARY.encode(description))
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "CompactForecast":
+        """Compress a ``process_forecast`` frame"""
+        timestamps = df['timestamp'].dt.tz_localize(tzlocal(), ambiguous='NaT', nonexistent='shift_forward')
+        epoch = (timestamps.astype('int64') // 10**9).to_numpy(dtype=np.int32)
+        values = df[list(MEASURES)].to_numpy(dtype=np.float32)
+        return cls(epoch, np.ascontiguousarray(values),
+                   VOCABULARY.encode(df['weather'].tolist()),
+                   VOCABULARY.encode(df['description'].tolist()))
+
+    def __len__(self):
+        return len(self.epoch)
+
+    @property
+    def nbytes(self) -> int:
+        return self.epoch.nbytes + self.values.nbytes + self.weather.nbytes + self.description.nbytes
+
+    def column(self, name: str) -> np.ndarray:
+        """One measure as a float32 view, without materializing a frame"""
+        return self.values[:, MEASURES.index(name)]
+
+    def timestamps(self) -> pd.DatetimeIndex:
+        """Local, timezone-naive timestamps, as ``process_forecast`` produces them"""
+        utc = pd.to_datetime(self.epoch.astype(np.int64), unit='s', utc=True)
+        return utc.tz_convert(tzlocal()).tz_localize(None)
+
+    def to_frame(self) -> pd.DataFrame:
+        """Materialize the same frame ``process_forecast`` would have built"""
+        timestamps = self.timestamps()
+        data = {"timestamp": timestamps}
+        for idx, name in enumerate(MEASURES):
+            column = self.values[:, idx]
+            # OpenWeather reports two decimals at most, so rounding undoes the float32 error
+            data[name] = (np.rint(column).astype(np.int64) if name in INTEGER_MEASURES
+                          else np.round(column.astype(np.float64), 2))
+        data["weather"] = VOCABULARY.decode(self.weather)
+        data["description"] = VOCABULARY.decode(self.description)
+        data["date"] = timestamps.date
+        data["hour"] = timestamps.hour.astype(np.int32)
+        return pd.DataFrame(data, columns=FRAME_COLUMNS)
+
+
+def frame_nbytes(df: pd.DataFrame) -> int:
+    """Deep memory footprint of a frame, including Python objects"""
+    return int(df.memory_usage(deep=True).sum())
+
+
+def footprint(df: pd.DataFrame) -> Dict[str, float]:
+    """Bytes used by one city's frame before and after compaction"""
+    before = frame_nbytes(df)
+    after = CompactForecast.from_frame(df).nbytes
+    return {"frame_bytes": before, "compact_bytes": after, "ratio": round(before / after, 1)}
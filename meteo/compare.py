@@ -0,0 +1,89 @@
+"""Multi-city comparison math"""
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Dict, Iterable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .client import current_pollution
+from .models import CityConditions, Payload, WeatherData
+from .units import CELSIUS, convert_temp
+
+if TYPE_CHECKING:
+    from .store import CityRecord
+
+RADAR_CATEGORIES = ['Temperature', 'Humidity', 'Pressure', 'Wind Speed', 'Air Quality (AQI)']
+
+
+def _conditions(city: str, cw: Payload, poll: Optional[Payload], unit: str) -> CityConditions:
+    return CityConditions(
+        city=city.title(),
+        temperature=convert_temp(cw['main']['temp'], unit),
+        feels_like=convert_temp(cw['main']['feels_like'], unit),
+        humidity=cw['main']['humidity'],
+        pressure=cw['main']['pressure'],
+        wind_speed=cw['wind']['speed'],
+        aqi=poll['main']['aqi'] if poll else None,
+        weather=cw['weather'][0]['main'],
+    )
+
+
+def city_conditions(city: str, data: WeatherData, unit: str) -> CityConditions:
+    """Extract the comparable current conditions of one city"""
+    return _conditions(city, data['current'], current_pollution(data), unit)
+
+
+def record_conditions(record: CityRecord, unit: str) -> CityConditions:
+    """Comparable current conditions of a stored city record"""
+    return _conditions(record.city, record.current, record.pollution, unit)
+
+
+def comparison_frame(conditions: Iterable[CityConditions]) -> pd.DataFrame:
+    """Comparison table with one row per city"""
+    return pd.DataFrame([c.as_row() for c in conditions])
+
+
+def radar_ranges(unit: str) -> Dict[str, Tuple[float, float]]:
+    """Absolute ranges used to put every variable on a 0-100 scale"""
+    return {
+        'Temperature': (0, 50) if unit == CELSIUS else (32, 122),
+        'Humidity': (0, 100),
+        'Pressure': (950, 1050),
+        'Wind Speed': (0, 20),
+        'AQI': (1, 5)
+    }
+
+
+def normalize_columns(columns: Dict[str, np.ndarray],
+                      ranges: Dict[str, Tuple[float, float]]) -> Dict[str, np.ndarray]:
+    """``<column>_norm`` arrays of clamped 0-100 scores for the columns present"""
+    normalized = {}
+    for col, (min_val, max_val) in ranges.items():
+        if col in columns:
+            # Clamp values to ranges and normalize to 0-100
+            vals = np.clip(np.asarray(columns[col], dtype=np.float64), min_val, max_val)
+            normalized[f'{col}_norm'] = (vals - min_val) / (max_val - min_val) * 100
+    return normalized
+
+
+def normalize_comparison(comp_df: pd.DataFrame, unit: str) -> pd.DataFrame:
+    """Add ``<column>_norm`` columns holding clamped 0-100 scores"""
+    radar_df = comp_df.copy()
+    columns = {col: radar_df[col].to_numpy() for col in radar_ranges(unit) if col in radar_df.columns}
+    for name, values in normalize_columns(columns, radar_ranges(unit)).items():
+        radar_df[name] = values
+    return radar_df
+
+
+def radar_values(row) -> list:
+    """Closed polygon of normalized scores for one city (first value repeated)"""
+    r_values = [
+        row.get('Temperature_norm', 0),
+        row.get('Humidity_norm', 0),
+        row.get('Pressure_norm', 0),
+        row.get('Wind Speed_norm', 0),
+        row.get('AQI_norm', 0) if pd.notnull(row.get('AQI_norm')) else 0
+    ]
+    r_values.append(r_values[0])
+    return r_values
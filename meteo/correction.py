@@ -0,0 +1,186 @@
+"""Statistical forecast correction: per-city bias model and uncertainty bands.
+
+For each city the error ``observed - forecast`` is regressed by least
+squares on lead time and a daily harmonic of the valid hour::
+
+    error ~ b0 + b1 * lead_days + b2 * sin(2*pi*h/24) + b3 * cos(2*pi*h/24)
+
+and the spread of the residuals on lead time, ``E|r| ~ s0 + s1 * lead_days``.
+Each city's samples are reduced to normal-equation sums (a 4x4 ``XᵀX``
+and a 4-vector ``Xᵀy``), so memory does not grow with the longest history,
+and all cities are solved in a single batched call. Fitted coefficients
+are cached and refitted on a background thread, so correcting a forecast
+for display is a dictionary lookup plus a few vector operations.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+from scipy import stats
+
+from .history import ForecastHistory
+from .store import default_store
+
+logger = logging.getLogger(__name__)
+
+MIN_SAMPLES = 24
+RIDGE = 1e-3
+MIN_SIGMA = 0.3            # °C; floor for very consistent forecasts
+DEFAULT_COVERAGE = 0.8     # central probability covered by the bands
+REFIT_INTERVAL = 3600.0    # seconds between refits of a changed history
+
+Pairs = Tuple[np.ndarray, np.ndarray, np.ndarray]
+
+
+def design_matrix(lead_hours, hour) -> np.ndarray:
+    """Bias features ``[1, lead_days, sin(hour), cos(hour)]`` along the last axis"""
+    lead_hours = np.asarray(lead_hours, dtype=np.float64)
+    angle = 2 * np.pi * np.asarray(hour, dtype=np.float64) / 24.0
+    return np.stack([np.ones_like(lead_hours), lead_hours / 24.0, np.sin(angle), np.cos(angle)], axis=-1)
+
+
+@lru_cache(maxsize=16)
+def band_z(coverage: float) -> float:
+    """Normal quantile for a central band of the given coverage"""
+    return float(stats.norm.ppf(0.5 + coverage / 2))
+
+
+def _batched_solve(xtx: np.ndarray, xty: np.ndarray, ridge: float = RIDGE) -> np.ndarray:
+    """Solve ridge-stabilized normal equations for every city at once
+
+    ``xtx`` is ``(C, K, K)`` and ``xty`` is ``(C, K)``; returns ``(C, K)``.
+    """
+    return np.linalg.solve(xtx + ridge * np.eye(xtx.shape[-1]), xty[..., None])[..., 0]
+
+
+@dataclass(frozen=True)
+class CorrectionModel:
+    cities: Dict[str, int]
+    bias_coef: np.ndarray     # (C, 4)
+    spread_coef: np.ndarray   # (C, 2), mean absolute residual on [1, lead_days]
+    samples: np.ndarray       # (C,)
+    fitted_at: float
+
+    def __contains__(self, city: str) -> bool:
+        return _key(city) in self.cities
+
+    def correct(self, city: str, lead_hours, hour, forecast,
+                coverage: float = DEFAULT_COVERAGE) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """Bias-corrected forecast and its ``(lower, upper)`` band, or None if unfitted"""
+        idx = self.cities.get(_key(city))
+        if idx is None:
+            return None
+        X = design_matrix(lead_hours, hour)
+        corrected = np.asarray(forecast, dtype=np.float64) + X @ self.bias_coef[idx]
+        mean_abs = X[..., :2] @ self.spread_coef[idx]
+        # For normal residuals E|r| = sigma * sqrt(2/pi)
+        sigma = np.maximum(mean_abs * np.sqrt(np.pi / 2), MIN_SIGMA)
+        half_width = band_z(coverage) * sigma
+        return corrected, corrected - half_width, corrected + half_width
+
+
+def _key(city: str) -> str:
+    return " ".join(city.split()).lower()
+
+
+def fit_corrections(pairs_by_city: Dict[str, Pairs], min_samples: int = MIN_SAMPLES) -> CorrectionModel:
+    """Fit bias and spread models for every city with enough matched pairs"""
+    usable = {_key(c): p for c, p in pairs_by_city.items() if len(p[2]) >= min_samples}
+    names = sorted(usable)
+    if not names:
+        return CorrectionModel({}, np.empty((0, 4)), np.empty((0, 2)), np.empty(0, int), time.time())
+
+    # Sums per city, one city's design matrix at a time
+    xtx, xty = np.empty((len(names), 4, 4)), np.empty((len(names), 4))
+    for i, city in enumerate(names):
+        lead, hour, err = usable[city]
+        X = design_matrix(lead, hour)
+        xtx[i], xty[i] = X.T @ X, X.T @ err
+    bias = _batched_solve(xtx, xty)
+
+    stx, sty = np.empty((len(names), 2, 2)), np.empty((len(names), 2))
+    for i, city in enumerate(names):
+        lead, hour, err = usable[city]
+        X = design_matrix(lead, hour)
+        residual = np.abs(err - X @ bias[i])
+        stx[i], sty[i] = X[:, :2].T @ X[:, :2], X[:, :2].T @ residual
+    spread = _batched_solve(stx, sty)
+    return CorrectionModel(
+        cities={c: i for i, c in enumerate(names)},
+        bias_coef=bias,
+        spread_coef=spread,
+        samples=np.array([len(usable[c][2]) for c in names], dtype=int),
+        fitted_at=time.time(),
+    )
+
+
+def fit_history(history: ForecastHistory, cities: Optional[Iterable[str]] = None,
+                min_samples: int = MIN_SAMPLES) -> CorrectionModel:
+    cities = history.cities() if cities is None else cities
+    return fit_corrections({c: history.pairs(c) for c in cities}, min_samples=min_samples)
+
+
+class CorrectionCache:
+    """Keeps the last fitted model and refits in the background when the history moves on"""
+
+    def __init__(self, history: ForecastHistory, refit_interval: float = REFIT_INTERVAL):
+        self.history = history
+        self.refit_interval = refit_interval
+        self._model = fit_corrections({})
+        self._version = -1
+        self._refitting = False
+        self._lock = threading.Lock()
+
+    def model(self) -> CorrectionModel:
+        """The last fitted model, never waiting for a fit
+
+        A changed history starts a background refit once the last fit is
+        ``refit_interval`` old, or right away while the model is empty (a
+        fresh deployment), so corrections start as soon as enough pairs exist.
+        """
+        model = self._model
+        stale = (self.history.version != self._version and
+                 (not model.samples.size or time.time() - model.fitted_at >= self.refit_interval))
+        if stale:
+            with self._lock:
+                start, self._refitting = not self._refitting, True
+            if start:
+                threading.Thread(target=self._refit, name="meteo-correction-refit", daemon=True).start()
+        return model
+
+    def refit(self) -> CorrectionModel:
+        """Fit on the current history now and keep the result"""
+        version = self.history.version
+        model = fit_history(self.history)
+        with self._lock:
+            self._model, self._version = model, version
+        return model
+
+    def _refit(self) -> None:
+        try:
+            self.refit()
+        except Exception:
+            logger.exception("Correction refit failed")
+        finally:
+            with self._lock:
+                self._refitting = False
+
+
+_default_cache: Optional[CorrectionCache] = None
+_default_lock = threading.Lock()
+
+
+def default_corrections() -> CorrectionCache:
+    """Correction models fitted on the default store's history"""
+    global _default_cache
+    if _default_cache is None:
+        with _default_lock:
+            if _default_cache is None:
+                _default_cache = CorrectionCache(default_store().history)
+    return _default_cache
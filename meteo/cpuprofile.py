@@ -0,0 +1,389 @@
+"""On-demand CPU profiles of single dashboard reruns.
+
+A rerun is profiled only when asked for, with ``?profile=sample`` or
+``?profile=cprofile`` in the URL or the sidebar toggle; otherwise
+:meth:`CpuProfiler.begin_run` returns a shared no-op and nothing is hooked
+or started. Two capture modes:
+
+* ``sample``: a daemon thread reads the script thread's stack from
+  ``sys._current_frames()`` every few milliseconds. Overhead is low and
+  independent of call counts; weights are sample counts.
+* ``cprofile``: ``cProfile`` while the run executes. Exact call counts
+  and times, at a noticeable slowdown for call-heavy code; stacks are
+  rebuilt from the caller graph, so time is split across callers in
+  proportion to their share of each function. From Python 3.12 the
+  profiler is process-wide (``sys.monitoring``), so only one ``cprofile``
+  capture runs at a time; a run asking for one while another is active,
+  or while some other profiling tool holds the hook, is sampled instead.
+
+Each finished run keeps collapsed stacks (``a;b;c <weight>`` lines, the
+format flamegraph.pl and speedscope read) in a bounded in-memory list, and
+renders a flamegraph HTML on request. When ``METEO_PROFILE_KEY`` is set,
+profiling and the sidebar panel also need ``?profile_key=<key>``.
+
+Collapsed stacks or ``.prof`` dumps can be rendered offline::
+
+    python -m meteo.cpuprofile flamegraph stacks.txt --out flame.html
+"""
+from __future__ import annotations
+
+import argparse
+import cProfile
+import marshal
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Deque, Dict, List, Mapping, NamedTuple, Optional
+
+MODES = ("sample", "cprofile")
+PROFILES_KEPT = int(os.environ.get("METEO_PROFILES_KEPT", "20"))
+PROFILE_KEY = os.environ.get("METEO_PROFILE_KEY")
+SAMPLE_INTERVAL = 0.005     # seconds between stack samples
+MAX_DEPTH = 128             # frames kept per stack (innermost dropped beyond)
+MIN_FRACTION = 0.0005       # cProfile paths below this share of the run are dropped
+
+# cProfile hooks are process-global from 3.12; one capture may hold them at a time
+_cprofile_lock = threading.Lock()
+
+
+class CpuProfile(NamedTuple):
+    id: int
+    label: str
+    mode: str
+    started: float                  # epoch seconds
+    elapsed_ms: float
+    stacks: Dict[str, int]          # collapsed stack -> samples (sample) or microseconds (cprofile)
+    stats: Optional[bytes] = None   # marshalled pstats of a cprofile run (the .prof format)
+
+    @property
+    def unit(self) -> str:
+        return "samples" if self.mode == "sample" else "µs"
+
+
+def requested_mode(params: Mapping[str, str], toggled: Optional[str] = None) -> Optional[str]:
+    """Capture mode asked for by the query parameters or the sidebar toggle, if allowed"""
+    mode = params.get("profile") or toggled
+    if mode not in MODES or not admin_allowed(params):
+        return None
+    return mode
+
+
+def admin_allowed(params: Mapping[str, str]) -> bool:
+    return not PROFILE_KEY or params.get("profile_key") == PROFILE_KEY
+
+
+_names: Dict[object, str] = {}
+
+
+def frame_name(code) -> str:
+    """``function (path:line)`` of a code object; path relative to the working directory when inside it"""
+    name = _names.get(code)
+    if name is None:
+        path = code.co_filename
+        try:
+            rel = os.path.relpath(path)
+            path = rel if not rel.startswith("..") else os.path.join(*path.split(os.sep)[-2:])
+        except ValueError:
+            pass
+        name = _names[code] = f"{code.co_name} ({path}:{code.co_firstlineno})".replace(";", ",")
+    return name
+
+
+def _pstats_name(func) -> str:
+    filename, line, name = func
+    if filename == "~":         # built-in
+        return name.replace(";", ",")
+    try:
+        rel = os.path.relpath(filename)
+        filename = rel if not rel.startswith("..") else os.path.join(*filename.split(os.sep)[-2:])
+    except ValueError:
+        pass
+    return f"{name} ({filename}:{line})".replace(";", ",")
+
+
+class _Sampler(threading.Thread):
+    def __init__(self, thread_id: int, root: Optional[str], interval: float):
+        super().__init__(name="meteo-cpu-sampler", daemon=True)
+        self.thread_id = thread_id
+        self.root = root
+        self.interval = interval
+        self.counts: Dict[str, int] = defaultdict(int)
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(frame.f_code)
+                # Frames above the script (Streamlit's runner) are the same every time
+                if self.root is not None and frame.f_code.co_filename == self.root \
+                        and frame.f_code.co_name == "<module>":
+                    break
+                frame = frame.f_back
+            if stack:
+                self.counts[";".join(frame_name(c) for c in reversed(stack[-MAX_DEPTH:]))] += 1
+
+
+class Capture:
+    """CPU profile of one run on the calling thread"""
+
+    def __init__(self, profiler: "CpuProfiler", mode: str, root: Optional[str] = None):
+        self.profiler = profiler
+        self.mode = mode
+        self.thread_id = threading.get_ident()
+        self.started = time.time()
+        self._t0 = time.perf_counter()
+        self._done = False
+        if mode == "cprofile" and not self._enable_cprofile():
+            self.mode = "sample"
+        if self.mode == "sample":
+            self._sampler = _Sampler(self.thread_id, root, SAMPLE_INTERVAL)
+            self._sampler.start()
+
+    def _enable_cprofile(self) -> bool:
+        """Start cProfile unless another capture or tool already profiles the process"""
+        if not _cprofile_lock.acquire(blocking=False):
+            return False
+        self._profile = cProfile.Profile()
+        try:
+            self._profile.enable()
+        except ValueError:          # "Another profiling tool is already active" (3.12+)
+            _cprofile_lock.release()
+            return False
+        return True
+
+    def _stop(self) -> None:
+        self._done = True
+        if self.mode == "sample":
+            self._sampler.stopped.set()
+            self._sampler.join()
+        else:
+            try:
+                self._profile.disable()
+            finally:
+                _cprofile_lock.release()
+
+    def cancel(self) -> None:
+        """Stop without recording (the run was interrupted)"""
+        if not self._done:
+            self._stop()
+
+    def finish(self, label: str = "") -> Optional[CpuProfile]:
+        if self._done:
+            return None
+        self._stop()
+        elapsed_ms = round((time.perf_counter() - self._t0) * 1000, 1)
+        stats = None
+        if self.mode == "sample":
+            stacks = dict(self._sampler.counts)
+        else:
+            self._profile.create_stats()
+            stats = marshal.dumps(self._profile.stats)
+            stacks = stacks_from_pstats(self._profile.stats)
+        return self.profiler._record(label, self.mode, self.started, elapsed_ms, stacks, stats)
+
+
+class _NoCapture:
+    def cancel(self) -> None:
+        pass
+
+    def finish(self, label: str = "") -> None:
+        return None
+
+
+_NO_CAPTURE = _NoCapture()
+
+
+class CpuProfiler:
+    """Keeps the last ``max_profiles`` CPU profiles of profiled runs"""
+
+    def __init__(self, max_profiles: int = PROFILES_KEPT):
+        self.profiles: Deque[CpuProfile] = deque(maxlen=max_profiles)
+        self._active: Dict[int, Capture] = {}
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+    def begin_run(self, mode: Optional[str], root: Optional[str] = None):
+        """A :class:`Capture` for ``mode``, or a free no-op when it is None
+
+        ``root`` is the script's file name: sampled stacks start at its
+        module frame. Captures left running by interrupted runs, on this
+        thread or on script threads that have since exited (Streamlit
+        starts a new one for a run begun from idle), are cancelled first.
+        """
+        if mode is None and not self._active:
+            return _NO_CAPTURE
+        live = {thread.ident for thread in threading.enumerate()}
+        current = threading.get_ident()
+        with self._lock:
+            stale = [self._active.pop(ident) for ident in list(self._active)
+                     if ident == current or ident not in live]
+        for capture in stale:
+            capture.cancel()
+        if mode is None:
+            return _NO_CAPTURE
+        capture = Capture(self, mode, root)
+        with self._lock:
+            self._active[capture.thread_id] = capture
+        return capture
+
+    def _record(self, label: str, mode: str, started: float, elapsed_ms: float,
+                stacks: Dict[str, int], stats: Optional[bytes]) -> CpuProfile:
+        with self._lock:
+            self._active.pop(threading.get_ident(), None)
+            profile = CpuProfile(self._next_id, label, mode, started, elapsed_ms, stacks, stats)
+            self._next_id += 1
+            self.profiles.append(profile)
+        return profile
+
+    def recent(self) -> List[CpuProfile]:
+        """Kept profiles, newest first"""
+        with self._lock:
+            return list(reversed(self.profiles))
+
+
+def stacks_from_pstats(stats: Mapping) -> Dict[str, int]:
+    """Collapsed stacks (µs) rebuilt from ``pstats`` caller edges
+
+    Starting at functions entered from outside the profile, each callee's time is
+    followed along the edge it was called through. A function reached
+    through several paths gets each path's share of its own time; recursion
+    is cut at the first repeat.
+    """
+    callees: Dict[tuple, Dict[tuple, float]] = defaultdict(dict)
+    roots: Dict[tuple, float] = {}
+    for func, (_, nc, _, ct, callers) in stats.items():
+        for caller, edge in callers.items():
+            callees[caller][func] = edge[3]          # cumulative time through this edge
+        # Calls without a recorded caller came from outside the profile (all of them for the
+        # outermost functions, some for re-entered ones such as exec during imports)
+        called = sum(edge[1] for edge in callers.values())
+        if called < nc and ct:
+            share = (ct - sum(edge[3] for edge in callers.values())) / ct
+            roots[func] = min(share, 1.0) if share > 0 else (nc - called) / nc
+    total = sum(stats[func][3] * share for func, share in roots.items()) or 1.0
+    floor = total * MIN_FRACTION
+    out: Dict[str, float] = defaultdict(float)
+
+    def walk(func, path: str, share: float, seen: frozenset, depth: int) -> None:
+        _, _, tt, ct, _ = stats[func]
+        out[path] += tt * share
+        if depth >= MAX_DEPTH:
+            return
+        for callee, edge_ct in callees.get(func, {}).items():
+            callee_ct = stats[callee][3]
+            if callee in seen or not callee_ct or edge_ct * share < floor:
+                continue
+            walk(callee, f"{path};{_pstats_name(callee)}", share * edge_ct / callee_ct, seen | {callee}, depth + 1)
+
+    for func, share in roots.items():
+        walk(func, _pstats_name(func), share, frozenset([func]), 1)
+    return {path: int(round(seconds * 1e6)) for path, seconds in out.items() if seconds * 1e6 >= 1}
+
+
+def collapsed(stacks: Mapping[str, int]) -> str:
+    """``stack weight`` lines, heaviest first"""
+    return "".join(f"{stack} {weight}\n" for stack, weight in sorted(stacks.items(), key=lambda kv: -kv[1]))
+
+
+def parse_collapsed(text: str) -> Dict[str, int]:
+    stacks: Dict[str, int] = defaultdict(int)
+    for line in text.splitlines():
+        stack, _, weight = line.rstrip().rpartition(" ")
+        if stack and weight.isdigit():
+            stacks[stack] += int(weight)
+    return dict(stacks)
+
+
+def top_functions(stacks: Mapping[str, int], n: int = 20) -> List[Dict]:
+    """Functions by inclusive weight, with their self weight"""
+    inclusive: Dict[str, int] = defaultdict(int)
+    own: Dict[str, int] = defaultdict(int)
+    for stack, weight in stacks.items():
+        frames = stack.split(";")
+        own[frames[-1]] += weight
+        for name in set(frames):
+            inclusive[name] += weight
+    total = sum(stacks.values()) or 1
+    ranked = sorted(inclusive.items(), key=lambda kv: -kv[1])[:n]
+    return [{"function": name, "total": weight, "self": own.get(name, 0),
+             "total_pct": round(100 * weight / total, 1)} for name, weight in ranked]
+
+
+def render_flamegraph(stacks: Mapping[str, int], title: str = "CPU profile", unit: str = "samples") -> str:
+    """Standalone flamegraph HTML (plotly icicle, callers at the bottom)"""
+    import plotly.graph_objects as go
+
+    total = sum(stacks.values())
+    weights: Dict[str, int] = defaultdict(int)
+    for stack, weight in stacks.items():
+        frames = stack.split(";")
+        for depth in range(1, len(frames) + 1):
+            weights[";".join(frames[:depth])] += weight
+    # Slivers cannot be read anyway and would bloat the page
+    keep = [path for path, weight in weights.items() if weight >= total * 0.001]
+    root = "all"
+    ids = [root] + keep
+    labels = [f"all ({total} {unit})"] + [path.rsplit(";", 1)[-1] for path in keep]
+    parents = [""] + [path.rsplit(";", 1)[0] if ";" in path else root for path in keep]
+    values = [total] + [weights[path] for path in keep]
+    fig = go.Figure(go.Icicle(
+        ids=ids, labels=labels, parents=parents, values=values, branchvalues="total",
+        tiling=dict(orientation="v", flip="y"), maxdepth=-1,
+        hovertemplate="%{label}<br>%{value} " + unit + " (%{percentRoot:.1%})<extra></extra>",
+    ))
+    fig.update_layout(title=title, margin=dict(l=10, r=10, t=50, b=10), height=800)
+    return fig.to_html(include_plotlyjs="cdn")
+
+
+def load_stacks(path: str) -> Dict[str, int]:
+    """Collapsed stacks from a collapsed-stack text file or a ``.prof`` dump"""
+    if path.endswith((".prof", ".pstats")):
+        return stacks_from_pstats(pstats.Stats(path).stats)
+    with open(path, encoding="utf-8") as fh:
+        return parse_collapsed(fh.read())
+
+
+_default_profiler: Optional[CpuProfiler] = None
+_default_lock = threading.Lock()
+
+
+def default_cpu_profiler() -> CpuProfiler:
+    """Process-wide store of recent CPU profiles (``METEO_PROFILES_KEPT``, default 20)"""
+    global _default_profiler
+    if _default_profiler is None:
+        with _default_lock:
+            if _default_profiler is None:
+                _default_profiler = CpuProfiler()
+    return _default_profiler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render CPU profiles as flamegraphs")
+    sub = parser.add_subparsers(dest="command", required=True)
+    flame = sub.add_parser("flamegraph", help="collapsed stacks or a .prof dump to flamegraph HTML")
+    flame.add_argument("path", help="collapsed-stack text file, or a cProfile .prof/.pstats dump")
+    flame.add_argument("--out", default="flamegraph.html")
+    flame.add_argument("--collapsed", help="also write the collapsed stacks here")
+    flame.add_argument("--top", type=int, default=15, help="print this many functions by total weight")
+    args = parser.parse_args(argv)
+
+    stacks = load_stacks(args.path)
+    unit = "µs" if args.path.endswith((".prof", ".pstats")) else "samples"
+    with open(args.out, "w", encoding="utf-8") as fh:
+        fh.write(render_flamegraph(stacks, os.path.basename(args.path), unit))
+    if args.collapsed:
+        with open(args.collapsed, "w", encoding="utf-8") as fh:
+            fh.write(collapsed(stacks))
+    print(f"{len(stacks)} stacks, {sum(stacks.values())} {unit} -> {args.out}")
+    for row in top_functions(stacks, args.top):
+        print(f"  {row['total_pct']:5.1f}%  {row['function']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
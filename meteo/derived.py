@@ -0,0 +1,142 @@
+"""Derived meteorological variables of forecast frames.
+
+Dew point, heat index, wind chill, apparent temperature and a comfort
+score, as vectorized NumPy expressions over the ``process_forecast``
+columns (°C, %, m/s). Frames get a ``met`` accessor that computes a variable
+the first time it is asked for and keeps it for the life of the frame::
+
+    import meteo.derived  # registers the accessor
+    df = record.frame()
+    df.met.dew_point                          # Series, computed now
+    df.met.dew_point                          # same Series, cached
+    df.met.frame(["dew_point", "comfort"])    # df plus the requested columns
+
+The accessor reads the stored Celsius columns: derive first, convert units
+for display afterwards. The cache is not invalidated if the input columns
+are later overwritten in place.
+"""
+from __future__ import annotations
+
+from typing import Callable, Dict, NamedTuple, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+
+def dew_point(temp, humidity) -> np.ndarray:
+    """Dew point (°C) by the Magnus formula (Alduchov & Eskridge constants)"""
+    t = np.asarray(temp, dtype=np.float64)
+    rh = np.clip(np.asarray(humidity, dtype=np.float64), 1, 100)
+    gamma = np.log(rh / 100) + 17.625 * t / (243.04 + t)
+    return 243.04 * gamma / (17.625 - gamma)
+
+
+def heat_index(temp, humidity) -> np.ndarray:
+    """NWS heat index (°C): Rothfusz regression with its adjustments, Steadman's simple form when mild"""
+    t = np.asarray(temp, dtype=np.float64) * 9 / 5 + 32
+    rh = np.asarray(humidity, dtype=np.float64)
+    simple = 0.5 * (t + 61.0 + (t - 68.0) * 1.2 + rh * 0.094)
+    full = (-42.379 + 2.04901523 * t + 10.14333127 * rh - 0.22475541 * t * rh
+            - 6.83783e-3 * t * t - 5.481717e-2 * rh * rh + 1.22874e-3 * t * t * rh
+            + 8.5282e-4 * t * rh * rh - 1.99e-6 * t * t * rh * rh)
+    with np.errstate(invalid="ignore"):
+        dry = (rh < 13) & (t >= 80) & (t <= 112)
+        full = np.where(dry, full - (13 - rh) / 4 * np.sqrt(np.clip(17 - np.abs(t - 95), 0, None) / 17), full)
+        humid = (rh > 85) & (t >= 80) & (t <= 87)
+        full = np.where(humid, full + (rh - 85) / 10 * (87 - t) / 5, full)
+        hi = np.where((simple + t) / 2 >= 80, full, simple)
+    return (hi - 32) * 5 / 9
+
+
+def wind_chill(temp, wind_speed) -> np.ndarray:
+    """Wind chill (°C), North American formula; the air temperature where it is undefined
+
+    Defined at or below 10 °C with wind above 4.8 km/h.
+    """
+    t = np.asarray(temp, dtype=np.float64)
+    v = np.asarray(wind_speed, dtype=np.float64) * 3.6
+    with np.errstate(invalid="ignore"):
+        v16 = np.power(np.clip(v, 0, None), 0.16)
+        chill = 13.12 + 0.6215 * t - 11.37 * v16 + 0.3965 * t * v16
+        return np.where((t <= 10) & (v > 4.8), chill, t)
+
+
+def apparent_temperature(temp, humidity, wind_speed) -> np.ndarray:
+    """Steadman apparent temperature (°C) in the shade, as the Australian BoM publishes it"""
+    t = np.asarray(temp, dtype=np.float64)
+    vapour = np.asarray(humidity, dtype=np.float64) / 100 * 6.105 * np.exp(17.27 * t / (237.7 + t))
+    return t + 0.33 * vapour - 0.70 * np.asarray(wind_speed, dtype=np.float64) - 4.00
+
+
+def comfort(temp, humidity, wind_speed) -> np.ndarray:
+    """0-100 comfort score: 100 at an apparent 22 °C and 50 % humidity, less the further away"""
+    feels = apparent_temperature(temp, humidity, wind_speed)
+    score = 100 - 2 * np.abs(feels - 22) - 0.5 * np.abs(np.asarray(humidity, dtype=np.float64) - 50)
+    return np.clip(score, 0, 100)
+
+
+class Derived(NamedTuple):
+    label: str
+    unit: str                       # "temperature" (°C, convert for display) or "score"
+    inputs: Sequence[str]
+    func: Callable[..., np.ndarray]
+
+
+DERIVED: Dict[str, Derived] = {
+    "dew_point": Derived("Dew Point", "temperature", ("temp", "humidity"), dew_point),
+    "heat_index": Derived("Heat Index", "temperature", ("temp", "humidity"), heat_index),
+    "wind_chill": Derived("Wind Chill", "temperature", ("temp", "wind_speed"), wind_chill),
+    "apparent_temp": Derived("Apparent Temperature", "temperature", ("temp", "humidity", "wind_speed"),
+                             apparent_temperature),
+    "comfort": Derived("Comfort Score", "score", ("temp", "humidity", "wind_speed"), comfort),
+}
+# Columns, stored or derived, holding °C values
+TEMPERATURES = ("temp", "feels_like", *(name for name, d in DERIVED.items() if d.unit == "temperature"))
+CACHE_ATTR = "_derived_cache"
+
+
+def compute(name: str, columns) -> np.ndarray:
+    """Derived variable ``name`` from a mapping of its input columns"""
+    spec = DERIVED[name]
+    return spec.func(*(np.asarray(columns[c], dtype=np.float64) for c in spec.inputs))
+
+
+@pd.api.extensions.register_dataframe_accessor("met")
+class MeteoAccessor:
+    """``df.met``: derived variables of a forecast frame, computed on first use"""
+
+    def __init__(self, frame: pd.DataFrame):
+        self._frame = frame
+        # pandas builds a new accessor on every ``df.met``; the results live on the frame itself
+        # (bypassing DataFrame.__setattr__, which would treat it as a column), and copies start empty
+        cache = frame.__dict__.get(CACHE_ATTR)
+        if cache is None:
+            cache = {}
+            object.__setattr__(frame, CACHE_ATTR, cache)
+        self._cache: Dict[str, pd.Series] = cache
+
+    def __getitem__(self, name: str) -> pd.Series:
+        series = self._cache.get(name)
+        if series is None:
+            if name not in DERIVED:
+                raise KeyError(name)
+            inputs = {c: self._frame[c].to_numpy(dtype=np.float64, na_value=np.nan) for c in DERIVED[name].inputs}
+            series = self._cache[name] = pd.Series(compute(name, inputs), index=self._frame.index, name=name)
+        return series
+
+    def __getattr__(self, name: str) -> pd.Series:
+        if name in DERIVED:
+            return self[name]
+        raise AttributeError(name)
+
+    def __dir__(self):
+        return sorted(set(super().__dir__()) | set(DERIVED))
+
+    @property
+    def computed(self):
+        """Names computed so far for this frame"""
+        return list(self._cache)
+
+    def frame(self, names: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """The frame with the requested derived columns (default: all) appended"""
+        return self._frame.assign(**{name: self[name] for name in (DERIVED if names is None else names)})
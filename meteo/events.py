@@ -0,0 +1,393 @@
+"""Alert-change events with debounced, batched delivery to pluggable sinks.
+
+:class:`AlertTracker` remembers which alerts are active per city and turns
+each new ``generate_weather_alerts`` result into transitions only: an alert
+that appears is ``raised``, one that disappears is ``cleared``, and an alert
+that is still active (even with a new reading in its message) emits nothing.
+
+:class:`EventBus` delivers those transitions to sinks (stdout, a JSON lines
+file, a webhook) without letting a storm flood them:
+
+* debouncing - a transition is held for ``debounce`` seconds and dropped if
+  it is reversed meanwhile, so a value hovering at a threshold stays quiet;
+* batching - each sink receives lists of up to ``batch_size`` events, at
+  most one list per ``min_interval`` seconds;
+* backpressure - each sink has a bounded queue; when a slow or failing
+  sink falls behind, its oldest undelivered events are dropped and counted
+  rather than growing memory or stalling the producers.
+
+Usage with the fleet job::
+
+    python -m meteo.fleet sites.txt --events stdout --events file:alerts.jsonl \\
+        --events http://127.0.0.1:8720/events --events-state alert_state.json
+
+``python -m meteo.events stub --port 8720`` runs a local webhook receiver
+that prints the batches it gets.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from .client import WeatherClient
+from .httpserver import Request, Response, json_response, serve
+from .models import Alert
+
+logger = logging.getLogger(__name__)
+
+RAISED, CLEARED = "raised", "cleared"
+DEBOUNCE = 30.0          # seconds a transition must hold before it is delivered
+BATCH_SIZE = 100         # events per sink delivery
+MIN_INTERVAL = 1.0       # seconds between deliveries to one sink
+MAX_QUEUE = 10_000       # undelivered events kept per sink before the oldest are dropped
+RETRIES = 3
+WEBHOOK_TIMEOUT = 5.0
+STUB_PORT = 8720
+
+
+class AlertEvent(NamedTuple):
+    city: str
+    kind: str            # "raised" or "cleared"
+    title: str
+    message: str
+    severity: str
+    at: float            # epoch seconds of the evaluation that saw the change
+
+
+class AlertTracker:
+    """Active alerts per city; :meth:`update` returns only the transitions"""
+
+    def __init__(self, state: Optional[Dict[str, Dict[str, List[str]]]] = None):
+        # city key -> {title: [city, message, severity]}
+        self._active: Dict[str, Dict[str, List[str]]] = {k: dict(v) for k, v in (state or {}).items()}
+        self._lock = threading.Lock()
+
+    def update(self, city: str, alerts: Iterable[Alert], at: Optional[float] = None) -> List[AlertEvent]:
+        at = time.time() if at is None else at
+        current = {a.title: [city, a.message, a.severity] for a in alerts}
+        key = WeatherClient.cache_key(city)
+        with self._lock:
+            previous = self._active.get(key, {})
+            if current:
+                self._active[key] = current
+            else:
+                self._active.pop(key, None)
+        events = [AlertEvent(city, RAISED, title, message, severity, at)
+                  for title, (_, message, severity) in current.items() if title not in previous]
+        events += [AlertEvent(city, CLEARED, title, message, severity, at)
+                   for title, (_, message, severity) in previous.items() if title not in current]
+        return events
+
+    def active(self) -> Dict[str, List[str]]:
+        """City -> titles of its active alerts"""
+        with self._lock:
+            return {next(iter(alerts.values()))[0]: list(alerts) for alerts in self._active.values()}
+
+    def save(self, path: str) -> None:
+        with self._lock:
+            state = {k: dict(v) for k, v in self._active.items()}
+        with open(path + ".tmp", "w", encoding="utf-8") as fh:
+            json.dump(state, fh, ensure_ascii=False, sort_keys=True)
+        os.replace(path + ".tmp", path)
+
+    @classmethod
+    def load(cls, path: str) -> "AlertTracker":
+        with open(path, encoding="utf-8") as fh:
+            return cls(json.load(fh))
+
+
+# ------------------ Sinks ------------------
+
+class StdoutSink:
+    name = "stdout"
+
+    def send(self, events: Sequence[AlertEvent]) -> None:
+        for e in events:
+            print(f"[{time.strftime('%H:%M:%S', time.localtime(e.at))}] {e.city}: {e.kind} {e.title} "
+                  f"({e.severity}) - {e.message}", flush=True)
+
+
+class FileSink:
+    """Appends one JSON object per event"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.name = f"file:{path}"
+
+    def send(self, events: Sequence[AlertEvent]) -> None:
+        with open(self.path, "a", encoding="utf-8") as fh:
+            fh.writelines(json.dumps(e._asdict(), ensure_ascii=False) + "\n" for e in events)
+
+
+class WebhookSink:
+    """POSTs ``{"events": [...]}`` per batch; non-2xx responses raise"""
+
+    def __init__(self, url: str, session=None, timeout: float = WEBHOOK_TIMEOUT):
+        if session is None:
+            import requests
+            session = requests.Session()
+        self.url = url
+        self.name = url
+        self.session = session
+        self.timeout = timeout
+
+    def send(self, events: Sequence[AlertEvent]) -> None:
+        response = self.session.post(self.url, json={"events": [e._asdict() for e in events]},
+                                     timeout=self.timeout)
+        response.raise_for_status()
+
+
+def make_sink(spec: str):
+    """``stdout``, ``file:<path>`` or an ``http(s)://`` webhook URL"""
+    if spec == "stdout":
+        return StdoutSink()
+    if spec.startswith("file:"):
+        return FileSink(spec[len("file:"):])
+    if spec.startswith(("http://", "https://")):
+        return WebhookSink(spec)
+    raise ValueError(f"unknown event sink {spec!r} (use stdout, file:<path> or a webhook URL)")
+
+
+# ------------------ Delivery ------------------
+
+class _SinkWorker:
+    """Bounded queue and delivery thread of one sink"""
+
+    def __init__(self, sink, batch_size: int, min_interval: float, max_queue: int):
+        self.sink = sink
+        self.batch_size = batch_size
+        self.min_interval = min_interval
+        self.queue: Deque[AlertEvent] = deque()
+        self.max_queue = max_queue
+        self.delivered = self.batches = self.dropped = self.failed = 0
+        self.busy = False
+        self.closed = False
+        self.cond = threading.Condition()
+        self.thread = threading.Thread(target=self._run, name=f"meteo-events-{sink.name}", daemon=True)
+        self.thread.start()
+
+    def offer(self, events: Sequence[AlertEvent]) -> None:
+        with self.cond:
+            self.queue.extend(events)
+            overflow = len(self.queue) - self.max_queue
+            if overflow > 0:
+                for _ in range(overflow):
+                    self.queue.popleft()
+                self.dropped += overflow
+                logger.warning("Event sink %s is behind; dropped %d oldest events", self.sink.name, overflow)
+            self.cond.notify_all()
+
+    def _run(self) -> None:
+        last = 0.0
+        while True:
+            with self.cond:
+                while not self.queue and not self.closed:
+                    self.cond.wait()
+                if not self.queue:
+                    return
+                wait = last + self.min_interval - time.monotonic()
+                if wait > 0 and not self.closed:
+                    # Let more events pile up into this batch instead of sending a trickle
+                    self.cond.wait(wait)
+                batch = [self.queue.popleft() for _ in range(min(self.batch_size, len(self.queue)))]
+                self.busy = True
+            last = time.monotonic()
+            self._deliver(batch)
+            with self.cond:
+                self.busy = False
+                self.cond.notify_all()
+
+    def _deliver(self, batch: List[AlertEvent]) -> None:
+        for attempt in range(RETRIES):
+            try:
+                self.sink.send(batch)
+            except Exception as exc:
+                logger.warning("Event sink %s failed (%s), attempt %d/%d", self.sink.name, exc, attempt + 1, RETRIES)
+                if attempt + 1 < RETRIES and not self.closed:
+                    time.sleep(min(self.min_interval, 1.0) * 2 ** attempt)
+                continue
+            with self.cond:
+                self.delivered += len(batch)
+                self.batches += 1
+            return
+        with self.cond:
+            self.failed += len(batch)
+
+    def drain(self, timeout: Optional[float]) -> bool:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.cond:
+            self.cond.notify_all()
+            while self.queue or self.busy:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self.cond.wait(remaining)
+        return True
+
+    def close(self) -> None:
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+
+class EventBus:
+    """Debounces alert transitions and fans them out to sinks in bounded batches"""
+
+    def __init__(self, sinks: Sequence, tracker: Optional[AlertTracker] = None, debounce: float = DEBOUNCE,
+                 batch_size: int = BATCH_SIZE, min_interval: float = MIN_INTERVAL, max_queue: int = MAX_QUEUE):
+        self.tracker = tracker if tracker is not None else AlertTracker()
+        self.debounce = debounce
+        self.published = self.suppressed = 0
+        self._workers = [_SinkWorker(s, batch_size, min_interval, max_queue) for s in sinks]
+        # (city key, title) -> (event, monotonic time it becomes deliverable)
+        self._pending: Dict[Tuple[str, str], Tuple[AlertEvent, float]] = {}
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="meteo-events", daemon=True)
+        self._thread.start()
+
+    def observe(self, city: str, alerts: Iterable[Alert], at: Optional[float] = None) -> List[AlertEvent]:
+        """Record a city's current alerts and publish the transitions"""
+        events = self.tracker.update(city, alerts, at)
+        self.publish(events)
+        return events
+
+    def publish(self, events: Iterable[AlertEvent]) -> None:
+        due = time.monotonic() + self.debounce
+        with self._cond:
+            for event in events:
+                self.published += 1
+                key = (WeatherClient.cache_key(event.city), event.title)
+                held = self._pending.get(key)
+                if held is not None and held[0].kind != event.kind:
+                    # Raised and cleared again within the window: nobody needs to hear about it
+                    del self._pending[key]
+                    self.suppressed += 2
+                else:
+                    self._pending[key] = (event, due)
+            self._cond.notify()
+
+    def _take(self, until: float) -> List[AlertEvent]:
+        ready = [key for key, (_, due) in self._pending.items() if due <= until]
+        return [self._pending.pop(key)[0] for key in ready]
+
+    def _dispatch(self, events: List[AlertEvent]) -> None:
+        if events:
+            events.sort(key=lambda e: e.at)
+            for worker in self._workers:
+                worker.offer(events)
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._closed:
+                    now = time.monotonic()
+                    if any(due <= now for _, due in self._pending.values()):
+                        break
+                    nearest = min((due for _, due in self._pending.values()), default=None)
+                    self._cond.wait(None if nearest is None else nearest - now)
+                if self._closed:
+                    return
+                events = self._take(time.monotonic())
+            self._dispatch(events)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Deliver everything held, debounce or not, and wait for the sinks; False on timeout"""
+        with self._cond:
+            events = self._take(float("inf"))
+        self._dispatch(events)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for worker in self._workers:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if not worker.drain(remaining):
+                return False
+        return True
+
+    def close(self, timeout: Optional[float] = None) -> bool:
+        drained = self.flush(timeout)
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        for worker in self._workers:
+            worker.close()
+        return drained
+
+    def stats(self) -> Dict[str, object]:
+        with self._cond:
+            pending = len(self._pending)
+        return {
+            "published": self.published,
+            "suppressed": self.suppressed,
+            "pending": pending,
+            "sinks": {w.sink.name: {"delivered": w.delivered, "batches": w.batches, "queued": len(w.queue),
+                                    "dropped": w.dropped, "failed": w.failed}
+                      for w in self._workers},
+        }
+
+
+# ------------------ Webhook stub ------------------
+
+class WebhookStub:
+    """Local webhook receiver that prints and counts the batches it gets"""
+
+    def __init__(self, latency_ms: float = 0.0, quiet: bool = False):
+        self.latency_ms = latency_ms
+        self.quiet = quiet
+        self.batches = 0
+        self.events = 0
+
+    @property
+    def routes(self):
+        return {"/events": self.handle}
+
+    async def handle(self, request: Request) -> Response:
+        if self.latency_ms:
+            await asyncio.sleep(self.latency_ms / 1000.0)
+        if request.method != "POST":
+            return json_response({"batches": self.batches, "events": self.events}, request)
+        events = json.loads(request.body or b"{}").get("events", [])
+        self.batches += 1
+        self.events += len(events)
+        print(f"batch {self.batches}: {len(events)} events", flush=True)
+        if not self.quiet:
+            for e in events:
+                print(f"  {e['city']}: {e['kind']} {e['title']}", flush=True)
+        return json_response({"received": len(events)})
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Alert event tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    stub = sub.add_parser("stub", help="run a local webhook receiver")
+    stub.add_argument("--host", default="127.0.0.1")
+    stub.add_argument("--port", type=int, default=STUB_PORT)
+    stub.add_argument("--latency-ms", type=float, default=0.0, help="delay per batch, to simulate a slow consumer")
+    stub.add_argument("--quiet", action="store_true", help="print batch sizes only")
+    show = sub.add_parser("active", help="list the active alerts in a tracker state file")
+    show.add_argument("state")
+    args = parser.parse_args(argv)
+
+    if args.command == "active":
+        for city, titles in sorted(AlertTracker.load(args.state).active().items()):
+            print(f"{city}: {', '.join(titles)}")
+        return 0
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    receiver = WebhookStub(args.latency_ms, args.quiet)
+    try:
+        asyncio.run(serve(receiver.routes, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
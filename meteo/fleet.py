@@ -0,0 +1,313 @@
+"""Headless fleet monitoring: evaluate a whole site list in one batch job.
+
+Usage::
+
+    python -m meteo.fleet sites.txt --out fleet_results.csv --workers 16 --budget 120
+
+``sites.txt`` holds one city per line (``#`` starts a comment); a CSV with a
+``city`` column is accepted as well. With ``--group`` current conditions are
+fetched up front in group requests of 20 cities; ``--city-ids`` keeps the
+name-to-ID map those need between runs. ``--events`` publishes alert
+transitions (raised/cleared) to stdout, a file or a webhook, and
+``--events-state`` remembers the active alerts between runs; ``--every``
+repeats the run on an interval in one process. Site lists of at least
+``POOL_MIN_SITES`` process their forecasts on an
+:class:`~meteo.workers.AnalyticsPool` (``--processes``) while the threads
+keep fetching.
+"""
+import argparse
+import csv
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+
+from .alerts import generate_weather_alerts, get_aqi_label
+from .archive import SnapshotArchive
+from .batcher import CityIds, GroupBatcher
+from .client import REQUEST_TIMEOUT, WeatherClient, current_pollution
+from .events import DEBOUNCE, AlertTracker, EventBus, make_sink
+from .forecast import process_forecast
+from .history import ForecastHistory
+from .workers import WORKERS, AnalyticsPool
+
+DEFAULT_WORKERS = 16
+DEFAULT_BUDGET = 120.0
+# Shorter site lists process forecasts in the fetching threads; spawning workers costs more
+POOL_MIN_SITES = 64
+
+RESULT_COLUMNS = [
+    "city", "status", "temp", "feels_like", "humidity", "wind_speed", "aqi", "aqi_label",
+    "forecast_min", "forecast_max", "forecast_mean", "alert_count", "max_severity", "alerts",
+]
+SEVERITY_RANK = {"warning": 1, "danger": 2}
+
+
+def load_sites(path):
+    """Read a site list from a plain text file or a CSV with a ``city`` column"""
+    with open(path, newline="", encoding="utf-8") as fh:
+        first = fh.readline()
+        fh.seek(0)
+        if first.strip().lower().split(",")[0] == "city":
+            sites = [row["city"].strip() for row in csv.DictReader(fh)]
+        else:
+            sites = [line.split("#", 1)[0].strip() for line in fh]
+    # Keep the order of first appearance, drop blanks and duplicates
+    return list(dict.fromkeys(s for s in sites if s))
+
+
+def make_session(pool_size):
+    """HTTP session whose connection pool matches the worker count"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def empty_row(city, status):
+    row = dict.fromkeys(RESULT_COLUMNS)
+    row.update(city=city, status=status, alert_count=0, alerts="")
+    return row
+
+
+def summarize_site(city, data, pool=None):
+    """Reduce one site's payloads to a single results row, processing the forecast on ``pool`` if given"""
+    cw = data['current']
+    df = process_forecast(data['forecast']) if pool is None else pool.call(process_forecast, data['forecast'])
+    poll = current_pollution(data)
+    alerts = generate_weather_alerts(cw, poll)
+
+    row = empty_row(city, "ok")
+    row.update(
+        temp=cw['main']['temp'],
+        feels_like=cw['main']['feels_like'],
+        humidity=cw['main']['humidity'],
+        wind_speed=cw['wind']['speed'],
+        forecast_min=df['temp'].min(),
+        forecast_max=df['temp'].max(),
+        forecast_mean=round(df['temp'].mean(), 2),
+        alert_count=len(alerts),
+        alerts="; ".join(title for title, _, _ in alerts),
+    )
+    if poll:
+        row.update(aqi=poll['main']['aqi'], aqi_label=get_aqi_label(poll['main']['aqi'])[0])
+    if alerts:
+        row["max_severity"] = max((sev for _, _, sev in alerts), key=lambda s: SEVERITY_RANK.get(s, 0))
+    return row
+
+
+class RunToken:
+    """Cancelled when a run's budget is spent; sites still in flight then discard their results
+
+    Writes to shared state (history, archive, alert events) happen between
+    :meth:`begin` and :meth:`end`. :meth:`cancel` refuses new writes and
+    waits for those already started, so nothing changes after a run's state
+    has been saved. ``written`` lists the sites that got to write.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._cancelled = False
+        self._writers = 0
+        self.written = set()
+
+    def begin(self, city) -> bool:
+        with self._cond:
+            if self._cancelled:
+                return False
+            self._writers += 1
+            self.written.add(city)
+            return True
+
+    def end(self) -> None:
+        with self._cond:
+            self._writers -= 1
+            self._cond.notify_all()
+
+    def cancel(self) -> None:
+        with self._cond:
+            self._cancelled = True
+            self._cond.wait_for(lambda: self._writers == 0)
+
+
+def evaluate_site(city, client, deadline, history=None, current=None, archive=None, events=None, pool=None,
+                  token=None):
+    """Fetch and evaluate one site without overrunning the job deadline
+
+    Every request is bounded by the time left before ``deadline``; once
+    ``token`` is cancelled the site's results are dropped instead of written.
+    """
+    if deadline - time.monotonic() <= 0:
+        return empty_row(city, "timeout")
+
+    errors = []
+    data = client.fetch(city, timeout=REQUEST_TIMEOUT, on_error=errors.append, current=current, deadline=deadline)
+    if data is None:
+        if not errors:
+            return empty_row(city, "not_found")
+        return empty_row(city, "timeout" if time.monotonic() >= deadline else "error")
+    try:
+        row = summarize_site(city, data, pool)
+    except (KeyError, TypeError, ValueError):
+        row = None
+
+    if token is not None and not token.begin(city):
+        return empty_row(city, "timeout")
+    try:
+        if history is not None:
+            history.record(city, data)
+        if archive is not None:
+            archive.record(city, data)
+        # Only sites evaluated successfully update the alert state; a failed fetch clears nothing
+        if row is not None and events is not None:
+            events.observe(city, generate_weather_alerts(data['current'], current_pollution(data)))
+    finally:
+        if token is not None:
+            token.end()
+    return row if row is not None else empty_row(city, "error")
+
+
+def run_fleet(sites, workers=DEFAULT_WORKERS, budget=DEFAULT_BUDGET, client=None, history=None,
+              batcher=None, archive=None, events=None, pool=None):
+    """Evaluate every site with bounded concurrency inside a fixed time budget
+
+    Returns ``(results, stats)``: a DataFrame with one row per site in input
+    order, and a dict with elapsed time and throughput. Sites that have not
+    finished when the budget runs out are reported with status ``timeout`` and
+    no longer write to ``history``, ``archive`` or ``events``.
+    Pass a shared :class:`WeatherClient` to reuse its cache across runs, and
+    a :class:`ForecastHistory` to accumulate forecast-versus-observed pairs.
+    With a :class:`GroupBatcher`, current conditions of all sites are fetched
+    first in group requests, leaving forecast and air pollution per site.
+    Fetched payloads are added to a :class:`SnapshotArchive` when given, and
+    alert transitions are published to an :class:`EventBus`. Forecasts are
+    processed on ``pool`` (an :class:`~meteo.workers.AnalyticsPool`) when given.
+    """
+    started = time.monotonic()
+    deadline = started + budget
+    client = client or WeatherClient(session=make_session(workers))
+
+    currents = {}
+    if batcher is not None:
+        currents = batcher.current_many(sites, timeout=budget)
+
+    token = RunToken()
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fleet")
+    futures = {executor.submit(evaluate_site, city, client, deadline, history, currents.get(city), archive,
+                               events, pool, token): city
+               for city in sites}
+    wait(futures, timeout=max(0.0, deadline - time.monotonic()))
+    # Don't wait for stragglers: queued sites are cancelled, in-flight ones may no longer write
+    token.cancel()
+    executor.shutdown(wait=False, cancel_futures=True)
+    elapsed = time.monotonic() - started
+
+    rows = {}
+    for future, city in futures.items():
+        # A site that wrote before the cancel counts, even if its thread is only now returning
+        done = future.done() and not future.cancelled()
+        rows[city] = future.result() if done or city in token.written else empty_row(city, "timeout")
+    results = pd.DataFrame([rows[city] for city in sites], columns=RESULT_COLUMNS)
+
+    completed = int((results["status"] != "timeout").sum())
+    stats = {
+        "sites": len(sites),
+        "completed": completed,
+        "ok": int((results["status"] == "ok").sum()),
+        "timed_out": len(sites) - completed,
+        "elapsed_s": round(elapsed, 3),
+        "sites_per_s": round(completed / elapsed, 2) if elapsed > 0 else 0.0,
+    }
+    return results, stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Evaluate a fleet of sites in one batch job")
+    parser.add_argument("sites", help="text file with one city per line, or CSV with a 'city' column")
+    parser.add_argument("--out", default="fleet_results.csv", help="results table (CSV)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="max concurrent sites")
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET, help="time budget in seconds")
+    parser.add_argument("--history", help="forecast history archive (.npz) to update with this run")
+    parser.add_argument("--archive", help="snapshot archive directory to add fetched payloads to")
+    parser.add_argument("--group", action="store_true", help="fetch current conditions in group requests")
+    parser.add_argument("--city-ids", help="city name -> ID map (.json) for --group, updated with this run")
+    parser.add_argument("--events", action="append", default=[], metavar="SINK",
+                        help="publish alert changes to stdout, file:<path> or a webhook URL (repeatable)")
+    parser.add_argument("--events-state", help="active alerts (.json) to compare against, updated with this run")
+    parser.add_argument("--debounce", type=float, default=DEBOUNCE,
+                        help="seconds an alert change must hold before it is published (with --every)")
+    parser.add_argument("--every", type=float, help="repeat the run every N seconds until interrupted")
+    parser.add_argument("--processes", type=int, default=WORKERS,
+                        help=f"worker processes for forecast processing with {POOL_MIN_SITES}+ sites (0: in-thread)")
+    args = parser.parse_args(argv)
+
+    history = None
+    if args.history:
+        history = ForecastHistory.load(args.history) if os.path.exists(args.history) else ForecastHistory()
+
+    client = WeatherClient(session=make_session(args.workers))
+    batcher = None
+    if args.group or args.city_ids:
+        ids = CityIds.load(args.city_ids) if args.city_ids and os.path.exists(args.city_ids) else CityIds()
+        batcher = GroupBatcher(client, ids)
+
+    sites = load_sites(args.sites)
+    archive = SnapshotArchive(args.archive) if args.archive else None
+    events = None
+    if args.events or args.events_state:
+        tracker = AlertTracker()
+        if args.events_state and os.path.exists(args.events_state):
+            tracker = AlertTracker.load(args.events_state)
+        # A single run publishes what it saw when it ends, so debouncing only applies across --every runs
+        events = EventBus([make_sink(spec) for spec in args.events], tracker,
+                          debounce=args.debounce if args.every else 0.0)
+
+    pool = AnalyticsPool(args.processes) if args.processes > 0 and len(sites) >= POOL_MIN_SITES else None
+
+    status = 0
+    try:
+        while True:
+            started = time.monotonic()
+            results, stats = run_fleet(sites, workers=args.workers, budget=args.budget, client=client,
+                                       history=history, batcher=batcher, archive=archive, events=events, pool=pool)
+            results.to_csv(args.out, index=False)
+            if history is not None:
+                history.save(args.history)
+            if batcher is not None and args.city_ids:
+                batcher.ids.save(args.city_ids)
+            if events is not None and args.events_state:
+                events.tracker.save(args.events_state)
+
+            print(f"Evaluated {stats['completed']}/{stats['sites']} sites ({stats['ok']} ok, "
+                  f"{stats['timed_out']} timed out) in {stats['elapsed_s']}s "
+                  f"-> {stats['sites_per_s']} sites/sec")
+            if batcher is not None:
+                print(f"Current conditions took {batcher.requests} upstream requests for {len(sites)} sites")
+            print(f"Results written to {args.out}")
+            status = 0 if stats['timed_out'] == 0 else 1
+            if not args.every:
+                break
+            time.sleep(max(0.0, started + args.every - time.monotonic()))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        if events is not None:
+            events.close(timeout=args.budget)
+            counts = events.stats()
+            delivered = ", ".join(f"{name}: {s['delivered']} delivered, {s['dropped']} dropped, {s['failed']} failed"
+                                  for name, s in counts["sinks"].items())
+            print(f"Alert changes: {counts['published']} published, {counts['suppressed']} debounced"
+                  + (f" ({delivered})" if delivered else ""))
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,29 @@
+"""Forecast payload processing"""
+from __future__ import annotations
+
+from datetime import datetime
+
+import pandas as pd
+
+from .models import Payload
+
+
+def process_forecast(forecast_data: Payload) -> pd.DataFrame:
+    """Convert raw forecast to meaningful pandas analysis"""
+    rows = []
+    for item in forecast_data['list']:
+        rows.append({
+            "timestamp": datetime.fromtimestamp(item['dt']),
+            "temp": item['main']['temp'],
+            "feels_like": item['main']['feels_like'],
+            "humidity": item['main']['humidity'],
+            "pressure": item['main']['pressure'],
+            "wind_speed": item['wind']['speed'],
+            "clouds": item['clouds']['all'],
+            "weather": item['weather'][0]['main'],
+            "description": item['weather'][0]['description']
+        })
+    df = pd.DataFrame(rows)
+    df['date'] = df['timestamp'].dt.date
+    df['hour'] = df['timestamp'].dt.hour
+    return df
@@ -0,0 +1,250 @@
+"""Regional gridded fields interpolated from batched point samples.
+
+The map is divided into fixed square tiles of ``tile_deg`` degrees, each
+sampled on a small regular lattice of points. Tiles are fetched as a unit
+through the shared client (which caches and rate-limits every call) and kept
+in a :class:`TileCache`, so panning or zooming only fetches the tiles that
+were not seen yet. Samples from all visible tiles are then interpolated
+onto a raster with :func:`scipy.interpolate.griddata` or an RBF.
+"""
+from __future__ import annotations
+
+import math
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from scipy.interpolate import RBFInterpolator, griddata
+
+from .client import CACHE_TTL, WeatherClient, default_client
+from .models import Payload
+
+TILE_DEG = 0.5
+POINTS_PER_TILE = 3    # samples per tile side, so 9 points per tile
+BATCH_SIZE = 16        # points fetched concurrently
+MAX_TILES = 64         # per request; larger regions should use a bigger tile
+# Widest square span that fits MAX_TILES wherever it falls (an unaligned span touches one extra tile per side)
+MAX_SPAN_DEG = (math.isqrt(MAX_TILES) - 1) * TILE_DEG
+TILE_CACHE_SIZE = 2048
+
+
+class Variable(NamedTuple):
+    label: str
+    unit: str
+    source: str                                # "weather" or "pollution"
+    extract: Callable[[Payload], Optional[float]]
+
+
+def _pollution_aqi(payload: Payload) -> Optional[float]:
+    samples = payload.get('list')
+    return float(samples[0]['main']['aqi']) if samples else None
+
+
+VARIABLES: Dict[str, Variable] = {
+    "temp": Variable("Temperature", "°C", "weather", lambda p: float(p['main']['temp'])),
+    "aqi": Variable("Air Quality (AQI)", "AQI", "pollution", _pollution_aqi),
+    "wind": Variable("Wind Speed", "m/s", "weather", lambda p: float(p['wind']['speed'])),
+}
+
+
+class BBox(NamedTuple):
+    south: float
+    west: float
+    north: float
+    east: float
+
+    @classmethod
+    def around(cls, lat: float, lon: float, span_deg: float) -> "BBox":
+        half = span_deg / 2
+        return cls(max(lat - half, -90.0), lon - half, min(lat + half, 90.0), lon + half)
+
+
+@dataclass(frozen=True)
+class Tile:
+    key: Tuple[str, float, int, int]    # (source, tile_deg, row, col)
+    lat: np.ndarray
+    lon: np.ndarray
+    payloads: Tuple[Optional[Payload], ...]
+    fetched_at: float
+
+
+class RegionalField(NamedTuple):
+    lat: np.ndarray                     # (rows,) raster axes
+    lon: np.ndarray                     # (cols,)
+    values: np.ndarray                  # (rows, cols)
+    sample_lat: np.ndarray
+    sample_lon: np.ndarray
+    sample_values: np.ndarray
+    tiles: int
+    tiles_fetched: int
+
+
+def tile_range(bbox: BBox, tile_deg: float = TILE_DEG) -> Tuple[range, range]:
+    """Tile rows and columns overlapping a bounding box"""
+    rows = range(math.floor(bbox.south / tile_deg), math.ceil(bbox.north / tile_deg))
+    cols = range(math.floor(bbox.west / tile_deg), math.ceil(bbox.east / tile_deg))
+    return rows, cols
+
+
+def tile_points(row: int, col: int, tile_deg: float = TILE_DEG,
+                points: int = POINTS_PER_TILE) -> Tuple[np.ndarray, np.ndarray]:
+    """Cell-centred sample lattice of one tile, flattened"""
+    offsets = (np.arange(points) + 0.5) * tile_deg / points
+    lat, lon = np.meshgrid(row * tile_deg + offsets, col * tile_deg + offsets, indexing='ij')
+    return lat.ravel(), lon.ravel()
+
+
+def _wrap(lon: np.ndarray) -> np.ndarray:
+    return (lon + 180.0) % 360.0 - 180.0
+
+
+class TileCache:
+    """LRU of fetched tiles, expired after the client's TTL"""
+
+    def __init__(self, ttl: float = CACHE_TTL, max_tiles: int = TILE_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_tiles = max_tiles
+        self._tiles: OrderedDict[tuple, Tile] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple) -> Optional[Tile]:
+        with self._lock:
+            tile = self._tiles.get(key)
+            if tile is None:
+                return None
+            if time.monotonic() - tile.fetched_at > self.ttl:
+                del self._tiles[key]
+                return None
+            self._tiles.move_to_end(key)
+            return tile
+
+    def put(self, tile: Tile) -> None:
+        with self._lock:
+            self._tiles[tile.key] = tile
+            self._tiles.move_to_end(tile.key)
+            while len(self._tiles) > self.max_tiles:
+                self._tiles.popitem(last=False)
+
+    def __len__(self):
+        return len(self._tiles)
+
+
+class GridSampler:
+    """Fetches tiles of point samples in batches and interpolates them"""
+
+    def __init__(self, client: Optional[WeatherClient] = None, tiles: Optional[TileCache] = None,
+                 tile_deg: float = TILE_DEG, points: int = POINTS_PER_TILE,
+                 batch_size: int = BATCH_SIZE):
+        self.client = client if client is not None else default_client()
+        self.tiles = tiles if tiles is not None else TileCache(ttl=self.client.ttl)
+        self.tile_deg = tile_deg
+        self.points = points
+        self.batch_size = batch_size
+
+    def _fetch_point(self, source: str, lat: float, lon: float) -> Optional[Payload]:
+        fetch = self.client.current_at if source == "weather" else self.client.pollution_at
+        try:
+            # TileCache holds the points; keep them out of the client's city LRU
+            payload = fetch(lat, lon, cache=False)
+        except Exception:
+            return None
+        return payload if str(payload.get("cod", 200)) == "200" else None
+
+    def _fetch_tiles(self, source: str, keys: List[tuple]) -> List[Tile]:
+        lattices = [tile_points(row, col, self.tile_deg, self.points) for _, _, row, col in keys]
+        jobs = [(source, float(la), float(_wrap(lo)))
+                for lat, lon in lattices for la, lo in zip(lat, lon)]
+        with ThreadPoolExecutor(max_workers=self.batch_size) as pool:
+            payloads = list(pool.map(lambda job: self._fetch_point(*job), jobs))
+
+        now = time.monotonic()
+        per_tile = self.points * self.points
+        tiles = []
+        for i, (key, (lat, lon)) in enumerate(zip(keys, lattices)):
+            tile = Tile(key, lat, lon, tuple(payloads[i * per_tile:(i + 1) * per_tile]), now)
+            # Keep partially failed tiles out of the cache so they are retried
+            if all(p is not None for p in tile.payloads):
+                self.tiles.put(tile)
+            tiles.append(tile)
+        return tiles
+
+    def sample(self, bbox: BBox, variable: str = "temp") -> Tuple[np.ndarray, np.ndarray, np.ndarray, int, int]:
+        """Point samples of ``variable`` over a bbox: ``(lat, lon, values, tiles, fetched)``"""
+        var = VARIABLES[variable]
+        rows, cols = tile_range(bbox, self.tile_deg)
+        if len(rows) * len(cols) > MAX_TILES:
+            raise ValueError(f"Region covers {len(rows) * len(cols)} tiles; at most {MAX_TILES} allowed")
+
+        keys = [(var.source, self.tile_deg, r, c) for r in rows for c in cols]
+        tiles, missing = [], []
+        for key in keys:
+            tile = self.tiles.get(key)
+            if tile is None:
+                missing.append(key)
+            else:
+                tiles.append(tile)
+        if missing:
+            tiles.extend(self._fetch_tiles(var.source, missing))
+
+        lat = np.concatenate([t.lat for t in tiles])
+        lon = np.concatenate([t.lon for t in tiles])
+        values = np.array([var.extract(p) if p is not None else np.nan
+                           for t in tiles for p in t.payloads], dtype=np.float64)
+        ok = np.isfinite(values)
+        return lat[ok], lon[ok], values[ok], len(keys), len(missing)
+
+    def field(self, bbox: BBox, variable: str = "temp", resolution: int = 80,
+              method: str = "linear") -> RegionalField:
+        """Interpolated raster of ``variable`` over a bbox"""
+        lat, lon, values, n_tiles, n_fetched = self.sample(bbox, variable)
+        grid_lat = np.linspace(bbox.south, bbox.north, resolution)
+        grid_lon = np.linspace(bbox.west, bbox.east, resolution)
+        raster = interpolate(lat, lon, values, grid_lat, grid_lon, method=method)
+        return RegionalField(grid_lat, grid_lon, raster, lat, lon, values, n_tiles, n_fetched)
+
+
+def interpolate(lat: np.ndarray, lon: np.ndarray, values: np.ndarray,
+                grid_lat: np.ndarray, grid_lon: np.ndarray, method: str = "linear") -> np.ndarray:
+    """Scattered samples onto a ``(len(grid_lat), len(grid_lon))`` raster
+
+    ``method`` is ``"linear"``, ``"cubic"`` or ``"nearest"`` for
+    :func:`~scipy.interpolate.griddata`, or ``"rbf"`` for a thin-plate spline.
+    Cells outside the convex hull of the samples fall back to nearest values.
+    """
+    raster = np.full((len(grid_lat), len(grid_lon)), np.nan)
+    if len(values) == 0:
+        return raster
+    glat, glon = np.meshgrid(grid_lat, grid_lon, indexing='ij')
+    points = np.column_stack([lat, lon])
+    targets = np.column_stack([glat.ravel(), glon.ravel()])
+
+    if len(values) < 4 or method == "nearest":
+        return griddata(points, values, targets, method="nearest").reshape(glat.shape)
+    if method == "rbf":
+        rbf = RBFInterpolator(points, values, kernel="thin_plate_spline", smoothing=1e-3,
+                              neighbors=min(len(values), 64))
+        return rbf(targets).reshape(glat.shape)
+
+    raster = griddata(points, values, targets, method=method)
+    holes = np.isnan(raster)
+    if holes.any():
+        raster[holes] = griddata(points, values, targets[holes], method="nearest")
+    return raster.reshape(glat.shape)
+
+
+_default_sampler: Optional[GridSampler] = None
+_default_lock = threading.Lock()
+
+
+def default_sampler() -> GridSampler:
+    """Grid sampler over the default client, sharing one tile cache"""
+    global _default_sampler
+    if _default_sampler is None:
+        with _default_lock:
+            if _default_sampler is None:
+                _default_sampler = GridSampler()
+    return _default_sampler
@@ -0,0 +1,136 @@
+"""Forecast-versus-observed history per city.
+
+Every ingested bundle contributes one observation (the current conditions)
+and one issued forecast (the 3-hourly slots). Pairing a slot with the
+observation closest to its valid time gives the forecast error at a known
+lead time, which is what :mod:`meteo.correction` fits.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from .client import WeatherClient
+from .models import WeatherData
+
+OBSERVATION_CAPACITY = 4096
+FORECAST_CAPACITY = 8192        # 40 slots per issue -> ~200 issues per city
+MIN_ISSUE_INTERVAL = 1800       # a re-fetched, unchanged forecast is not a new issue
+PAIR_TOLERANCE = 90 * 60        # max distance between slot time and observation time
+
+
+class _Buffer:
+    """Append-only float64 table that keeps the newest ``capacity`` rows"""
+
+    def __init__(self, width: int, capacity: int):
+        self.capacity = capacity
+        self.data = np.empty((min(64, capacity), width))
+        self.n = 0
+
+    def extend(self, rows: np.ndarray) -> None:
+        rows = np.atleast_2d(rows)[-self.capacity:]
+        needed = self.n + len(rows)
+        if needed > len(self.data) and len(self.data) < self.capacity:
+            grown = np.empty((min(self.capacity, max(needed, 2 * len(self.data))), self.data.shape[1]))
+            grown[:self.n] = self.data[:self.n]
+            self.data = grown
+        overflow = needed - len(self.data)
+        if overflow > 0:
+            self.data[:self.n - overflow] = self.data[overflow:self.n]
+            self.n -= overflow
+        self.data[self.n:self.n + len(rows)] = rows
+        self.n += len(rows)
+
+    def view(self) -> np.ndarray:
+        return self.data[:self.n]
+
+
+class ForecastHistory:
+    """Per-city observations ``(epoch, temp)`` and issued slots ``(issued, valid, temp)``"""
+
+    def __init__(self):
+        self._observations: Dict[str, _Buffer] = {}
+        self._forecasts: Dict[str, _Buffer] = {}
+        self._last_issue: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self.version = 0
+
+    def record(self, city: str, data: WeatherData, now: Optional[float] = None) -> None:
+        """Add one fetched bundle to the history"""
+        now = time.time() if now is None else now
+        cw = data['current']
+        observation = np.array([cw['dt'], cw['main']['temp']], dtype=np.float64)
+        slots = np.array([(now, item['dt'], item['main']['temp']) for item in data['forecast']['list']],
+                         dtype=np.float64)
+        key = WeatherClient.cache_key(city)
+        with self._lock:
+            obs = self._observations.setdefault(key, _Buffer(2, OBSERVATION_CAPACITY))
+            if obs.n == 0 or obs.view()[-1, 0] != observation[0]:
+                obs.extend(observation)
+                self.version += 1
+            if now - self._last_issue.get(key, -np.inf) >= MIN_ISSUE_INTERVAL and len(slots):
+                self._forecasts.setdefault(key, _Buffer(3, FORECAST_CAPACITY)).extend(slots)
+                self._last_issue[key] = now
+                self.version += 1
+
+    def cities(self):
+        with self._lock:
+            return list(self._forecasts)
+
+    def pairs(self, city: str, tolerance: float = PAIR_TOLERANCE) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Matched ``(lead_hours, valid_hour_utc, error)`` arrays, error = observed - forecast
+
+        Hours are UTC; a city's fixed UTC offset is only a phase shift, which
+        the harmonic hour-of-day terms of the correction model absorb.
+        """
+        key = WeatherClient.cache_key(city)
+        with self._lock:
+            obs = self._observations.get(key)
+            fc = self._forecasts.get(key)
+            obs = obs.view().copy() if obs is not None else np.empty((0, 2))
+            fc = fc.view().copy() if fc is not None else np.empty((0, 3))
+        empty = np.empty(0)
+        if len(obs) == 0 or len(fc) == 0:
+            return empty, empty, empty
+
+        obs = obs[np.argsort(obs[:, 0], kind="stable")]
+        issued, valid, predicted = fc[:, 0], fc[:, 1], fc[:, 2]
+        # Nearest observation to each slot's valid time
+        idx = np.searchsorted(obs[:, 0], valid).clip(0, len(obs) - 1)
+        left = (idx - 1).clip(0)
+        nearest = np.where(np.abs(obs[left, 0] - valid) <= np.abs(obs[idx, 0] - valid), left, idx)
+        matched = (np.abs(obs[nearest, 0] - valid) <= tolerance) & (valid > issued)
+
+        lead_hours = (valid[matched] - issued[matched]) / 3600.0
+        hour = (valid[matched] // 3600) % 24
+        error = obs[nearest[matched], 1] - predicted[matched]
+        return lead_hours, hour, error
+
+    def save(self, path: str) -> None:
+        """Persist to a single ``.npz`` archive"""
+        with self._lock:
+            arrays = {}
+            for key, buf in self._observations.items():
+                arrays[f"obs::{key}"] = buf.view()
+            for key, buf in self._forecasts.items():
+                arrays[f"fc::{key}"] = buf.view()
+        np.savez_compressed(path, **arrays)
+
+    @classmethod
+    def load(cls, path: str) -> "ForecastHistory":
+        history = cls()
+        with np.load(path) as archive:
+            for name in archive.files:
+                kind, key = name.split("::", 1)
+                if kind == "obs":
+                    buf = history._observations.setdefault(key, _Buffer(2, OBSERVATION_CAPACITY))
+                else:
+                    buf = history._forecasts.setdefault(key, _Buffer(3, FORECAST_CAPACITY))
+                    history._last_issue[key] = float(archive[name][-1, 0]) if len(archive[name]) else -np.inf
+                if len(archive[name]):
+                    buf.extend(archive[name])
+        history.version = 1
+        return history
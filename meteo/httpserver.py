@@ -0,0 +1,194 @@
+"""Minimal asyncio HTTP/1.1 server used by the local JSON services.
+
+Only what the internal services need: GET/POST routing on exact paths, query
+parsing, keep-alive, JSON responses with strong ETags and ``If-None-Match``
+revalidation. No third-party web framework is required.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import math
+from dataclasses import dataclass, field
+from http import HTTPStatus
+from typing import Awaitable, Callable, Dict, List, Optional
+from urllib.parse import parse_qs, urlsplit
+
+logger = logging.getLogger(__name__)
+
+MAX_HEADER_BYTES = 16 * 1024
+MAX_BODY_BYTES = 1024 * 1024
+KEEPALIVE_TIMEOUT = 15.0
+
+
+@dataclass
+class Request:
+    method: str
+    path: str
+    query: Dict[str, List[str]]
+    headers: Dict[str, str]
+    body: bytes = b""
+
+    def arg(self, name: str, default: Optional[str] = None) -> Optional[str]:
+        values = self.query.get(name)
+        return values[0] if values else default
+
+    def list_arg(self, name: str) -> List[str]:
+        """Comma-separated and/or repeated query parameter as a list"""
+        items = []
+        for value in self.query.get(name, []):
+            items.extend(v.strip() for v in value.split(","))
+        return [v for v in items if v]
+
+
+@dataclass
+class Response:
+    status: int = 200
+    body: bytes = b""
+    headers: Dict[str, str] = field(default_factory=dict)
+
+
+Handler = Callable[[Request], Awaitable[Response]]
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str = ""):
+        super().__init__(message)
+        self.status = status
+        self.message = message or HTTPStatus(status).phrase
+
+
+def etag_for(body: bytes) -> str:
+    return '"' + hashlib.sha1(body).hexdigest() + '"'
+
+
+def finite(payload):
+    """``payload`` with NaN and infinite floats replaced by None (JSON has no literal for them)"""
+    if isinstance(payload, float):
+        return payload if math.isfinite(payload) else None
+    if isinstance(payload, dict):
+        return {key: finite(value) for key, value in payload.items()}
+    if isinstance(payload, (list, tuple)):
+        return [finite(value) for value in payload]
+    return payload
+
+
+def json_response(payload, request: Optional[Request] = None, status: int = 200,
+                  max_age: int = 0) -> Response:
+    """Serialize ``payload`` and answer 304 when the client already has it"""
+    try:
+        body = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str, allow_nan=False)
+    except ValueError:
+        body = json.dumps(finite(payload), sort_keys=True, separators=(",", ":"), default=str)
+    body = body.encode()
+    tag = etag_for(body)
+    headers = {"Content-Type": "application/json", "ETag": tag,
+               "Cache-Control": f"max-age={max_age}"}
+    if request is not None and status == 200:
+        client_tags = request.headers.get("if-none-match", "")
+        if tag in (t.strip() for t in client_tags.split(",")) or client_tags.strip() == "*":
+            return Response(304, b"", headers)
+    return Response(status, body, headers)
+
+
+def error_response(status: int, message: str) -> Response:
+    return json_response({"error": message}, status=status)
+
+
+async def read_request(reader: asyncio.StreamReader) -> Optional[Request]:
+    """Parse one request off the stream; None when the peer closed it"""
+    try:
+        head = await reader.readuntil(b"\r\n\r\n")
+    except asyncio.IncompleteReadError:
+        return None
+    except asyncio.LimitOverrunError:
+        raise HTTPError(431)
+    if len(head) > MAX_HEADER_BYTES:
+        raise HTTPError(431)
+
+    lines = head.decode("latin-1").split("\r\n")
+    try:
+        method, target, _version = lines[0].split(" ", 2)
+    except ValueError:
+        raise HTTPError(400, "malformed request line")
+    headers = {}
+    for line in lines[1:]:
+        if ":" in line:
+            name, value = line.split(":", 1)
+            headers[name.strip().lower()] = value.strip()
+
+    try:
+        length = int(headers.get("content-length", 0) or 0)
+    except ValueError:
+        raise HTTPError(400, "invalid Content-Length")
+    if length < 0:
+        raise HTTPError(400, "invalid Content-Length")
+    if length > MAX_BODY_BYTES:
+        raise HTTPError(413)
+    body = await reader.readexactly(length) if length else b""
+    url = urlsplit(target)
+    return Request(method.upper(), url.path, parse_qs(url.query), headers, body)
+
+
+async def write_response(writer: asyncio.StreamWriter, response: Response, keep_alive: bool) -> None:
+    reason = HTTPStatus(response.status).phrase
+    headers = dict(response.headers)
+    headers["Content-Length"] = str(len(response.body))
+    headers["Connection"] = "keep-alive" if keep_alive else "close"
+    head = f"HTTP/1.1 {response.status} {reason}\r\n"
+    head += "".join(f"{k}: {v}\r\n" for k, v in headers.items()) + "\r\n"
+    writer.write(head.encode("latin-1") + response.body)
+    await writer.drain()
+
+
+def make_connection_handler(routes: Dict[str, Handler]):
+    """Wrap a ``{path: async handler}`` table into an ``asyncio.start_server`` callback"""
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(read_request(reader), KEEPALIVE_TIMEOUT)
+                except asyncio.TimeoutError:
+                    break
+                except HTTPError as exc:
+                    await write_response(writer, error_response(exc.status, exc.message), False)
+                    break
+                if request is None:
+                    break
+
+                handler = routes.get(request.path)
+                try:
+                    if handler is None:
+                        raise HTTPError(404, f"no route for {request.path}")
+                    if request.method not in ("GET", "POST"):
+                        raise HTTPError(405)
+                    response = await handler(request)
+                except HTTPError as exc:
+                    response = error_response(exc.status, exc.message)
+                except Exception:
+                    logger.exception("Unhandled error serving %s", request.path)
+                    response = error_response(500, "internal error")
+
+                keep_alive = request.headers.get("connection", "").lower() != "close"
+                await write_response(writer, response, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    return handle
+
+
+async def serve(routes: Dict[str, Handler], host: str, port: int) -> None:
+    """Serve ``routes`` until cancelled"""
+    server = await asyncio.start_server(make_connection_handler(routes), host, port,
+                                        limit=MAX_HEADER_BYTES)
+    addrs = ", ".join(str(s.getsockname()) for s in server.sockets)
+    logger.info("Listening on %s", addrs)
+    async with server:
+        await server.serve_forever()
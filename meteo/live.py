@@ -0,0 +1,175 @@
+"""Background polling of current conditions for live dashboards.
+
+A single :class:`SnapshotPoller` per process watches the cities that open
+dashboards are showing. It polls only the current-weather endpoint (one
+lookup per city and interval, shared by all viewers and packed into group
+requests when a :class:`~meteo.batcher.GroupBatcher` is given) and keeps a
+short series of distinct observations per city, so the UI can redraw just the
+cards and traces that changed instead of rerunning the whole page.
+Cities nobody has asked about recently are dropped automatically.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, List, NamedTuple, Optional
+
+from .batcher import GroupBatcher, default_batcher
+from .client import WeatherClient, default_client
+from .models import Payload
+
+DEFAULT_INTERVAL = 60.0
+MIN_INTERVAL = 15.0      # seconds; protects the API quota from very short settings
+IDLE_TIMEOUT = 300.0     # stop polling a city this long after its last viewer
+LIVE_POINTS = 240        # observations kept per city
+
+
+class Snapshot(NamedTuple):
+    city: str
+    version: int         # increases by one with every new observation of the city
+    observed_at: int     # observation time reported upstream (``dt``)
+    received_at: float
+    current: Payload
+
+
+class _Watch:
+    __slots__ = ("city", "interval", "last_seen", "last_polled", "snapshots")
+
+    def __init__(self, city: str, interval: float):
+        self.city = city
+        self.interval = interval
+        self.last_seen = time.monotonic()
+        self.last_polled = 0.0
+        self.snapshots: Deque[Snapshot] = deque(maxlen=LIVE_POINTS)
+
+
+class SnapshotPoller:
+    """Daemon thread polling watched cities and recording new observations"""
+
+    def __init__(self, client: Optional[WeatherClient] = None, tick: float = 1.0,
+                 idle_timeout: float = IDLE_TIMEOUT, batcher: Optional[GroupBatcher] = None):
+        self.client = client if client is not None else default_client()
+        self.batcher = batcher
+        self.tick = tick
+        self.idle_timeout = idle_timeout
+        self._watches: Dict[str, _Watch] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def watch(self, city: str, interval: float = DEFAULT_INTERVAL,
+              seed: Optional[Payload] = None) -> None:
+        """Keep ``city`` polled every ``interval`` seconds; call on every view
+
+        The shortest interval requested by any viewer wins. ``seed`` is an
+        already fetched current payload used as the first observation.
+        """
+        interval = max(float(interval), MIN_INTERVAL)
+        key = WeatherClient.cache_key(city)
+        with self._lock:
+            watch = self._watches.get(key)
+            if watch is None:
+                watch = self._watches[key] = _Watch(city, interval)
+                watch.last_polled = time.monotonic()
+            else:
+                # A new viewer may ask for a shorter interval; an idle one stops counting
+                if time.monotonic() - watch.last_seen > watch.interval:
+                    watch.interval = interval
+                else:
+                    watch.interval = min(watch.interval, interval)
+                watch.last_seen = time.monotonic()
+            if seed is not None:
+                self._observe(watch, seed)
+        self._ensure_running()
+
+    def unwatch(self, city: str) -> None:
+        with self._lock:
+            self._watches.pop(WeatherClient.cache_key(city), None)
+
+    def latest(self, city: str) -> Optional[Snapshot]:
+        with self._lock:
+            watch = self._watches.get(WeatherClient.cache_key(city))
+            return watch.snapshots[-1] if watch and watch.snapshots else None
+
+    def since(self, city: str, version: int = -1) -> List[Snapshot]:
+        """Observations newer than ``version``, oldest first"""
+        with self._lock:
+            watch = self._watches.get(WeatherClient.cache_key(city))
+            if watch is None:
+                return []
+            return [s for s in watch.snapshots if s.version > version]
+
+    def watched(self) -> List[str]:
+        with self._lock:
+            return [w.city for w in self._watches.values()]
+
+    @staticmethod
+    def _observe(watch: _Watch, current: Payload) -> bool:
+        last = watch.snapshots[-1] if watch.snapshots else None
+        if last is not None and current['dt'] <= last.observed_at:
+            return False
+        version = last.version + 1 if last else 0
+        watch.snapshots.append(Snapshot(watch.city, version, current['dt'], time.time(), current))
+        return True
+
+    def poll_once(self) -> int:
+        """Poll every due city now; returns the number of new observations"""
+        now = time.monotonic()
+        with self._lock:
+            for key in [k for k, w in self._watches.items() if now - w.last_seen > self.idle_timeout]:
+                del self._watches[key]
+            due = [w for w in self._watches.values() if now - w.last_polled >= w.interval]
+            for watch in due:
+                watch.last_polled = now
+
+        if self.batcher is not None and due:
+            observed = self.batcher.current_many([w.city for w in due], timeout=self.client.timeout,
+                                                 use_cache=False)
+        else:
+            observed = {}
+            for watch in due:
+                try:
+                    observed[watch.city] = self.client.fetch_current(watch.city)
+                except Exception:
+                    continue
+
+        updated = 0
+        for watch in due:
+            current = observed.get(watch.city)
+            if current is not None:
+                with self._lock:
+                    updated += self._observe(watch, current)
+        return updated
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.tick):
+            self.poll_once()
+
+    def _ensure_running(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._stop.clear()
+                    self._thread = threading.Thread(target=self._run, name="meteo-live-poller", daemon=True)
+                    self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+_default_poller: Optional[SnapshotPoller] = None
+_default_lock = threading.Lock()
+
+
+def default_poller() -> SnapshotPoller:
+    """Process-wide poller shared by every dashboard session"""
+    global _default_poller
+    if _default_poller is None:
+        with _default_lock:
+            if _default_poller is None:
+                _default_poller = SnapshotPoller(batcher=default_batcher())
+    return _default_poller
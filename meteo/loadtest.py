@@ -0,0 +1,408 @@
+"""Load generator driving many simulated dashboard sessions against a stub backend.
+
+Each simulated user is a :class:`streamlit.testing.v1.AppTest` session on
+its own thread, all inside this one process, the way a single Streamlit
+server runs one script thread per browser session. Users follow a realistic
+flow (open the page, search cities, toggle the unit, add comparison
+cities) against the offline OpenWeather stand-in from :mod:`meteo.replay`,
+so results measure app.py itself and never touch the live API::
+
+    python -m meteo.loadtest --sessions 1,4,8,16 --iterations 2 --latency-ms 50
+    python -m meteo.loadtest --archive recorded.jsonl.gz --out reports/loadtest
+
+Every concurrency level reports throughput, latency percentiles (overall
+and per step), errors, CPU seconds and RSS growth per session. The report
+is written as JSON (stable key order, for diffing between releases) and as
+a standalone HTML page. Switching tabs is client-side in Streamlit and
+costs no rerun; every tab is rendered on each run, so its cost is included.
+
+Requires Streamlit; the rest of :mod:`meteo` does not.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import sys
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+from .httpserver import serve
+from .replay import PayloadArchive, ReplayServer, request_key
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+DEFAULT_LEVELS = (1, 4, 8)
+DEFAULT_ITERATIONS = 2
+STEP_TIMEOUT = 120.0
+SAMPLE_INTERVAL = 0.2
+
+# name: (lat, lon, typical temperature in °C)
+CITIES = {
+    "Mumbai": (19.07, 72.88, 30), "Delhi": (28.61, 77.21, 33), "New York": (40.71, -74.01, 14),
+    "London": (51.51, -0.13, 11), "Tokyo": (35.68, 139.69, 17), "Paris": (48.86, 2.35, 13),
+    "Berlin": (52.52, 13.40, 10), "Sydney": (-33.87, 151.21, 19), "Toronto": (43.65, -79.38, 8),
+    "Dubai": (25.20, 55.27, 34), "Singapore": (1.35, 103.82, 28), "Cairo": (30.04, 31.24, 26),
+}
+CONDITIONS = [("Clear", "clear sky"), ("Clouds", "scattered clouds"), ("Rain", "light rain"),
+              ("Clouds", "overcast clouds"), ("Mist", "mist")]
+
+
+class StepResult(NamedTuple):
+    session: int
+    step: str
+    latency_s: float
+    ok: bool
+
+
+def _dumps(payload) -> bytes:
+    return json.dumps(payload, separators=(",", ":")).encode()
+
+
+def synthetic_archive(cities: Dict[str, tuple] = CITIES, seed: int = 0,
+                      now: Optional[int] = None) -> PayloadArchive:
+    """Plausible recorded responses for ``cities`` when no real recording is at hand"""
+    rng = random.Random(seed)
+    now = int(time.time()) if now is None else now
+    archive = PayloadArchive()
+    for i, (name, (lat, lon, base)) in enumerate(cities.items()):
+        main, description = rng.choice(CONDITIONS)
+        current = {
+            "cod": 200, "id": 1000 + i, "name": name, "dt": now, "timezone": 0,
+            "coord": {"lat": lat, "lon": lon},
+            "main": {"temp": base + rng.uniform(-3, 3), "feels_like": base + rng.uniform(-2, 4),
+                     "humidity": rng.randint(30, 90), "pressure": rng.randint(1000, 1025)},
+            "wind": {"speed": round(rng.uniform(0.5, 12), 1), "deg": rng.randint(0, 359)},
+            "clouds": {"all": rng.randint(0, 100)},
+            "weather": [{"main": main, "description": description}],
+        }
+        t0 = now // 10800 * 10800 + 10800
+        forecast = {"cod": "200", "cnt": 40, "list": []}
+        for k in range(40):
+            main, description = rng.choice(CONDITIONS)
+            temp = base + 4 * np.sin(2 * np.pi * ((t0 // 3600 + 3 * k) % 24 - 9) / 24) + rng.gauss(0, 1)
+            forecast["list"].append({
+                "dt": t0 + 10800 * k,
+                "main": {"temp": round(temp, 2), "feels_like": round(temp + rng.uniform(-2, 2), 2),
+                         "humidity": rng.randint(30, 95), "pressure": rng.randint(998, 1026)},
+                "wind": {"speed": round(rng.uniform(0.5, 14), 2)},
+                "clouds": {"all": rng.randint(0, 100)},
+                "weather": [{"main": main, "description": description}],
+            })
+        pollution = {"list": [{"dt": now, "main": {"aqi": rng.randint(1, 5)}, "components": {
+            "co": rng.uniform(200, 900), "no2": rng.uniform(5, 80), "o3": rng.uniform(20, 140),
+            "so2": rng.uniform(1, 40), "pm2_5": rng.uniform(5, 120), "pm10": rng.uniform(10, 180)}}]}
+
+        q = [("q", name), ("units", "metric")]
+        archive.add(request_key("/data/2.5/weather", q), 200, _dumps(current))
+        archive.add(request_key("/data/2.5/forecast", q), 200, _dumps(forecast))
+        archive.add(request_key("/data/2.5/air_pollution", [("lat", str(lat)), ("lon", str(lon))]),
+                    200, _dumps(pollution))
+    return archive
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_stub(archive: PayloadArchive, latency_ms: float = 0.0, jitter_ms: float = 0.0,
+               error_rate: float = 0.0, seed: Optional[int] = None) -> str:
+    """Serve ``archive`` on a daemon thread; returns its base URL"""
+    port = _free_port()
+    server = ReplayServer(archive, latency_ms=latency_ms, jitter_ms=jitter_ms,
+                          error_rate=error_rate, seed=seed)
+    thread = threading.Thread(target=lambda: asyncio.run(serve(server.routes, "127.0.0.1", port)),
+                              name="meteo-replay-stub", daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            break
+        except OSError:
+            time.sleep(0.05)
+    return f"http://127.0.0.1:{port}"
+
+
+def use_backend(base_url: str) -> None:
+    """Route every request of this process to ``base_url``, unthrottled
+
+    The client reads its settings at import, so this must run before the app
+    (or anything else) imports :mod:`meteo.client`.
+    """
+    os.environ["OPENWEATHER_BASE_URL"] = base_url
+    os.environ["OPENWEATHER_RATE_LIMIT"] = "0"
+    client = sys.modules.get("meteo.client")
+    if client is not None and client.BASE_URL != base_url.rstrip("/"):
+        raise RuntimeError("meteo.client was imported before the load-test backend was set")
+
+
+def _rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as fh:
+            return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        import resource
+
+        # ru_maxrss is a peak in KiB on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+class ResourceSampler:
+    """Background sampler of process RSS while a level runs"""
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL):
+        self.interval = interval
+        self.samples: List[int] = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.samples.append(_rss_bytes())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.cpu_start = time.process_time()
+        self.rss_start = _rss_bytes()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.cpu_s = time.process_time() - self.cpu_start
+        self.rss_peak = max(self.samples + [_rss_bytes()])
+
+
+class SessionDriver:
+    """One simulated user clicking through the dashboard"""
+
+    def __init__(self, session_id: int, app_path: str = APP_PATH, seed: int = 0):
+        from streamlit.testing.v1 import AppTest
+
+        self.session_id = session_id
+        self.app = AppTest.from_file(app_path, default_timeout=STEP_TIMEOUT)
+        self.random = random.Random(seed * 7919 + session_id)
+        self.results: List[StepResult] = []
+
+    def _widget(self, kind: str, label: str):
+        return next(w for w in getattr(self.app, kind) if w.label == label)
+
+    def _step(self, name: str, action=None) -> None:
+        start = time.perf_counter()
+        ok = True
+        try:
+            if action is not None:
+                action()
+            self.app.run()
+            ok = not self.app.exception
+        except Exception:
+            ok = False
+        self.results.append(StepResult(self.session_id, name, time.perf_counter() - start, ok))
+
+    def open(self) -> None:
+        self._step("open")
+
+    def search(self) -> None:
+        city = self.random.choice(list(CITIES))
+        self._step("search", lambda: self._widget("text_input", "📍 Search City").set_value(city))
+
+    def toggle_unit(self) -> None:
+        radio = self._widget("radio", "🌡️ Temperature Unit")
+        unit = "Fahrenheit" if radio.value == "Celsius" else "Celsius"
+        self._step("toggle_unit", lambda: radio.set_value(unit))
+
+    def compare(self) -> None:
+        if not self._widget("checkbox", "Enable Comparison Mode").value:
+            self._step("enable_compare", lambda: self._widget("checkbox", "Enable Comparison Mode").check())
+        city = self.random.choice(list(CITIES))
+        self._step("type_compare", lambda: self._widget("text_input", "Add city to compare").set_value(city))
+        self._step("add_compare", lambda: self._widget("button", "Add to Comparison").click())
+
+    def flow(self, iterations: int) -> List[StepResult]:
+        """Open the page, then repeat: search, toggle unit, compare twice, toggle back"""
+        try:
+            self.open()
+            for _ in range(iterations):
+                self.search()
+                self.toggle_unit()
+                self.compare()
+                self.compare()
+                self.toggle_unit()
+        except StopIteration:
+            # A widget is missing, e.g. the page failed to render
+            self.results.append(StepResult(self.session_id, "missing_widget", 0.0, False))
+        return self.results
+
+
+def _percentiles(latencies: Sequence[float]) -> Dict[str, float]:
+    if not len(latencies):
+        return {"count": 0}
+    values = np.asarray(latencies) * 1000.0
+    p50, p90, p95, p99 = np.percentile(values, [50, 90, 95, 99])
+    return {"count": int(len(values)), "mean_ms": round(float(values.mean()), 2),
+            "p50_ms": round(float(p50), 2), "p90_ms": round(float(p90), 2),
+            "p95_ms": round(float(p95), 2), "p99_ms": round(float(p99), 2),
+            "max_ms": round(float(values.max()), 2)}
+
+
+def run_level(sessions: int, iterations: int = DEFAULT_ITERATIONS, app_path: str = APP_PATH,
+              seed: int = 0) -> Dict:
+    """Run ``sessions`` concurrent users through the flow and summarize the level"""
+    drivers = [SessionDriver(i, app_path, seed) for i in range(sessions)]
+    barrier = threading.Barrier(sessions)
+
+    def drive(driver: SessionDriver):
+        barrier.wait()
+        driver.flow(iterations)
+
+    with ResourceSampler() as usage:
+        start = time.perf_counter()
+        threads = [threading.Thread(target=drive, args=(d,), name=f"loadtest-session-{d.session_id}")
+                   for d in drivers]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        wall = time.perf_counter() - start
+
+    results = [r for d in drivers for r in d.results]
+    ok = [r.latency_s for r in results if r.ok]
+    steps = sorted({r.step for r in results})
+    mb = 1024 * 1024
+    return {
+        "sessions": sessions,
+        "steps": len(results),
+        "errors": sum(not r.ok for r in results),
+        "wall_s": round(wall, 3),
+        "throughput_steps_per_s": round(len(results) / wall, 3) if wall else 0.0,
+        "latency": _percentiles(ok),
+        "latency_by_step": {s: _percentiles([r.latency_s for r in results if r.step == s and r.ok])
+                            for s in steps},
+        "cpu_s": round(usage.cpu_s, 3),
+        "cpu_s_per_session": round(usage.cpu_s / sessions, 3),
+        "cpu_utilization": round(usage.cpu_s / wall, 3) if wall else 0.0,
+        "rss_start_mb": round(usage.rss_start / mb, 1),
+        "rss_peak_mb": round(usage.rss_peak / mb, 1),
+        "rss_mb_per_session": round((usage.rss_peak - usage.rss_start) / mb / sessions, 2),
+    }
+
+
+def run_load_test(levels: Sequence[int] = DEFAULT_LEVELS, iterations: int = DEFAULT_ITERATIONS,
+                  app_path: str = APP_PATH, seed: int = 0, backend: Optional[Dict] = None) -> Dict:
+    """Run every concurrency level in turn; the backend must already be set up"""
+    import streamlit
+
+    report = {
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "environment": {"python": platform.python_version(), "streamlit": streamlit.__version__,
+                        "platform": platform.platform(), "cpus": os.cpu_count()},
+        "config": {"levels": list(levels), "iterations": iterations, "seed": seed,
+                   "backend": backend or {}},
+        "levels": [],
+    }
+    # Warm-up run: imports, first fetches and compiled script are not part of any level
+    SessionDriver(-1, app_path, seed).open()
+    for sessions in levels:
+        report["levels"].append(run_level(sessions, iterations, app_path, seed))
+    return report
+
+
+def render_html(report: Dict) -> str:
+    """Standalone HTML page with latency/throughput charts and the level table"""
+    import pandas as pd
+    import plotly.graph_objects as go
+    from plotly.subplots import make_subplots
+
+    levels = report["levels"]
+    sessions = [lvl["sessions"] for lvl in levels]
+    fig = make_subplots(specs=[[{"secondary_y": True}]])
+    for key, dash in (("p50_ms", "solid"), ("p90_ms", "dash"), ("p99_ms", "dot")):
+        fig.add_trace(go.Scatter(x=sessions, y=[lvl["latency"].get(key) for lvl in levels],
+                                 name=key.replace("_ms", " latency (ms)"), line=dict(dash=dash)))
+    fig.add_trace(go.Bar(x=sessions, y=[lvl["throughput_steps_per_s"] for lvl in levels],
+                         name="Throughput (steps/s)", opacity=0.35), secondary_y=True)
+    fig.update_layout(title="Latency and throughput by concurrent sessions", xaxis_title="Sessions",
+                      template="plotly_white", height=460)
+    fig.update_yaxes(title_text="Latency (ms)", secondary_y=False)
+    fig.update_yaxes(title_text="Steps / s", secondary_y=True)
+
+    table = pd.DataFrame([{
+        "Sessions": lvl["sessions"], "Steps": lvl["steps"], "Errors": lvl["errors"],
+        "Steps/s": lvl["throughput_steps_per_s"], "p50 (ms)": lvl["latency"].get("p50_ms"),
+        "p95 (ms)": lvl["latency"].get("p95_ms"), "p99 (ms)": lvl["latency"].get("p99_ms"),
+        "CPU s/session": lvl["cpu_s_per_session"], "CPU util": lvl["cpu_utilization"],
+        "RSS peak (MB)": lvl["rss_peak_mb"], "RSS MB/session": lvl["rss_mb_per_session"],
+    } for lvl in levels])
+    steps = pd.DataFrame([{"Sessions": lvl["sessions"], "Step": step, **stats}
+                          for lvl in levels for step, stats in lvl["latency_by_step"].items()])
+
+    env = ", ".join(f"{k} {v}" for k, v in report["environment"].items())
+    return f"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Dashboard load test</title>
+<style>body{{font-family:sans-serif;margin:30px;}} table{{border-collapse:collapse;margin:10px 0 30px;}}
+td,th{{border:1px solid #ddd;padding:4px 10px;text-align:right;}}</style></head>
+<body><h1>Dashboard load test</h1>
+<p>{report["generated_at"]} &middot; {env}</p>
+{fig.to_html(full_html=False, include_plotlyjs="cdn")}
+<h2>Levels</h2>{table.to_html(index=False)}
+<h2>Latency by step</h2>{steps.to_html(index=False)}
+</body></html>"""
+
+
+def write_report(report: Dict, out: str) -> List[str]:
+    """Write ``<out>.json`` and ``<out>.html``; returns both paths"""
+    if os.path.dirname(out):
+        os.makedirs(os.path.dirname(out), exist_ok=True)
+    paths = [out + ".json", out + ".html"]
+    with open(paths[0], "w", encoding="utf-8") as fh:
+        json.dump(report, fh, indent=2, sort_keys=True)
+    with open(paths[1], "w", encoding="utf-8") as fh:
+        fh.write(render_html(report))
+    return paths
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate concurrent dashboard sessions against a stub backend")
+    parser.add_argument("--sessions", default=",".join(map(str, DEFAULT_LEVELS)),
+                        help="comma-separated concurrency levels, e.g. 1,4,8,16")
+    parser.add_argument("--iterations", type=int, default=DEFAULT_ITERATIONS, help="flow repetitions per session")
+    parser.add_argument("--archive", help="recorded responses (.jsonl.gz); synthetic data when omitted")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="stub latency per upstream request")
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of upstream requests failed")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--app", default=APP_PATH, help="dashboard script")
+    parser.add_argument("--out", default="loadtest_report", help="report path without extension")
+    args = parser.parse_args(argv)
+
+    archive = PayloadArchive.load(args.archive) if args.archive else synthetic_archive(seed=args.seed)
+    base_url = start_stub(archive, args.latency_ms, args.jitter_ms, args.error_rate, args.seed)
+    use_backend(base_url)
+    backend = {"archive": args.archive or "synthetic", "latency_ms": args.latency_ms,
+               "jitter_ms": args.jitter_ms, "error_rate": args.error_rate}
+
+    levels = [int(s) for s in args.sessions.split(",") if s.strip()]
+    report = run_load_test(levels, args.iterations, args.app, args.seed, backend)
+    for lvl in report["levels"]:
+        lat = lvl["latency"]
+        print(f"{lvl['sessions']:>4} sessions: {lvl['throughput_steps_per_s']:.2f} steps/s, "
+              f"p50 {lat.get('p50_ms', 0):.0f} ms, p95 {lat.get('p95_ms', 0):.0f} ms, "
+              f"{lvl['errors']} errors, {lvl['cpu_s_per_session']:.2f} CPU s and "
+              f"{lvl['rss_mb_per_session']:.1f} MB per session")
+    print("Report written to " + " and ".join(write_report(report, args.out)))
+    return 0 if all(lvl["errors"] == 0 for lvl in report["levels"]) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
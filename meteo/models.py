@@ -0,0 +1,53 @@
+"""Typed inputs and outputs of the analytics core"""
+from __future__ import annotations
+
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, NamedTuple, Optional, TypedDict
+
+Payload = Dict[str, Any]
+
+
+class WeatherData(TypedDict):
+    """Raw OpenWeather payloads for one city"""
+    current: Payload
+    forecast: Payload
+    pollution: Payload
+    fetched_at: float       # time.time() of the upstream fetch
+
+
+class Alert(NamedTuple):
+    title: str
+    message: str
+    severity: str  # "warning" or "danger"
+
+
+class Recommendation(NamedTuple):
+    title: str
+    message: str
+
+
+@dataclass(frozen=True)
+class CityConditions:
+    """Current conditions of one city, in the display temperature unit"""
+    city: str
+    temperature: float
+    feels_like: float
+    humidity: float
+    pressure: float
+    wind_speed: float
+    aqi: Optional[int]
+    weather: str
+
+    def as_row(self) -> Dict[str, Any]:
+        """Row for the comparison table, keyed by its column headers"""
+        row = asdict(self)
+        return {
+            'City': row['city'],
+            'Temperature': row['temperature'],
+            'Feels Like': row['feels_like'],
+            'Humidity': row['humidity'],
+            'Pressure': row['pressure'],
+            'Wind Speed': row['wind_speed'],
+            'AQI': row['aqi'],
+            'Weather': row['weather'],
+        }
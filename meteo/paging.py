@@ -0,0 +1,242 @@
+"""Server-side paging over columnar forecast and history tables.
+
+The Data Explorer used to filter a full DataFrame and send all of it to the
+browser. Here filtering, sorting and slicing run on the stored columns and
+only the visible page is materialized, with just the requested columns:
+
+* filters are evaluated as vectorized masks (label filters match against
+  the small vocabulary, then ``np.isin`` on the integer codes);
+* pages are found by keyset cursors - ``(sort value, row id)`` of the
+  boundary row - so each page costs one pass over the sort column,
+  selecting with ``np.partition`` instead of sorting everything or
+  skipping an offset;
+* only the rows of the page are gathered from the (possibly
+  memory-mapped) columns, and derived variables (dew point, comfort, ...)
+  are computed for those rows alone unless a filter or the sort needs them.
+
+Cursors are opaque URL-safe strings and remain valid while the sort is
+unchanged.
+"""
+from __future__ import annotations
+
+import base64
+import json
+from typing import TYPE_CHECKING, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .compact import INTEGER_MEASURES, MEASURES, VOCABULARY
+from .derived import DERIVED, compute
+
+if TYPE_CHECKING:
+    from .ingest import PartitionStore
+    from .store import CityRecord
+
+LABELS = ("weather", "description")
+COLUMNS = ["timestamp", *MEASURES, *LABELS]
+PAGE_SIZE = 50
+
+
+class Table:
+    """Equal-length columns; ``timestamp`` is local seconds, label columns are codes into ``vocab``"""
+
+    def __init__(self, columns: Dict[str, np.ndarray], vocab: Dict[str, Sequence[str]]):
+        self.columns = columns
+        self.vocab = {name: np.asarray(labels, dtype=object) for name, labels in vocab.items()}
+        self.n = len(next(iter(columns.values()))) if columns else 0
+
+    def __len__(self):
+        return self.n
+
+    @classmethod
+    def from_record(cls, record: "CityRecord") -> "Table":
+        """A stored forecast record, without materializing its frame"""
+        forecast = record.forecast
+        local = forecast.timestamps().as_unit("s").asi8
+        columns = {"timestamp": local, **{name: forecast.column(name) for name in MEASURES},
+                   "weather": forecast.weather, "description": forecast.description}
+        labels = VOCABULARY.decode(np.arange(len(VOCABULARY)))
+        return cls(columns, {name: labels for name in LABELS})
+
+    @classmethod
+    def from_partitions(cls, store: "PartitionStore", city: str, start: Optional[str] = None,
+                        end: Optional[str] = None) -> "Table":
+        """Imported history of a city (memory-mapped where the partitions allow it)"""
+        columns, vocab = store.coded_columns(city, ("local", *MEASURES, *LABELS), start, end)
+        columns["timestamp"] = columns.pop("local")
+        return cls(columns, vocab)
+
+    def column(self, name: str) -> np.ndarray:
+        """A stored column, or a derived one computed over every row (then kept)"""
+        values = self.columns.get(name)
+        if values is None:
+            if name not in DERIVED:
+                raise KeyError(name)
+            values = self.columns[name] = compute(name, self.columns)
+        return values
+
+    def labels(self, name: str) -> List[str]:
+        """Labels of a label column that occur in the table"""
+        return sorted(self.vocab[name][np.unique(self.columns[name])].tolist()) if self.n else []
+
+    def bounds(self, name: str) -> Tuple[float, float]:
+        values = self.columns[name]
+        if not self.n or np.isnan(values).all():
+            return (0.0, 0.0)
+        return float(np.nanmin(values)), float(np.nanmax(values))
+
+
+class Page(NamedTuple):
+    frame: pd.DataFrame
+    total: int                  # rows matching the filters
+    start: int                  # position of the first row among them
+    next: Optional[str]         # cursor of the following page, None on the last one
+    prev: Optional[str]         # cursor of the preceding page, None on the first one
+
+
+def mask(table: Table, contains: Optional[Dict[str, str]] = None,
+         ranges: Optional[Dict[str, Tuple[float, float]]] = None,
+         labels: Optional[Dict[str, Sequence[str]]] = None,
+         transform: Optional[Dict[str, Callable[[np.ndarray], np.ndarray]]] = None) -> np.ndarray:
+    """Rows passing every filter
+
+    ``contains`` does case-insensitive substring matching on label columns,
+    ``ranges`` keeps inclusive ``(lo, hi)`` intervals of numeric columns
+    (after ``transform``, e.g. a unit conversion) and ``labels`` keeps the
+    listed labels.
+    """
+    keep = np.ones(table.n, dtype=bool)
+    for name, text in (contains or {}).items():
+        if text:
+            hits = np.flatnonzero([text.lower() in str(label).lower() for label in table.vocab[name]])
+            keep &= np.isin(table.columns[name], hits)
+    for name, (lo, hi) in (ranges or {}).items():
+        values = table.column(name)
+        if transform and name in transform:
+            values = transform[name](values)
+        keep &= (values >= lo) & (values <= hi)
+    for name, allowed in (labels or {}).items():
+        if allowed is not None:
+            codes = np.flatnonzero(np.isin(table.vocab[name], list(allowed)))
+            keep &= np.isin(table.columns[name], codes)
+    return keep
+
+
+def _sort_key(table: Table, column: str, descending: bool) -> np.ndarray:
+    values = table.column(column)
+    if column in table.vocab:
+        # Codes follow insertion order; rank them alphabetically
+        rank = np.empty(len(table.vocab[column]), dtype=np.float64)
+        rank[np.argsort(table.vocab[column].astype(str), kind="stable")] = np.arange(len(rank))
+        key = rank[values]
+    else:
+        key = np.asarray(values, dtype=np.float64)
+    if descending:
+        key = -key
+    return np.where(np.isnan(key), np.inf, key)     # missing values sort last either way
+
+
+def _smallest(key: np.ndarray, ids: np.ndarray, size: int) -> np.ndarray:
+    """Positions of the ``size`` smallest ``(key, id)`` pairs, in order; ``ids`` ascending"""
+    if len(key) > size:
+        kth = np.partition(key, size - 1)[size - 1]
+        below = np.flatnonzero(key < kth)
+        equal = np.flatnonzero(key == kth)[:size - len(below)]
+        chosen = np.concatenate([below, equal])
+    else:
+        chosen = np.arange(len(key))
+    return chosen[np.lexsort((ids[chosen], key[chosen]))]
+
+
+def encode_cursor(sort: str, descending: bool, key: float, row: int) -> str:
+    raw = json.dumps([sort, descending, key if np.isfinite(key) else None, int(row)]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str, descending: bool) -> Optional[Tuple[float, int]]:
+    """``(key, row)`` of a cursor made for the same sort, else None (start over)"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        c_sort, c_desc, key, row = json.loads(raw)
+    except (ValueError, TypeError):
+        return None
+    if c_sort != sort or c_desc != descending:
+        return None
+    return (np.inf if key is None else float(key)), int(row)
+
+
+def fetch_page(table: Table, keep: np.ndarray, sort: str = "timestamp", descending: bool = False,
+               size: int = PAGE_SIZE, after: Optional[str] = None, before: Optional[str] = None,
+               columns: Optional[Sequence[str]] = None) -> Page:
+    """One page of the rows in ``keep``, ordered by ``sort`` then row id
+
+    ``after`` continues past a row (the ``next`` cursor of a page) and
+    ``before`` goes back from one (``prev``); neither gives the first page.
+    Only ``columns`` (default: all) are materialized.
+    """
+    key = _sort_key(table, sort, descending)
+    ids = np.arange(table.n)
+    total = int(keep.sum())
+
+    boundary = decode_cursor(after, sort, descending) if after else None
+    backwards = False
+    if boundary is None and before:
+        boundary = decode_cursor(before, sort, descending)
+        backwards = boundary is not None
+
+    candidates = keep.copy()
+    if boundary is not None:
+        k0, i0 = boundary
+        if backwards:
+            candidates &= (key < k0) | ((key == k0) & (ids < i0))
+        else:
+            candidates &= (key > k0) | ((key == k0) & (ids > i0))
+    rows = np.flatnonzero(candidates)
+    if backwards:
+        # The largest pairs below the boundary, found as the smallest of the negated pairs
+        rows = rows[::-1][_smallest(-key[rows][::-1], -rows[::-1], size)][::-1]
+    else:
+        rows = rows[_smallest(key[rows], rows, size)]
+
+    if len(rows):
+        k_first, i_first = key[rows[0]], rows[0]
+        start = int((keep & ((key < k_first) | ((key == k_first) & (ids < i_first)))).sum())
+    else:
+        start = total if boundary is not None and not backwards else 0
+    nxt = encode_cursor(sort, descending, key[rows[-1]], rows[-1]) if len(rows) and start + len(rows) < total else None
+    prev = encode_cursor(sort, descending, key[rows[0]], rows[0]) if len(rows) and start > 0 else None
+    return Page(materialize(table, rows, columns), total, start, nxt, prev)
+
+
+def materialize(table: Table, rows: np.ndarray, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+    """The given rows of the projected columns, in the ``process_forecast`` layout
+
+    Derived columns (:data:`~meteo.derived.DERIVED`) not already computed
+    for the whole table are computed for these rows only.
+    """
+    names = list(columns) if columns is not None else COLUMNS
+    data = {}
+    for name in names:
+        if name in table.columns:
+            values = np.asarray(table.columns[name][rows])
+        else:
+            values = compute(name, {c: table.columns[c][rows] for c in DERIVED[name].inputs})
+        if name == "timestamp":
+            data[name] = pd.to_datetime(values.astype(np.int64), unit="s")
+        elif name in table.vocab:
+            data[name] = table.vocab[name][values]
+        elif name in INTEGER_MEASURES:
+            data[name] = pd.array(np.rint(values.astype(np.float64)), dtype="Int64")
+        else:
+            data[name] = np.round(values.astype(np.float64), 2)
+    return pd.DataFrame(data, columns=names)
+
+
+def export_rows(table: Table, keep: np.ndarray, sort: str = "timestamp", descending: bool = False,
+                columns: Optional[Sequence[str]] = None, chunk: int = 100_000):
+    """All matching rows in order, as DataFrames of at most ``chunk`` rows (for downloads)"""
+    rows = np.flatnonzero(keep)
+    rows = rows[np.lexsort((rows, _sort_key(table, sort, descending)[rows]))]
+    for i in range(0, len(rows), chunk):
+        yield materialize(table, rows[i:i + chunk], columns)
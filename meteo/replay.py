@@ -0,0 +1,324 @@
+"""Record real OpenWeather responses and replay them from a local stand-in.
+
+Recording wraps the HTTP session under the default client, so every
+``weather``, ``forecast`` and ``air_pollution`` response fetched by the
+dashboard or API is kept (the API key is never stored); ``record`` does the
+same for a site list. Archives are gzipped JSON lines, one response per
+line, and typically compress ~10x::
+
+    METEO_RECORD_PATH=recorded.jsonl.gz streamlit run app.py
+    python -m meteo.replay record recorded.jsonl.gz sites.txt
+
+The stub serves an archive on the OpenWeather URL layout with optional
+latency and error injection; point the app at it with
+``OPENWEATHER_BASE_URL``::
+
+    python -m meteo.replay serve recorded.jsonl.gz --port 8701 --latency-ms 80 --error-rate 0.02
+    OPENWEATHER_BASE_URL=http://127.0.0.1:8701 streamlit run app.py
+
+:class:`ReplaySession` answers from an archive in-process, for benchmarks
+that should not pay for sockets at all.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import atexit
+import gzip
+import json
+import logging
+import random
+import sys
+import threading
+from collections import defaultdict
+from typing import Dict, List, Optional, Sequence, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+import numpy as np
+
+from .httpserver import Request, Response, serve
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8701
+ENDPOINTS = ("/data/2.5/weather", "/data/2.5/forecast", "/data/2.5/air_pollution", "/data/2.5/group")
+GROUP_PATH = "/data/2.5/group"
+MAX_RESPONSES_PER_KEY = 32       # recorded variants kept per request
+IGNORED_PARAMS = {"appid"}
+NOT_FOUND = b'{"cod":"404","message":"city not found"}'
+
+
+def request_key(path: str, params: Sequence[Tuple[str, str]]) -> str:
+    """Archive key of a request: path plus sorted query without credentials"""
+    items = []
+    for name, value in params:
+        if name in IGNORED_PARAMS:
+            continue
+        if name == "q":
+            value = " ".join(value.split()).lower()
+        items.append(f"{name}={value}")
+    return path + "?" + "&".join(sorted(items))
+
+
+def url_key(url: str) -> str:
+    parts = urlsplit(url)
+    return request_key(parts.path, parse_qsl(parts.query))
+
+
+class PayloadArchive:
+    """Recorded ``(status, body)`` responses grouped by request key"""
+
+    def __init__(self):
+        self._responses: Dict[str, List[Tuple[int, bytes]]] = defaultdict(list)
+        self._points: Dict[str, Tuple[np.ndarray, List[str]]] = {}
+        self._city_ids: Optional[Dict[int, str]] = None
+        self._cursor: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return sum(len(v) for v in self._responses.values())
+
+    def keys(self) -> List[str]:
+        return list(self._responses)
+
+    def add(self, key: str, status: int, body: bytes) -> None:
+        with self._lock:
+            variants = self._responses[key]
+            if variants and variants[-1] == (status, body):
+                return
+            variants.append((status, body))
+            del variants[:-MAX_RESPONSES_PER_KEY]
+            self._points.pop(key.split("?", 1)[0], None)
+            self._city_ids = None
+
+    def _nearest(self, path: str, lat: float, lon: float) -> Optional[str]:
+        """Closest recorded coordinate query on ``path``, for unrecorded grid points"""
+        index = self._points.get(path)
+        if index is None:
+            keys, coords = [], []
+            for key in self._responses:
+                if key.startswith(path + "?"):
+                    params = dict(parse_qsl(key.split("?", 1)[1]))
+                    if "lat" in params and "lon" in params:
+                        keys.append(key)
+                        coords.append((float(params["lat"]), float(params["lon"])))
+            index = self._points[path] = (np.array(coords).reshape(-1, 2), keys)
+        coords, keys = index
+        if not keys:
+            return None
+        return keys[int(np.argmin(np.hypot(coords[:, 0] - lat, coords[:, 1] - lon)))]
+
+    def _next(self, key: str) -> Tuple[int, bytes]:
+        variants = self._responses[key]
+        i = self._cursor[key]
+        self._cursor[key] = i + 1
+        return variants[i % len(variants)]
+
+    def _group(self, ids: str) -> Tuple[int, bytes]:
+        """Group response assembled from recorded ``weather?q=`` responses, by city ID"""
+        if self._city_ids is None:
+            self._city_ids = {}
+            for key, variants in self._responses.items():
+                if key.startswith("/data/2.5/weather?") and "q=" in key and variants[-1][0] == 200:
+                    city_id = json.loads(variants[-1][1]).get("id")
+                    if city_id is not None:
+                        self._city_ids[int(city_id)] = key
+        found = []
+        for city_id in ids.split(","):
+            key = self._city_ids.get(int(city_id)) if city_id.strip().isdigit() else None
+            if key is not None:
+                status, body = self._next(key)
+                if status == 200:
+                    found.append(json.loads(body))
+        return 200, json.dumps({"cnt": len(found), "list": found}, separators=(",", ":")).encode()
+
+    def lookup(self, path: str, params: Sequence[Tuple[str, str]]) -> Tuple[int, bytes]:
+        """Next recorded response for a request, cycling through variants
+
+        Unknown cities answer like OpenWeather does (404); coordinate queries
+        fall back to the nearest recorded point on the same endpoint. Group
+        queries are answered from recorded single-city responses.
+        """
+        key = request_key(path, params)
+        with self._lock:
+            if path == GROUP_PATH and key not in self._responses:
+                return self._group(dict(params).get("id", ""))
+            if key not in self._responses:
+                query = dict(params)
+                nearest = None
+                if "lat" in query and "lon" in query:
+                    nearest = self._nearest(path, float(query["lat"]), float(query["lon"]))
+                if nearest is None:
+                    return 404, NOT_FOUND
+                key = nearest
+            return self._next(key)
+
+    def save(self, path: str) -> None:
+        with self._lock:
+            items = [(k, s, b) for k, v in self._responses.items() for s, b in v]
+        with gzip.open(path, "wt", encoding="utf-8", compresslevel=6) as fh:
+            for key, status, body in items:
+                fh.write(json.dumps({"key": key, "status": status, "body": body.decode("utf-8")},
+                                    separators=(",", ":")))
+                fh.write("\n")
+
+    @classmethod
+    def load(cls, path: str) -> "PayloadArchive":
+        archive = cls()
+        with gzip.open(path, "rt", encoding="utf-8") as fh:
+            for line in fh:
+                if line.strip():
+                    row = json.loads(line)
+                    archive.add(row["key"], int(row["status"]), row["body"].encode("utf-8"))
+        return archive
+
+
+class RecordingSession:
+    """Session wrapper that copies every response into an archive"""
+
+    def __init__(self, session, archive: Optional[PayloadArchive] = None):
+        self.session = session
+        self.archive = archive if archive is not None else PayloadArchive()
+
+    def get(self, url, **kwargs):
+        response = self.session.get(url, **kwargs)
+        try:
+            self.archive.add(url_key(url), response.status_code, response.content)
+        except Exception:
+            logger.exception("Could not record %s", urlsplit(url).path)
+        return response
+
+    def __getattr__(self, name):
+        return getattr(self.session, name)
+
+
+def recording_session(session, path: str) -> RecordingSession:
+    """Record into ``path``, extending an existing archive; saved at exit"""
+    try:
+        archive = PayloadArchive.load(path)
+    except FileNotFoundError:
+        archive = PayloadArchive()
+    recorder = RecordingSession(session, archive)
+    atexit.register(archive.save, path)
+    return recorder
+
+
+class ReplayResponse:
+    """The subset of :class:`requests.Response` the client uses"""
+
+    def __init__(self, status_code: int, content: bytes):
+        self.status_code = status_code
+        self.content = content
+
+    @property
+    def ok(self) -> bool:
+        return self.status_code < 400
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class ReplaySession:
+    """In-process session answering from an archive without any network"""
+
+    def __init__(self, archive: PayloadArchive):
+        self.archive = archive
+
+    def get(self, url, **kwargs):
+        parts = urlsplit(url)
+        return ReplayResponse(*self.archive.lookup(parts.path, parse_qsl(parts.query)))
+
+
+class ReplayServer:
+    """OpenWeather stand-in serving an archive with injected latency and errors"""
+
+    def __init__(self, archive: PayloadArchive, latency_ms: float = 0.0, jitter_ms: float = 0.0,
+                 error_rate: float = 0.0, error_statuses: Sequence[int] = (500, 502, 503, 429),
+                 seed: Optional[int] = None):
+        self.archive = archive
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_statuses = tuple(error_statuses)
+        self._random = random.Random(seed)
+        self.served = 0
+        self.injected = 0
+
+    @property
+    def routes(self):
+        return {path: self.handle for path in ENDPOINTS}
+
+    async def handle(self, request: Request) -> Response:
+        delay = self.latency_ms + (self._random.uniform(-1, 1) * self.jitter_ms if self.jitter_ms else 0.0)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000.0)
+        self.served += 1
+        if self.error_rate and self._random.random() < self.error_rate:
+            self.injected += 1
+            status = self._random.choice(self.error_statuses)
+            body = json.dumps({"cod": status, "message": "injected failure"}).encode()
+        else:
+            params = [(k, v) for k, values in request.query.items() for v in values]
+            status, body = self.archive.lookup(request.path, params)
+        return Response(status, body, {"Content-Type": "application/json; charset=utf-8"})
+
+
+def record_sites(cities: Sequence[str], path: str, session=None) -> PayloadArchive:
+    """Fetch ``cities`` from the live API and store every response in ``path``"""
+    import requests
+
+    from .client import WeatherClient
+
+    recorder = RecordingSession(session or requests.Session())
+    try:
+        recorder.archive = PayloadArchive.load(path)
+    except FileNotFoundError:
+        pass
+    client = WeatherClient(session=recorder)
+    for city in cities:
+        if client.fetch(city, on_error=lambda e, c=city: logger.warning("%s: %s", c, e)) is None:
+            logger.warning("No data recorded for %s", city)
+    recorder.archive.save(path)
+    return recorder.archive
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Record OpenWeather responses or serve them offline")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    rec = sub.add_parser("record", help="fetch a site list from the live API into an archive")
+    rec.add_argument("archive", help="archive path (.jsonl.gz); extended if it exists")
+    rec.add_argument("sites", help="text file with one city per line, or CSV with a 'city' column")
+
+    srv = sub.add_parser("serve", help="serve an archive as a local OpenWeather stand-in")
+    srv.add_argument("archive")
+    srv.add_argument("--host", default=DEFAULT_HOST)
+    srv.add_argument("--port", type=int, default=DEFAULT_PORT)
+    srv.add_argument("--latency-ms", type=float, default=0.0, help="added delay per request")
+    srv.add_argument("--jitter-ms", type=float, default=0.0, help="uniform +/- jitter on the delay")
+    srv.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests failed on purpose")
+    srv.add_argument("--seed", type=int, help="random seed for reproducible jitter and errors")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    if args.command == "record":
+        from .fleet import load_sites
+
+        archive = record_sites(load_sites(args.sites), args.archive)
+        print(f"{len(archive)} responses for {len(archive.keys())} requests in {args.archive}")
+        return 0
+
+    archive = PayloadArchive.load(args.archive)
+    logger.info("Loaded %d recorded responses", len(archive))
+    server = ReplayServer(archive, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                          error_rate=args.error_rate, seed=args.seed)
+    try:
+        asyncio.run(serve(server.routes, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
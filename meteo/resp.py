@@ -0,0 +1,538 @@
+"""Redis-protocol (RESP2) client and a small in-memory stand-in server.
+
+The shared cache of :mod:`meteo.shared` talks RESP, so it runs against a
+real Redis or against this stand-in, which implements the subset it needs:
+strings with expiry (``GET``/``SET EX PX NX XX``/``MGET``/``DEL``/``EXISTS``/
+``EXPIRE``/``PEXPIRE``/``TTL``/``PTTL``/``INCR``), ``SCAN``/``KEYS``,
+optimistic transactions (``WATCH``/``MULTI``/``EXEC``) and a few admin
+commands. Data lives in memory only.
+
+Usage::
+
+    python -m meteo.resp --port 6380
+    METEO_REDIS_URL=redis://127.0.0.1:6380/0 streamlit run app.py
+
+No third-party Redis package is required on either side.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import fnmatch
+import logging
+import queue
+import socket
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 6380
+SOCKET_TIMEOUT = 2.0
+POOL_SIZE = 16
+SWEEP_INTERVAL = 1.0     # seconds between active expiry sweeps on the stand-in
+
+Reply = Any
+
+
+class RespError(Exception):
+    """Error reply from the server (``-ERR ...``)"""
+
+
+# ------------------ Protocol ------------------
+
+def encode_command(*args) -> bytes:
+    parts = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        if isinstance(arg, bytes):
+            data = arg
+        elif isinstance(arg, str):
+            data = arg.encode("utf-8")
+        else:
+            data = str(arg).encode("ascii")
+        parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+    return b"".join(parts)
+
+
+def encode_reply(value: Reply) -> bytes:
+    """Serialize a server reply; ``str`` is a simple string, ``bytes`` a bulk string"""
+    if value is None:
+        return b"$-1\r\n"
+    if isinstance(value, RespError):
+        return b"-%s\r\n" % str(value).encode("utf-8")
+    if isinstance(value, str):
+        return b"+%s\r\n" % value.encode("utf-8")
+    if isinstance(value, bool):
+        return b":%d\r\n" % int(value)
+    if isinstance(value, int):
+        return b":%d\r\n" % value
+    if isinstance(value, bytes):
+        return b"$%d\r\n%s\r\n" % (len(value), value)
+    if isinstance(value, list):
+        return b"*%d\r\n" % len(value) + b"".join(encode_reply(v) for v in value)
+    if isinstance(value, _NullArray):
+        return b"*-1\r\n"
+    raise TypeError(f"cannot encode {type(value).__name__}")
+
+
+class _NullArray:
+    """``*-1``: the reply of an aborted ``EXEC``"""
+
+
+NULL_ARRAY = _NullArray()
+
+
+def read_reply(stream) -> Reply:
+    """Read one reply from a buffered binary file object"""
+    line = stream.readline()
+    if not line.endswith(b"\r\n"):
+        raise ConnectionError("connection closed by server")
+    kind, rest = line[:1], line[1:-2]
+    if kind == b"+":
+        return rest.decode("utf-8")
+    if kind == b"-":
+        raise RespError(rest.decode("utf-8"))
+    if kind == b":":
+        return int(rest)
+    if kind == b"$":
+        length = int(rest)
+        if length < 0:
+            return None
+        data = stream.read(length + 2)
+        if len(data) != length + 2:
+            raise ConnectionError("connection closed by server")
+        return data[:-2]
+    if kind == b"*":
+        length = int(rest)
+        if length < 0:
+            return None
+        items = []
+        for _ in range(length):
+            try:
+                items.append(read_reply(stream))
+            except RespError as exc:     # errors inside EXEC results are values, not failures
+                items.append(exc)
+        return items
+    raise ConnectionError(f"unexpected reply type {kind!r}")
+
+
+# ------------------ Client ------------------
+
+class Connection:
+    """One socket to the server; not thread-safe (see :class:`RespClient`)"""
+
+    def __init__(self, host: str, port: int, db: int = 0, timeout: float = SOCKET_TIMEOUT):
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.stream = self.sock.makefile("rb")
+        if db:
+            self.execute("SELECT", db)
+
+    def execute(self, *args) -> Reply:
+        self.sock.sendall(encode_command(*args))
+        return read_reply(self.stream)
+
+    def close(self) -> None:
+        try:
+            self.stream.close()
+            self.sock.close()
+        except OSError:
+            pass
+
+
+class RespClient:
+    """Thread-safe client with a small connection pool
+
+    ``url`` is ``redis://host:port/db``. Connections that fail are discarded,
+    so a restarted server is picked up on the next command.
+    """
+
+    def __init__(self, url: str = f"redis://{DEFAULT_HOST}:{DEFAULT_PORT}/0", timeout: float = SOCKET_TIMEOUT,
+                 pool_size: int = POOL_SIZE):
+        parts = urlsplit(url)
+        if parts.scheme not in ("redis", ""):
+            raise ValueError(f"unsupported URL scheme {parts.scheme!r}")
+        self.host = parts.hostname or DEFAULT_HOST
+        self.port = parts.port or 6379
+        self.db = int(parts.path.strip("/") or 0)
+        self.timeout = timeout
+        self._idle: "queue.LifoQueue[Connection]" = queue.LifoQueue(pool_size)
+
+    @contextmanager
+    def connection(self) -> Iterator[Connection]:
+        """Borrow one connection, e.g. for a ``WATCH``/``MULTI``/``EXEC`` sequence"""
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = Connection(self.host, self.port, self.db, self.timeout)
+        try:
+            yield conn
+        except RespError:
+            # The whole error reply was read, so the connection is still usable
+            self._release(conn)
+            raise
+        except BaseException:
+            conn.close()
+            raise
+        else:
+            self._release(conn)
+
+    def _release(self, conn: Connection) -> None:
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def execute(self, *args) -> Reply:
+        with self.connection() as conn:
+            return conn.execute(*args)
+
+    # Convenience wrappers for the commands the shared cache uses
+    def get(self, key: str) -> Optional[bytes]:
+        return self.execute("GET", key)
+
+    def set(self, key: str, value, px: Optional[int] = None, nx: bool = False, xx: bool = False) -> bool:
+        args: List[Any] = ["SET", key, value]
+        if px is not None:
+            args += ["PX", int(px)]
+        if nx:
+            args.append("NX")
+        if xx:
+            args.append("XX")
+        return self.execute(*args) == "OK"
+
+    def delete(self, *keys: str) -> int:
+        return self.execute("DEL", *keys) if keys else 0
+
+    def pttl(self, key: str) -> int:
+        return self.execute("PTTL", key)
+
+    def scan_iter(self, match: str = "*", count: int = 500) -> Iterator[str]:
+        cursor = b"0"
+        while True:
+            cursor, keys = self.execute("SCAN", cursor, "MATCH", match, "COUNT", count)
+            for key in keys:
+                yield key.decode("utf-8")
+            if cursor in (b"0", 0):
+                return
+
+    def ping(self) -> bool:
+        return self.execute("PING") == "PONG"
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+# ------------------ Stand-in server ------------------
+
+class _Database:
+    def __init__(self):
+        self.values: Dict[bytes, bytes] = {}
+        self.expires: Dict[bytes, float] = {}     # key -> monotonic deadline
+        self.versions: Dict[bytes, int] = {}      # bumped on every write, for WATCH
+        self.clock = 0
+
+    def touch(self, key: bytes) -> None:
+        self.clock += 1
+        self.versions[key] = self.clock
+
+    def alive(self, key: bytes) -> bool:
+        deadline = self.expires.get(key)
+        if deadline is not None and deadline <= time.monotonic():
+            self.remove(key)
+        return key in self.values
+
+    def remove(self, key: bytes) -> bool:
+        self.expires.pop(key, None)
+        if self.values.pop(key, None) is None:
+            return False
+        self.touch(key)
+        return True
+
+    def sweep(self) -> int:
+        now = time.monotonic()
+        expired = [key for key, deadline in self.expires.items() if deadline <= now]
+        for key in expired:
+            self.remove(key)
+        return len(expired)
+
+
+class _Session:
+    __slots__ = ("db", "watched", "queued")
+
+    def __init__(self):
+        self.db = 0
+        self.watched: Dict[Tuple[int, bytes], int] = {}
+        self.queued: Optional[List[List[bytes]]] = None
+
+
+class RespServer:
+    """In-memory RESP server implementing the commands listed in the module docstring"""
+
+    def __init__(self, databases: int = 16):
+        self.dbs = [_Database() for _ in range(databases)]
+        self.commands = 0
+        self.clients = 0
+
+    # --------- command implementations (session, db, args) -> reply ---------
+
+    def _ttl(self, db: _Database, key: bytes, scale: int) -> int:
+        if not db.alive(key):
+            return -2
+        deadline = db.expires.get(key)
+        if deadline is None:
+            return -1
+        return max(0, int(round((deadline - time.monotonic()) * scale)))
+
+    def _expire(self, db: _Database, key: bytes, seconds: float) -> int:
+        if not db.alive(key):
+            return 0
+        if seconds <= 0:
+            db.remove(key)
+        else:
+            db.expires[key] = time.monotonic() + seconds
+            db.touch(key)
+        return 1
+
+    def _set(self, db: _Database, args: List[bytes]) -> Reply:
+        key, value = args[0], args[1]
+        ttl, nx, xx, keep = None, False, False, False
+        options = [a.upper() for a in args[2:]]
+        i = 0
+        while i < len(options):
+            option = options[i]
+            if option in (b"EX", b"PX") and i + 1 < len(options):
+                amount = int(args[2 + i + 1])
+                if amount <= 0:
+                    return RespError("ERR invalid expire time in 'set' command")
+                ttl = amount if option == b"EX" else amount / 1000.0
+                i += 2
+                continue
+            if option == b"NX":
+                nx = True
+            elif option == b"XX":
+                xx = True
+            elif option == b"KEEPTTL":
+                keep = True
+            else:
+                return RespError("ERR syntax error")
+            i += 1
+        exists = db.alive(key)
+        if (nx and exists) or (xx and not exists):
+            return None
+        db.values[key] = value
+        if ttl is not None:
+            db.expires[key] = time.monotonic() + ttl
+        elif not keep:
+            db.expires.pop(key, None)
+        db.touch(key)
+        return "OK"
+
+    def _scan(self, db: _Database, args: List[bytes]) -> Reply:
+        cursor = int(args[0])
+        pattern, count = b"*", 10
+        for option, value in zip(args[1::2], args[2::2]):
+            if option.upper() == b"MATCH":
+                pattern = value
+            elif option.upper() == b"COUNT":
+                count = max(1, int(value))
+        keys = sorted(db.values)
+        page = keys[cursor:cursor + count]
+        nxt = cursor + count if cursor + count < len(keys) else 0
+        found = [k for k in page if db.alive(k) and fnmatch.fnmatchcase(k.decode("utf-8", "replace"),
+                                                                          pattern.decode("utf-8", "replace"))]
+        return [str(nxt).encode(), found]
+
+    def run(self, session: _Session, args: List[bytes]) -> Reply:
+        """Execute one command for ``session``"""
+        self.commands += 1
+        name = args[0].upper().decode("ascii", "replace")
+        args = args[1:]
+
+        if session.queued is not None and name not in ("EXEC", "DISCARD", "MULTI", "WATCH"):
+            session.queued.append([name.encode()] + args)
+            return "QUEUED"
+
+        db = self.dbs[session.db]
+        try:
+            if name == "PING":
+                return args[0] if args else "PONG"
+            if name == "ECHO":
+                return args[0]
+            if name == "SELECT":
+                index = int(args[0])
+                if not 0 <= index < len(self.dbs):
+                    return RespError("ERR DB index is out of range")
+                session.db = index
+                return "OK"
+            if name == "GET":
+                return db.values[args[0]] if db.alive(args[0]) else None
+            if name == "MGET":
+                return [db.values[k] if db.alive(k) else None for k in args]
+            if name == "SET":
+                return self._set(db, args)
+            if name == "DEL":
+                return sum(db.remove(k) for k in args if db.alive(k))
+            if name == "EXISTS":
+                return sum(db.alive(k) for k in args)
+            if name in ("EXPIRE", "PEXPIRE"):
+                amount = int(args[1])
+                return self._expire(db, args[0], amount if name == "EXPIRE" else amount / 1000.0)
+            if name in ("TTL", "PTTL"):
+                return self._ttl(db, args[0], 1 if name == "TTL" else 1000)
+            if name == "INCR":
+                value = int(db.values[args[0]]) + 1 if db.alive(args[0]) else 1
+                db.values[args[0]] = str(value).encode()
+                db.touch(args[0])
+                return value
+            if name == "SCAN":
+                return self._scan(db, args)
+            if name == "KEYS":
+                pattern = args[0].decode("utf-8", "replace")
+                return [k for k in list(db.values) if db.alive(k)
+                        and fnmatch.fnmatchcase(k.decode("utf-8", "replace"), pattern)]
+            if name == "DBSIZE":
+                return sum(db.alive(k) for k in list(db.values))
+            if name == "FLUSHDB":
+                for key in list(db.values):
+                    db.remove(key)
+                return "OK"
+            if name == "WATCH":
+                if session.queued is not None:
+                    return RespError("ERR WATCH inside MULTI is not allowed")
+                for key in args:
+                    db.alive(key)
+                    session.watched[(session.db, key)] = db.versions.get(key, 0)
+                return "OK"
+            if name == "UNWATCH":
+                session.watched.clear()
+                return "OK"
+            if name == "MULTI":
+                if session.queued is not None:
+                    return RespError("ERR MULTI calls can not be nested")
+                session.queued = []
+                return "OK"
+            if name == "DISCARD":
+                if session.queued is None:
+                    return RespError("ERR DISCARD without MULTI")
+                session.queued = None
+                session.watched.clear()
+                return "OK"
+            if name == "EXEC":
+                if session.queued is None:
+                    return RespError("ERR EXEC without MULTI")
+                queued, session.queued = session.queued, None
+                watched, session.watched = session.watched, {}
+                for (index, key), version in watched.items():
+                    self.dbs[index].alive(key)
+                    if self.dbs[index].versions.get(key, 0) != version:
+                        return NULL_ARRAY
+                # No awaits in between: the queued commands run atomically
+                return [self.run(session, command) for command in queued]
+            if name == "INFO":
+                keys = sum(len(d.values) for d in self.dbs)
+                return (f"# Server\r\nredis_mode:standalone\r\nmeteo_standin:1\r\n"
+                        f"connected_clients:{self.clients}\r\ntotal_commands_processed:{self.commands}\r\n"
+                        f"# Keyspace\r\nkeys:{keys}\r\n").encode()
+            return RespError(f"ERR unknown command '{name.lower()}'")
+        except (IndexError, ValueError):
+            return RespError(f"ERR wrong number or type of arguments for '{name.lower()}' command")
+
+    # --------- networking ---------
+
+    async def _read_command(self, reader: asyncio.StreamReader) -> Optional[List[bytes]]:
+        line = await reader.readline()
+        if not line:
+            return None
+        if not line.startswith(b"*"):
+            return line.split()      # inline command, e.g. typed into telnet
+        args = []
+        for _ in range(int(line[1:-2])):
+            header = await reader.readline()
+            length = int(header[1:-2])
+            args.append((await reader.readexactly(length + 2))[:-2])
+        return args
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        session = _Session()
+        self.clients += 1
+        try:
+            while True:
+                args = await self._read_command(reader)
+                if args is None:
+                    break
+                if not args:
+                    continue
+                if args[0].upper() == b"QUIT":
+                    writer.write(encode_reply("OK"))
+                    await writer.drain()
+                    break
+                writer.write(encode_reply(self.run(session, args)))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            self.clients -= 1
+            writer.close()
+
+    async def _sweep(self) -> None:
+        while True:
+            await asyncio.sleep(SWEEP_INTERVAL)
+            for db in self.dbs:
+                db.sweep()
+
+    async def serve(self, host: str, port: int, on_ready: Optional[Callable[[int], None]] = None) -> None:
+        """Serve until cancelled; ``on_ready`` receives the bound port"""
+        server = await asyncio.start_server(self.handle, host, port)
+        logger.info("RESP stand-in listening on %s", ", ".join(str(s.getsockname()) for s in server.sockets))
+        if on_ready is not None:
+            on_ready(server.sockets[0].getsockname()[1])
+        sweeper = asyncio.ensure_future(self._sweep())
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            sweeper.cancel()
+
+
+def start_background(host: str = DEFAULT_HOST, port: int = 0) -> Tuple[RespServer, int]:
+    """Run a stand-in on a daemon thread; returns the server and its port (for demos and load tests)"""
+    server = RespServer()
+    ready = threading.Event()
+    bound: List[int] = []
+
+    def on_ready(actual: int) -> None:
+        bound.append(actual)
+        ready.set()
+
+    threading.Thread(target=lambda: asyncio.run(server.serve(host, port, on_ready)),
+                     name="meteo-resp", daemon=True).start()
+    ready.wait()
+    return server, bound[0]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run an in-memory Redis-protocol stand-in")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    try:
+        asyncio.run(RespServer().serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+"""Per-city rollups materialized once at ingest time.
+
+Dashboards read these instead of rescanning the raw 3-hourly rows on every
+rerun: :class:`ForecastSummary` backs the headline statistics, and
+:func:`rollup` produces daily or weekly aggregates with percentiles and the
+dominant weather condition.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from .compact import VOCABULARY, CompactForecast
+
+PERCENTILES = (10, 50, 90)
+ROLLUP_FREQS = {"D": "daily", "W": "weekly"}
+
+
+@dataclass(frozen=True)
+class ForecastSummary:
+    """Whole-horizon statistics of one forecast, in °C and SI units"""
+    rows: int
+    start: pd.Timestamp
+    end: pd.Timestamp
+    temp_max: float
+    temp_min: float
+    temp_mean: float
+    humidity_mean: float
+    wind_speed_mean: float
+    pressure_min: float
+    pressure_max: float
+
+    @property
+    def span_days(self) -> int:
+        return (self.end - self.start).days
+
+    @property
+    def temp_range(self) -> float:
+        return self.temp_max - self.temp_min
+
+
+def summarize(forecast: CompactForecast) -> ForecastSummary:
+    timestamps = forecast.timestamps()
+    temp = forecast.column("temp")
+    pressure = forecast.column("pressure")
+    return ForecastSummary(
+        rows=len(forecast),
+        start=timestamps.min(),
+        end=timestamps.max(),
+        temp_max=float(temp.max()),
+        temp_min=float(temp.min()),
+        temp_mean=float(temp.mean(dtype=np.float64)),
+        humidity_mean=float(forecast.column("humidity").mean(dtype=np.float64)),
+        wind_speed_mean=float(forecast.column("wind_speed").mean(dtype=np.float64)),
+        pressure_min=float(pressure.min()),
+        pressure_max=float(pressure.max()),
+    )
+
+
+def rollup(forecast: CompactForecast, freq: str = "D") -> pd.DataFrame:
+    """Aggregate a forecast per day (``"D"``) or per ISO week (``"W"``)
+
+    Temperature gets min/max/mean and the ``PERCENTILES``; humidity, wind and
+    clouds get means (wind also its max). ``dominant_weather`` is the most
+    frequent condition of the period, ties going to the earliest one.
+    """
+    if freq not in ROLLUP_FREQS:
+        raise ValueError(f"freq must be one of {sorted(ROLLUP_FREQS)}")
+    timestamps = forecast.timestamps()
+    period = timestamps.normalize() if freq == "D" else timestamps.to_period("W").start_time
+    rows = pd.DataFrame({
+        "period": period,
+        "temp": forecast.column("temp").astype(np.float64),
+        "humidity": forecast.column("humidity").astype(np.float64),
+        "wind_speed": forecast.column("wind_speed").astype(np.float64),
+        "clouds": forecast.column("clouds").astype(np.float64),
+        "weather": forecast.weather,
+    })
+    grouped = rows.groupby("period", sort=True)
+
+    out = grouped["temp"].agg(temp_min="min", temp_max="max", temp_mean="mean")
+    quantiles = grouped["temp"].quantile([p / 100 for p in PERCENTILES]).unstack()
+    quantiles.columns = [f"temp_p{p}" for p in PERCENTILES]
+    out = out.join(quantiles)
+    out["humidity_mean"] = grouped["humidity"].mean()
+    out["wind_speed_mean"] = grouped["wind_speed"].mean()
+    out["wind_speed_max"] = grouped["wind_speed"].max()
+    out["clouds_mean"] = grouped["clouds"].mean()
+    out["samples"] = grouped.size()
+
+    # Most frequent condition code per period; stable sort keeps the earliest on ties
+    counts = rows.groupby(["period", "weather"], sort=False).size().rename("n").reset_index()
+    dominant = counts.sort_values("n", ascending=False, kind="stable").drop_duplicates("period")
+    out["dominant_weather"] = pd.Series(
+        VOCABULARY.decode(dominant["weather"].to_numpy()), index=dominant["period"].to_numpy()
+    )
+    out.index.name = "date" if freq == "D" else "week"
+    return out.round(2)
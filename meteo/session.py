@@ -0,0 +1,205 @@
+"""Per-session state helpers for long-lived dashboard sessions.
+
+* :class:`BoundedOrderedSet` replaces the unbounded lists kept in
+  ``st.session_state`` (search history, favorites, comparison cities): O(1)
+  membership, add and remove, case-insensitive de-duplication, and a cap
+  that evicts the oldest entries.
+* :func:`release` drops a run's DataFrames and figures from the script
+  namespace, which Streamlit otherwise keeps alive until the next rerun.
+* :class:`MemoryProfiler` records tracemalloc usage at named stages of each
+  run, so it can be checked that a session settles into a steady state.
+  Tracing is process-wide: with several active sessions, numbers mix.
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+import tracemalloc
+from collections import OrderedDict, deque
+from typing import Callable, Deque, Dict, Hashable, Iterable, Iterator, List, NamedTuple, Optional
+
+SEARCH_HISTORY_SIZE = 50
+FAVORITES_SIZE = 20
+COMPARE_SIZE = 8
+PROFILE_RUNS = 50        # profiled reruns kept
+PROFILE_TOP = 10         # allocation sites reported per run
+TRACE_FRAMES = 1
+# Set to trace memory by stage from startup (e.g. for kiosk soak tests)
+MEMPROFILE = bool(os.environ.get("METEO_MEMPROFILE"))
+
+
+def city_key(city: str) -> str:
+    return " ".join(city.split()).casefold()
+
+
+class BoundedOrderedSet:
+    """Insertion-ordered set with a size cap, deduplicated by ``key``
+
+    Re-adding an item moves it to the newest position; past ``maxlen`` the
+    oldest items are evicted. Indexing and slicing follow list semantics.
+    """
+
+    __slots__ = ("maxlen", "key", "_items")
+
+    def __init__(self, maxlen: int, items: Iterable = (), key: Callable[[object], Hashable] = city_key):
+        self.maxlen = maxlen
+        self.key = key
+        self._items: OrderedDict = OrderedDict()
+        for item in items:
+            self.add(item)
+
+    def add(self, item) -> None:
+        k = self.key(item)
+        if k in self._items:
+            self._items.move_to_end(k)
+            return
+        self._items[k] = item
+        while len(self._items) > self.maxlen:
+            self._items.popitem(last=False)
+
+    def discard(self, item) -> None:
+        self._items.pop(self.key(item), None)
+
+    def remove(self, item) -> None:
+        del self._items[self.key(item)]
+
+    def clear(self) -> None:
+        self._items.clear()
+
+    def __contains__(self, item) -> bool:
+        return self.key(item) in self._items
+
+    def __iter__(self) -> Iterator:
+        return iter(list(self._items.values()))
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __bool__(self) -> bool:
+        return bool(self._items)
+
+    def __getitem__(self, index):
+        return list(self._items.values())[index]
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({list(self._items.values())!r}, maxlen={self.maxlen})"
+
+
+def release(namespace: Dict[str, object], names: Iterable[str]) -> int:
+    """Delete the listed globals from a script namespace, skipping those this run never set
+
+    Returns the number of names released.
+    """
+    released = 0
+    for name in names:
+        if namespace.pop(name, None) is not None:
+            released += 1
+    return released
+
+
+class StageMemory(NamedTuple):
+    stage: str
+    current_mb: float    # traced memory at the end of the stage
+    delta_mb: float      # change since the previous stage
+    peak_mb: float       # peak reached during the stage
+    elapsed_ms: float
+
+
+class RunProfile:
+    """Memory checkpoints of one script run"""
+
+    def __init__(self, profiler: "MemoryProfiler"):
+        self.profiler = profiler
+        self.stages: List[StageMemory] = []
+        self.started = time.time()
+        tracemalloc.reset_peak()
+        self._last_current = tracemalloc.get_traced_memory()[0]
+        self._last_time = time.perf_counter()
+
+    def mark(self, stage: str) -> None:
+        """Close the stage that ends here"""
+        current, peak = tracemalloc.get_traced_memory()
+        now = time.perf_counter()
+        mb = 1024 * 1024
+        self.stages.append(StageMemory(stage, round(current / mb, 3), round((current - self._last_current) / mb, 3),
+                                       round(peak / mb, 3), round((now - self._last_time) * 1000, 1)))
+        tracemalloc.reset_peak()
+        self._last_current, self._last_time = current, now
+
+    def finish(self) -> None:
+        self.profiler._record(self)
+
+
+class _NoProfile:
+    def mark(self, stage: str) -> None:
+        pass
+
+    def finish(self) -> None:
+        pass
+
+
+class MemoryProfiler:
+    """Process-wide tracemalloc stage profiler; inert until started"""
+
+    def __init__(self, max_runs: int = PROFILE_RUNS, top: int = PROFILE_TOP):
+        self.top = top
+        self.runs: Deque[Dict] = deque(maxlen=max_runs)
+        self._snapshot: Optional[tracemalloc.Snapshot] = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self) -> None:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACE_FRAMES)
+
+    def stop(self) -> None:
+        tracemalloc.stop()
+        self._snapshot = None
+
+    def begin_run(self):
+        """A :class:`RunProfile` when tracing, otherwise a free no-op"""
+        return RunProfile(self) if self.enabled else _NoProfile()
+
+    def _record(self, run: RunProfile) -> None:
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, "<frozen *>")])
+        with self._lock:
+            growth = []
+            if self._snapshot is not None:
+                for stat in snapshot.compare_to(self._snapshot, "lineno")[:self.top]:
+                    frame = stat.traceback[0]
+                    growth.append({"site": f"{frame.filename}:{frame.lineno}",
+                                   "size_diff_kb": round(stat.size_diff / 1024, 1),
+                                   "count_diff": stat.count_diff})
+            self._snapshot = snapshot
+            self.runs.append({"started": run.started, "stages": run.stages, "growth": growth,
+                              "traced_mb": run.stages[-1].current_mb if run.stages else None})
+
+    def trend(self) -> List[Optional[float]]:
+        """Traced MB at the end of each recorded run, oldest first"""
+        with self._lock:
+            return [r["traced_mb"] for r in self.runs]
+
+    def last(self) -> Optional[Dict]:
+        with self._lock:
+            return self.runs[-1] if self.runs else None
+
+
+_default_profiler: Optional[MemoryProfiler] = None
+_default_lock = threading.Lock()
+
+
+def default_profiler() -> MemoryProfiler:
+    """Process-wide profiler, tracing from the start when ``METEO_MEMPROFILE`` is set"""
+    global _default_profiler
+    if _default_profiler is None:
+        with _default_lock:
+            if _default_profiler is None:
+                _default_profiler = MemoryProfiler()
+                if MEMPROFILE:
+                    _default_profiler.start()
+    return _default_profiler
@@ -0,0 +1,327 @@
+"""Shared forecast tier for several dashboard replicas behind a load balancer.
+
+Without it every replica fetches and caches on its own, multiplying API
+usage by the replica count. With ``METEO_REDIS_URL`` set, the forecast
+store of each replica goes through a Redis-protocol backend (a real Redis
+or the ``meteo.resp`` stand-in):
+
+* processed records (compact forecast arrays plus the current and
+  pollution payloads) are published under ``meteo:record:<city>`` with the
+  cache TTL, and a replica that misses locally adopts the shared copy;
+* on a shared miss, a per-city lease (``SET NX PX``) makes sure one node
+  fetches upstream while the others wait for its result;
+* one replica at a time holds the ``meteo:leader`` lease and refreshes
+  cities that were read recently before their shared record expires, so
+  readers rarely wait at all.
+
+When the backend is unreachable the replica falls back to fetching on its
+own for a while, so an outage costs API quota but not availability.
+Forecast history and the snapshot archive are kept by the replica that
+did the fetch.
+"""
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import logging
+import os
+import socket
+import sys
+import threading
+import time
+import uuid
+from typing import TYPE_CHECKING, Dict, Optional, Tuple
+
+import numpy as np
+
+from .client import CACHE_TTL, ErrorHandler, WeatherClient
+from .compact import VOCABULARY, CompactForecast
+from .models import Payload
+from .resp import RespClient, RespError
+
+if TYPE_CHECKING:
+    from .store import CityRecord, ForecastStore
+
+logger = logging.getLogger(__name__)
+
+REDIS_URL = os.environ.get("METEO_REDIS_URL")
+PREFIX = "meteo:"
+LEASE_TTL = 30.0         # seconds a city refresh lease lasts if its holder dies
+LEADER_TTL = 15.0        # seconds the refresher leadership lasts without renewal
+REFRESH_INTERVAL = 5.0   # seconds between refresher passes
+REFRESH_AHEAD = 120.0    # the leader refreshes shared records expiring within this many seconds
+DEMAND_TTL = 1800.0      # cities nobody read for this long are left to expire
+WAIT_TIMEOUT = 15.0      # seconds a replica waits for another node's refresh before fetching itself
+WAIT_POLL = 0.1
+BACKOFF = 30.0           # seconds of local-only operation after a backend failure
+
+BACKEND_ERRORS = (OSError, ConnectionError, RespError)
+
+
+def node_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+
+def encode_record(record: "CityRecord") -> bytes:
+    """Processed record as a compressed ``.npz``; condition codes travel as labels"""
+    forecast = record.forecast
+    meta = json.dumps({"city": record.city, "current": record.current, "pollution": record.pollution,
+                       "fetched_at": record.fetched_at}, separators=(",", ":")).encode("utf-8")
+    buf = io.BytesIO()
+    np.savez_compressed(buf, epoch=forecast.epoch, values=forecast.values,
+                        weather=VOCABULARY.decode(forecast.weather).astype(str),
+                        description=VOCABULARY.decode(forecast.description).astype(str),
+                        meta=np.frombuffer(meta, dtype=np.uint8))
+    return buf.getvalue()
+
+
+def decode_record(blob: bytes) -> Tuple[str, CompactForecast, Payload, Optional[Payload], float]:
+    """``(city, forecast, current, pollution, fetched_at)`` of an encoded record"""
+    with np.load(io.BytesIO(blob), allow_pickle=False) as data:
+        meta = json.loads(data["meta"].tobytes())
+        forecast = CompactForecast(data["epoch"], data["values"],
+                                   VOCABULARY.encode(data["weather"].tolist()),
+                                   VOCABULARY.encode(data["description"].tolist()))
+    return meta["city"], forecast, meta["current"], meta["pollution"], meta["fetched_at"]
+
+
+class Lease:
+    """Expiring lock held by one owner: ``SET NX PX`` to take, checked ``WATCH``/``MULTI`` to renew or drop
+
+    The stored value is the node ID plus a per-lease token, so two threads of
+    the same node never both believe they hold it.
+    """
+
+    def __init__(self, client: RespClient, key: str, ttl: float, owner: str):
+        self.client = client
+        self.key = key
+        self.ttl_ms = int(ttl * 1000)
+        self.owner = f"{owner}/{uuid.uuid4().hex[:8]}"
+
+    def acquire(self) -> bool:
+        """Take the lease, or extend it if this owner already holds it"""
+        return self.client.set(self.key, self.owner, px=self.ttl_ms, nx=True) or self.renew()
+
+    def _if_owner(self, *command) -> bool:
+        with self.client.connection() as conn:
+            conn.execute("WATCH", self.key)
+            if conn.execute("GET", self.key) != self.owner.encode():
+                conn.execute("UNWATCH")
+                return False
+            conn.execute("MULTI")
+            conn.execute(*command)
+            # None: the key changed hands between GET and EXEC
+            return bool(conn.execute("EXEC"))
+
+    def renew(self) -> bool:
+        return self._if_owner("PEXPIRE", self.key, self.ttl_ms)
+
+    def release(self) -> bool:
+        return self._if_owner("DEL", self.key)
+
+    def holder(self) -> Optional[str]:
+        value = self.client.get(self.key)
+        return value.decode("utf-8") if value is not None else None
+
+
+class SharedTier:
+    """Shared records, single-flight refresh leases and the leader-elected refresher"""
+
+    def __init__(self, client: RespClient, owner: Optional[str] = None, ttl: float = CACHE_TTL,
+                 refresh_ahead: float = REFRESH_AHEAD, wait_timeout: float = WAIT_TIMEOUT):
+        self.client = client
+        self.owner = owner or node_id()
+        self.ttl = ttl
+        self.refresh_ahead = refresh_ahead
+        self.wait_timeout = wait_timeout
+        self.leader = Lease(client, PREFIX + "leader", LEADER_TTL, self.owner)
+        self.is_leader = False
+        self.counts = dict.fromkeys(("shared_hits", "refreshes", "waits", "ahead", "fallbacks"), 0)
+        self._down_until = 0.0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def record_key(city: str) -> str:
+        return f"{PREFIX}record:{WeatherClient.cache_key(city)}"
+
+    @staticmethod
+    def lease_key(city: str) -> str:
+        return f"{PREFIX}lease:{WeatherClient.cache_key(city)}"
+
+    @staticmethod
+    def demand_key(city: str) -> str:
+        return f"{PREFIX}demand:{WeatherClient.cache_key(city)}"
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self.counts[name] += 1
+
+    # ------------------ Reads ------------------
+
+    def get(self, store: "ForecastStore", city: str, on_error: Optional[ErrorHandler] = None) -> Optional["CityRecord"]:
+        """Record for ``city`` from the shared tier, refreshing it here if no other node is"""
+        if time.monotonic() < self._down_until:
+            return store.fetch(city, on_error)
+        try:
+            self.client.set(self.demand_key(city), city, px=int(DEMAND_TTL * 1000))
+            record = self._adopt(store, self.client.get(self.record_key(city)))
+            if record is not None:
+                return record
+            return self._refresh_or_wait(store, city, on_error)
+        except BACKEND_ERRORS as exc:
+            logger.warning("Shared cache unavailable (%s); fetching locally for %.0fs", exc, BACKOFF)
+            self._down_until = time.monotonic() + BACKOFF
+            self._count("fallbacks")
+            return store.fetch(city, on_error)
+
+    def _adopt(self, store: "ForecastStore", blob: Optional[bytes]) -> Optional["CityRecord"]:
+        if blob is None:
+            return None
+        self._count("shared_hits")
+        return store.adopt(*decode_record(blob))
+
+    def _refresh_or_wait(self, store: "ForecastStore", city: str,
+                         on_error: Optional[ErrorHandler]) -> Optional["CityRecord"]:
+        lease = Lease(self.client, self.lease_key(city), LEASE_TTL, self.owner)
+        deadline = time.monotonic() + self.wait_timeout
+        waited = False
+        while True:
+            if lease.acquire():
+                try:
+                    # Another node may have published while we were trying
+                    record = self._adopt(store, self.client.get(self.record_key(city)))
+                    return record if record is not None else self.refresh(store, city, on_error)
+                finally:
+                    lease.release()
+            if not waited:
+                self._count("waits")
+                waited = True
+            record = self._adopt(store, self.client.get(self.record_key(city)))
+            if record is not None:
+                return record
+            if time.monotonic() >= deadline:
+                logger.info("Gave up waiting for another node to refresh %s", city)
+                self._count("fallbacks")
+                return store.fetch(city, on_error)
+            time.sleep(WAIT_POLL)
+
+    # ------------------ Writes ------------------
+
+    def refresh(self, store: "ForecastStore", city: str, on_error: Optional[ErrorHandler] = None,
+                bypass_cache: bool = False) -> Optional["CityRecord"]:
+        """Fetch ``city`` upstream through ``store`` and publish the result"""
+        if bypass_cache:
+            store.client.invalidate(city)
+        record = store.fetch(city, on_error)
+        if record is not None:
+            self.publish(record)
+            self._count("refreshes")
+        return record
+
+    def publish(self, record: "CityRecord") -> None:
+        remaining = self.ttl - (time.time() - record.fetched_at)
+        if remaining > 0:
+            self.client.set(self.record_key(record.city), encode_record(record), px=int(remaining * 1000))
+
+    # ------------------ Leader-elected refresher ------------------
+
+    def refresh_due(self, store: "ForecastStore") -> int:
+        """Refresh recently read cities whose shared record expires soon; returns how many"""
+        refreshed = 0
+        ahead_ms = self.refresh_ahead * 1000
+        for key in list(self.client.scan_iter(PREFIX + "demand:*")):
+            if not self.leader.renew():
+                self.is_leader = False
+                break
+            city = self.client.get(key)
+            if city is None:
+                continue
+            city = city.decode("utf-8")
+            if self.client.pttl(self.record_key(city)) > ahead_ms:
+                continue
+            lease = Lease(self.client, self.lease_key(city), LEASE_TTL, self.owner)
+            if not lease.acquire():
+                continue      # a replica is already refreshing it on demand
+            try:
+                if self.refresh(store, city, bypass_cache=True) is not None:
+                    refreshed += 1
+                    self._count("ahead")
+            finally:
+                lease.release()
+        return refreshed
+
+    def _run(self, store: "ForecastStore") -> None:
+        while not self._stop.wait(REFRESH_INTERVAL):
+            try:
+                leading = self.leader.acquire()
+                if leading != self.is_leader:
+                    logger.info("%s %s the shared refresher", self.owner, "now leads" if leading else "no longer leads")
+                self.is_leader = leading
+                if leading:
+                    self.refresh_due(store)
+            except BACKEND_ERRORS as exc:
+                self.is_leader = False
+                logger.debug("Refresher pass failed: %s", exc)
+
+    def start(self, store: "ForecastStore") -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, args=(store,), name="meteo-shared-refresher",
+                                            daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=REFRESH_INTERVAL + 1)
+        try:
+            if self.is_leader:
+                self.leader.release()
+        except BACKEND_ERRORS:
+            pass
+        self.is_leader = False
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            counts = dict(self.counts)
+        return {"node": self.owner, "leader": self.is_leader, **counts}
+
+
+_default_shared: Optional[SharedTier] = None
+_default_lock = threading.Lock()
+
+
+def default_shared() -> Optional[SharedTier]:
+    """Process-wide shared tier at ``METEO_REDIS_URL``, or None when replicas don't share"""
+    global _default_shared
+    if _default_shared is None and REDIS_URL:
+        with _default_lock:
+            if _default_shared is None:
+                _default_shared = SharedTier(RespClient(REDIS_URL))
+    return _default_shared
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect the shared forecast tier")
+    parser.add_argument("--url", default=REDIS_URL or "redis://127.0.0.1:6380/0", help="redis://host:port/db")
+    parser.add_argument("command", choices=["status"])
+    args = parser.parse_args(argv)
+
+    client = RespClient(args.url)
+    leader = client.get(PREFIX + "leader")
+    print(f"Leader: {leader.decode('utf-8') if leader else 'none'}")
+    demand = list(client.scan_iter(PREFIX + "demand:*"))
+    print(f"Cities in demand: {len(demand)}")
+    for key in sorted(client.scan_iter(PREFIX + "record:*")):
+        city = key[len(PREFIX + "record:"):]
+        lease = client.get(PREFIX + "lease:" + city)
+        print(f"  {city}: expires in {client.pttl(key) / 1000:.0f}s"
+              + (f", refreshing on {lease.decode('utf-8')}" if lease else ""))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
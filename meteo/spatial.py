@@ -0,0 +1,130 @@
+"""Spatial index over monitored sites: radius, k-nearest and bounding-box queries.
+
+Sites are embedded on the unit sphere and indexed with a
+:class:`scipy.spatial.cKDTree`, so great-circle radius and nearest-neighbour
+queries are exact and logarithmic in the number of sites. Bounding boxes are
+a vectorized mask over the coordinate arrays and handle the antimeridian.
+"""
+from __future__ import annotations
+
+import csv
+import threading
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+from .client import WeatherClient
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+class SiteHit(NamedTuple):
+    name: str
+    lat: float
+    lon: float
+    distance_km: float
+
+
+def to_unit_xyz(lat, lon) -> np.ndarray:
+    lat, lon = np.radians(np.asarray(lat, dtype=np.float64)), np.radians(np.asarray(lon, dtype=np.float64))
+    cos_lat = np.cos(lat)
+    return np.stack([cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)], axis=-1)
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def _chord(km: float) -> float:
+    """Straight-line distance on the unit sphere for a great-circle distance"""
+    return 2 * np.sin(min(km / EARTH_RADIUS_KM, np.pi) / 2)
+
+
+class SiteIndex:
+    """Immutable k-d tree over a fixed set of named coordinates"""
+
+    def __init__(self, names: List[str], lat, lon):
+        self.names = list(names)
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.lon = np.asarray(lon, dtype=np.float64)
+        self._tree = cKDTree(to_unit_xyz(self.lat, self.lon)) if self.names else None
+
+    def __len__(self):
+        return len(self.names)
+
+    def _hits(self, idx, lat: float, lon: float) -> List[SiteHit]:
+        idx = np.asarray(idx, dtype=int)
+        dist = haversine_km(lat, lon, self.lat[idx], self.lon[idx])
+        order = np.argsort(dist, kind="stable")
+        return [SiteHit(self.names[i], float(self.lat[i]), float(self.lon[i]), float(d))
+                for i, d in zip(idx[order], dist[order])]
+
+    def within(self, lat: float, lon: float, radius_km: float) -> List[SiteHit]:
+        """All sites within ``radius_km`` of a point, nearest first"""
+        if self._tree is None:
+            return []
+        idx = self._tree.query_ball_point(to_unit_xyz(lat, lon), _chord(radius_km))
+        return self._hits(idx, lat, lon)
+
+    def nearest(self, lat: float, lon: float, k: int = 5) -> List[SiteHit]:
+        """The ``k`` sites closest to a point"""
+        if self._tree is None or k <= 0:
+            return []
+        _, idx = self._tree.query(to_unit_xyz(lat, lon), k=min(k, len(self)))
+        return self._hits(np.atleast_1d(idx), lat, lon)
+
+    def in_bbox(self, south: float, west: float, north: float, east: float) -> List[SiteHit]:
+        """Sites inside a lat/lon box; ``west > east`` means the box crosses 180°"""
+        lat_ok = (self.lat >= south) & (self.lat <= north)
+        if west <= east:
+            lon_ok = (self.lon >= west) & (self.lon <= east)
+        else:
+            lon_ok = (self.lon >= west) | (self.lon <= east)
+        idx = np.flatnonzero(lat_ok & lon_ok)
+        center_lat = (south + north) / 2
+        center_lon = (west + east) / 2 if west <= east else ((west + east + 360) / 2 + 180) % 360 - 180
+        return self._hits(idx, center_lat, center_lon)
+
+
+class SiteRegistry:
+    """Mutable city -> coordinate store; the index is rebuilt lazily after changes"""
+
+    def __init__(self):
+        self._sites: Dict[str, Tuple[str, float, float]] = {}
+        self._index: Optional[SiteIndex] = None
+        self._lock = threading.Lock()
+
+    def add(self, name: str, lat: float, lon: float) -> None:
+        key = WeatherClient.cache_key(name)
+        with self._lock:
+            if self._sites.get(key, (None, None, None))[1:] != (lat, lon):
+                self._sites[key] = (name, float(lat), float(lon))
+                self._index = None
+
+    def load_csv(self, path: str) -> int:
+        """Bulk-load sites from a CSV with ``city``, ``lat`` and ``lon`` columns"""
+        with open(path, newline="", encoding="utf-8") as fh:
+            rows = [(r["city"].strip(), float(r["lat"]), float(r["lon"])) for r in csv.DictReader(fh)]
+        with self._lock:
+            for name, lat, lon in rows:
+                self._sites[WeatherClient.cache_key(name)] = (name, lat, lon)
+            self._index = None
+        return len(rows)
+
+    def locate(self, name: str) -> Optional[Tuple[float, float]]:
+        with self._lock:
+            site = self._sites.get(WeatherClient.cache_key(name))
+        return site[1:] if site else None
+
+    def __len__(self):
+        return len(self._sites)
+
+    def index(self) -> SiteIndex:
+        with self._lock:
+            if self._index is None:
+                sites = list(self._sites.values())
+                self._index = SiteIndex([s[0] for s in sites], [s[1] for s in sites], [s[2] for s in sites])
+            return self._index
@@ -0,0 +1,212 @@
+"""Per-city store of processed forecasts, kept in compact form.
+
+The store sits on top of :class:`~meteo.client.WeatherClient`: a city is
+fetched and processed once per cache period, and every consumer (dashboard
+reruns, the JSON API) reads the same compact record instead of reprocessing
+raw payloads. With a :class:`~meteo.shared.SharedTier`, replicas share those
+records and only one of them fetches a given city.
+"""
+from __future__ import annotations
+
+import atexit
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from .anomaly import Anomaly, AnomalyDetector
+from .archive import SnapshotArchive, default_archive
+from .client import ErrorHandler, WeatherClient, current_pollution, default_client
+from .compact import CompactForecast, frame_nbytes
+from .history import ForecastHistory
+from .models import Payload, WeatherData
+from .rollups import ForecastSummary, rollup, summarize
+from .shared import SharedTier, default_shared
+from .spatial import SiteRegistry
+
+MAX_CITIES = 5000
+# Optional forecast history archive (e.g. maintained by ``meteo.fleet --history``)
+HISTORY_PATH = os.environ.get("METEO_HISTORY_PATH")
+# Optional anomaly baseline state (``.npz``), reloaded at start and saved while running
+ANOMALY_PATH = os.environ.get("METEO_ANOMALY_PATH")
+ANOMALY_SAVE_SECONDS = 300
+# Optional CSV (city,lat,lon) of monitored sites to preload into the spatial index
+SITES_PATH = os.environ.get("METEO_SITES_PATH")
+
+
+@dataclass
+class CityRecord:
+    city: str
+    current: Payload
+    pollution: Optional[Payload]
+    forecast: CompactForecast
+    summary: ForecastSummary
+    daily: pd.DataFrame
+    weekly: pd.DataFrame
+    fetched_at: float = field(default_factory=time.time)
+    anomalies: List[Anomaly] = field(default_factory=list)
+
+    @property
+    def coord(self) -> Dict[str, float]:
+        return self.current['coord']
+
+    def frame(self) -> pd.DataFrame:
+        """Forecast as a ``process_forecast``-shaped DataFrame"""
+        return self.forecast.to_frame()
+
+
+class ForecastStore:
+    """Thread-safe LRU of :class:`CityRecord` refreshed through the client"""
+
+    def __init__(self, client: Optional[WeatherClient] = None, max_cities: int = MAX_CITIES,
+                 history: Optional[ForecastHistory] = None,
+                 detector: Optional[AnomalyDetector] = None,
+                 archive: Optional[SnapshotArchive] = None,
+                 shared: Optional[SharedTier] = None,
+                 anomaly_path: Optional[str] = None):
+        self.client = client or default_client()
+        self.max_cities = max_cities
+        self.history = history if history is not None else ForecastHistory()
+        self.detector = detector if detector is not None else AnomalyDetector()
+        self.archive = archive
+        self.shared = shared
+        self.anomaly_path = anomaly_path
+        self._anomaly_saved = time.time()
+        self.sites = SiteRegistry()
+        self._records: OrderedDict[str, CityRecord] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def peek(self, city: str) -> Optional[CityRecord]:
+        """Stored record for ``city`` regardless of age, without fetching"""
+        with self._lock:
+            return self._records.get(WeatherClient.cache_key(city))
+
+    def get(self, city: str, on_error: Optional[ErrorHandler] = None) -> Optional[CityRecord]:
+        """Fresh record for ``city``, fetching and ingesting it when stale"""
+        record = self.peek(city)
+        if record is not None and time.time() - record.fetched_at <= self.client.ttl:
+            return record
+        if self.shared is not None:
+            return self.shared.get(self, city, on_error)
+        return self.fetch(city, on_error)
+
+    def fetch(self, city: str, on_error: Optional[ErrorHandler] = None) -> Optional[CityRecord]:
+        """Fetch ``city`` through this process's client and ingest it"""
+        data = self.client.fetch(city, on_error=on_error)
+        if data is None:
+            return None
+        return self.ingest(city, data)
+
+    def ingest(self, city: str, data: WeatherData) -> CityRecord:
+        """Process a fetched bundle into a compact record and store it
+
+        Summary statistics and daily/weekly rollups are materialized here,
+        once per fetch, so readers never rescan the 3-hourly rows. The record
+        keeps the bundle's fetch time (a cached bundle is as old as its fetch),
+        and the client's copy of the raw forecast is released afterwards.
+        """
+        record = self._build(city, CompactForecast.from_payload(data['forecast']),
+                             data['current'], current_pollution(data), data.get('fetched_at'))
+        self.history.record(city, data, record.fetched_at)
+        if self.archive is not None:
+            self.archive.record(city, data, record.fetched_at)
+        self.client.release_forecast(city)
+        return self._keep(record)
+
+    def adopt(self, city: str, forecast: CompactForecast, current: Payload,
+              pollution: Optional[Payload], fetched_at: float) -> CityRecord:
+        """Store a record processed elsewhere (another replica), keeping its fetch time"""
+        return self._keep(self._build(city, forecast, current, pollution, fetched_at))
+
+    def _build(self, city: str, forecast: CompactForecast, current: Payload,
+               pollution: Optional[Payload], fetched_at: Optional[float] = None) -> CityRecord:
+        record = CityRecord(
+            city=city,
+            current=current,
+            pollution=pollution,
+            forecast=forecast,
+            summary=summarize(forecast),
+            daily=rollup(forecast, "D"),
+            weekly=rollup(forecast, "W"),
+            anomalies=self.detector.update(city, current),
+        )
+        if fetched_at is not None:
+            record.fetched_at = fetched_at
+        self._save_anomalies()
+        return record
+
+    def _save_anomalies(self, force: bool = False) -> None:
+        """Persist the detector baselines to ``anomaly_path`` at most every ANOMALY_SAVE_SECONDS"""
+        if self.anomaly_path is None:
+            return
+        now = time.time()
+        with self._lock:
+            if not force and now - self._anomaly_saved < ANOMALY_SAVE_SECONDS:
+                return
+            self._anomaly_saved = now
+        self.detector.save(self.anomaly_path)
+
+    def _keep(self, record: CityRecord) -> CityRecord:
+        self.sites.add(record.city, record.coord['lat'], record.coord['lon'])
+        key = WeatherClient.cache_key(record.city)
+        with self._lock:
+            self._records[key] = record
+            self._records.move_to_end(key)
+            while len(self._records) > self.max_cities:
+                self._records.popitem(last=False)
+        return record
+
+    def records(self) -> List[CityRecord]:
+        with self._lock:
+            return list(self._records.values())
+
+    def __len__(self):
+        return len(self._records)
+
+    def memory_report(self) -> pd.DataFrame:
+        """Bytes per city as a full frame versus the stored compact form
+
+        ``cached_bytes`` is what the client's cache still retains for the city
+        (raw current and pollution JSON, until the entry expires).
+        """
+        rows = []
+        for record in self.records():
+            rows.append({
+                "city": record.city,
+                "rows": len(record.forecast),
+                "frame_bytes": frame_nbytes(record.frame()),
+                "compact_bytes": record.forecast.nbytes,
+                "cached_bytes": self.client.cached_nbytes(record.city),
+            })
+        return pd.DataFrame(rows, columns=["city", "rows", "frame_bytes", "compact_bytes", "cached_bytes"])
+
+
+_default_store: Optional[ForecastStore] = None
+_default_lock = threading.Lock()
+
+
+def default_store() -> ForecastStore:
+    """Process-wide store backed by :func:`~meteo.client.default_client`"""
+    global _default_store
+    if _default_store is None:
+        with _default_lock:
+            if _default_store is None:
+                history = None
+                if HISTORY_PATH and os.path.exists(HISTORY_PATH):
+                    history = ForecastHistory.load(HISTORY_PATH)
+                detector = None
+                if ANOMALY_PATH and os.path.exists(ANOMALY_PATH):
+                    detector = AnomalyDetector.load(ANOMALY_PATH)
+                _default_store = ForecastStore(history=history, detector=detector, archive=default_archive(),
+                                               shared=default_shared(), anomaly_path=ANOMALY_PATH)
+                if ANOMALY_PATH:
+                    atexit.register(_default_store._save_anomalies, True)
+                if SITES_PATH and os.path.exists(SITES_PATH):
+                    _default_store.sites.load_csv(SITES_PATH)
+                if _default_store.shared is not None:
+                    _default_store.shared.start(_default_store)
+    return _default_store
@@ -0,0 +1,9 @@
+"""Dashboard colour palette shared by the UI and the analytics labels."""
+
+THEME_COLOR = "#00d4ff"
+DARK_BG = "#0a0e27"
+CARD_BG = "#1a1f3a"
+TEXT_PRIMARY = "#ffffff"
+ACCENT_COLOR = "#ff6b9d"
+SUCCESS_COLOR = "#00ff88"
+WARNING_COLOR = "#ff9500"
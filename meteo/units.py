@@ -0,0 +1,22 @@
+"""Temperature unit helpers"""
+from __future__ import annotations
+
+CELSIUS = 'Celsius'
+FAHRENHEIT = 'Fahrenheit'
+
+
+def celsius_to_fahrenheit(celsius):
+    """Convert Celsius to Fahrenheit (scalars, arrays and Series alike)"""
+    return (celsius * 9/5) + 32
+
+
+def convert_temp(temp, unit: str):
+    """Convert temperature based on selected unit"""
+    if unit == FAHRENHEIT:
+        return celsius_to_fahrenheit(temp)
+    return temp
+
+
+def get_temp_symbol(unit: str) -> str:
+    """Get temperature symbol"""
+    return '°F' if unit == FAHRENHEIT else '°C'
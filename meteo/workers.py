@@ -0,0 +1,250 @@
+"""Process-pool backend for CPU-bound analytics.
+
+Heavy work (correlation matrices, comparison normalization, the fleet
+job's forecast processing) can run in worker processes so it scales across
+cores and stops competing with other threads for the GIL. NumPy columns travel through one :mod:`multiprocessing.shared_memory`
+block per call instead of being pickled; object columns (strings) are
+pickled alongside. Results that are large column sets come back the same
+way.
+
+Small column inputs run inline: below ``inline_cells`` values the round
+trip to a worker costs more than the work itself, which covers every
+single-city frame the dashboard builds. The pool is created lazily, so a
+process that never sees large inputs never starts a worker; the fleet job
+uses it once its site list is long enough to amortize starting one
+(:data:`meteo.fleet.POOL_MIN_SITES`).
+
+Workers are started with ``spawn`` while ``__main__`` is swapped for an
+empty module; otherwise each worker would re-execute the main script
+(under Streamlit, ``app.py``).
+"""
+from __future__ import annotations
+
+import atexit
+import multiprocessing
+import os
+import sys
+import threading
+import types
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .compare import normalize_columns, radar_ranges
+
+# Worker processes; 0 runs everything inline
+WORKERS = int(os.environ.get("METEO_WORKERS", min(4, os.cpu_count() or 1)))
+INLINE_CELLS = 250_000       # values below which a call runs in the calling thread
+SHARED_RESULT_BYTES = 1 << 20
+ALIGN = 64
+
+Columns = Dict[str, np.ndarray]
+
+
+class ColumnBlock(NamedTuple):
+    """Picklable handle to columns laid out in a shared memory block"""
+    name: Optional[str]
+    layout: Tuple[Tuple[str, str, Tuple[int, ...], int], ...]   # (column, dtype, shape, offset)
+    extra: Dict[str, Any]                                       # object columns, pickled
+    order: Tuple[str, ...]                                      # original column order
+
+
+def share_columns(columns: Columns) -> Tuple[Optional[shared_memory.SharedMemory], ColumnBlock]:
+    """Copy numeric columns into a new shared memory block; the caller unlinks it"""
+    numeric = {k: np.ascontiguousarray(v) for k, v in columns.items() if v.dtype != object}
+    extra = {k: v for k, v in columns.items() if v.dtype == object}
+    layout, offset = [], 0
+    for name, values in numeric.items():
+        layout.append((name, values.dtype.str, values.shape, offset))
+        offset += -(-values.nbytes // ALIGN) * ALIGN
+    if not numeric:
+        return None, ColumnBlock(None, (), extra, tuple(columns))
+
+    shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+    for (name, dtype, shape, start), values in zip(layout, numeric.values()):
+        np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=start)[...] = values
+    return shm, ColumnBlock(shm.name, tuple(layout), extra, tuple(columns))
+
+
+def open_columns(block: ColumnBlock) -> Tuple[Optional[shared_memory.SharedMemory], Columns]:
+    """Zero-copy views onto a block; drop them before closing the returned handle"""
+    columns = dict(block.extra)
+    shm = None
+    if block.name is not None:
+        shm = shared_memory.SharedMemory(name=block.name)
+        for name, dtype, shape, start in block.layout:
+            columns[name] = np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=start)
+    return shm, {name: columns[name] for name in block.order}
+
+
+def _close(shm: Optional[shared_memory.SharedMemory], unlink: bool = False) -> None:
+    if shm is None:
+        return
+    try:
+        shm.close()
+    except BufferError:
+        # A view escaped; the mapping is released once it is garbage collected
+        pass
+    if unlink:
+        shm.unlink()
+
+
+def _export(result):
+    """Worker side: large column sets go back through shared memory"""
+    if isinstance(result, dict) and result and all(isinstance(v, np.ndarray) for v in result.values()):
+        if sum(v.nbytes for v in result.values() if v.dtype != object) >= SHARED_RESULT_BYTES:
+            shm, block = share_columns(result)
+            _close(shm)
+            return "block", block
+    return "value", result
+
+
+def _import(tagged):
+    """Parent side: copy a shared result out and free its block"""
+    kind, payload = tagged
+    if kind == "value":
+        return payload
+    shm, columns = open_columns(payload)
+    result = {k: np.array(v, copy=True) for k, v in columns.items()}
+    del columns
+    _close(shm, unlink=True)
+    return result
+
+
+def _run_task(fn: Callable, block: ColumnBlock, args: tuple):
+    shm, columns = open_columns(block)
+    try:
+        result = fn(columns, *args)
+    finally:
+        del columns
+        _close(shm)
+    return _export(result)
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+# ------------------ Tasks (run inline or in a worker) ------------------
+
+def correlation_task(columns: Columns, names: Sequence[str]) -> np.ndarray:
+    """Pairwise Pearson correlation, same semantics as :meth:`DataFrame.corr`"""
+    return pd.DataFrame({n: columns[n] for n in names}).corr().to_numpy()
+
+
+def normalize_task(columns: Columns, ranges: Dict[str, Tuple[float, float]]) -> Columns:
+    return normalize_columns(columns, ranges)
+
+
+@contextmanager
+def _neutral_main():
+    """Hide the main script from ``spawn`` so workers do not re-run it"""
+    original = sys.modules.get("__main__")
+    neutral = types.ModuleType("__main__")
+    sys.modules["__main__"] = neutral
+    try:
+        yield
+    finally:
+        if sys.modules.get("__main__") is neutral:
+            sys.modules["__main__"] = original
+
+
+class AnalyticsPool:
+    """Runs column-oriented analytics inline or on a process pool"""
+
+    def __init__(self, workers: int = WORKERS, inline_cells: int = INLINE_CELLS):
+        self.workers = workers
+        self.inline_cells = inline_cells
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    with _neutral_main():
+                        executor = ProcessPoolExecutor(self.workers,
+                                                       mp_context=multiprocessing.get_context("spawn"))
+                        # Start every worker now, while __main__ is hidden
+                        for future in [executor.submit(_ping) for _ in range(self.workers)]:
+                            future.result()
+                    self._executor = executor
+        return self._executor
+
+    def inline(self, cells: int) -> bool:
+        return self.workers <= 0 or cells < self.inline_cells
+
+    def submit(self, fn: Callable, columns: Columns, *args) -> Future:
+        """Run ``fn(columns, *args)`` in a worker; the result future resolves in the caller"""
+        shm, block = share_columns(columns)
+        inner = self.executor().submit(_run_task, fn, block, args)
+        outer: Future = Future()
+
+        def done(f: Future):
+            _close(shm, unlink=True)
+            try:
+                outer.set_result(_import(f.result()))
+            except BaseException as exc:
+                outer.set_exception(exc)
+
+        inner.add_done_callback(done)
+        return outer
+
+    def run(self, fn: Callable, columns: Columns, *args, cells: Optional[int] = None):
+        """``fn(columns, *args)``, inline for small inputs and in a worker otherwise"""
+        cells = sum(v.size for v in columns.values()) if cells is None else cells
+        if self.inline(cells):
+            return fn(columns, *args)
+        return self.submit(fn, columns, *args).result()
+
+    def call(self, fn: Callable, *args):
+        """Plain function call in a worker (inline when the pool is disabled)
+
+        Blocks the calling thread until the result is back, which suits
+        callers that already run many calls from their own threads, such
+        as the fleet job's per-site evaluation.
+        """
+        if self.workers <= 0:
+            return fn(*args)
+        return self.executor().submit(fn, *args).result()
+
+    def correlation(self, frame: pd.DataFrame, names: Sequence[str]) -> pd.DataFrame:
+        """Correlation matrix of ``names``, equal to ``frame[names].corr()``"""
+        columns = {n: frame[n].to_numpy() for n in names}
+        matrix = self.run(correlation_task, columns, list(names))
+        return pd.DataFrame(matrix, index=list(names), columns=list(names))
+
+    def normalize(self, comp_df: pd.DataFrame, unit: str) -> pd.DataFrame:
+        """Pool-backed :func:`~meteo.compare.normalize_comparison`"""
+        ranges = radar_ranges(unit)
+        columns = {c: comp_df[c].to_numpy(dtype=np.float64, na_value=np.nan)
+                   for c in ranges if c in comp_df.columns}
+        radar_df = comp_df.copy()
+        for name, values in self.run(normalize_task, columns, ranges).items():
+            radar_df[name] = values
+        return radar_df
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True, cancel_futures=True)
+                self._executor = None
+
+
+_default_pool: Optional[AnalyticsPool] = None
+_default_lock = threading.Lock()
+
+
+def default_pool() -> AnalyticsPool:
+    """Process-wide analytics pool, shut down at interpreter exit"""
+    global _default_pool
+    if _default_pool is None:
+        with _default_lock:
+            if _default_pool is None:
+                _default_pool = AnalyticsPool()
+                atexit.register(_default_pool.shutdown)
+    return _default_pool
@@ -0,0 +1,58 @@
+"""Anomaly detector state survives restarts"""
+import numpy as np
+
+from meteo.anomaly import METRICS, AnomalyDetector, anomaly_alerts
+
+
+def snapshot(day: int, hour: int, temp: float):
+    return {"dt": day * 86400 + hour * 3600, "main": {"temp": temp, "humidity": 60 + day % 3,
+                                                       "pressure": 1010 + day % 5},
+            "wind": {"speed": 3 + day % 2 * 0.5}}
+
+
+def test_alerts_fire_after_reload(tmp_path):
+    detector = AnomalyDetector()
+    for day in range(25):
+        assert detector.update("Oslo", snapshot(day, 12, 15 + day % 4 * 0.5)) == []
+    path = str(tmp_path / "anomalies.npz")
+    detector.save(path)
+
+    reloaded = AnomalyDetector.load(path)
+    assert reloaded.update("Oslo", snapshot(24, 12, 40)) == []      # already seen
+    alerts = reloaded.update("oslo", snapshot(30, 12, 40))
+    assert [a.metric for a in alerts] == ["temp"]
+    assert alerts[0].hour == 12 and alerts[0].z > 3
+    # A store refresh of the same observation keeps its anomalies on screen
+    assert reloaded.update("Oslo", snapshot(30, 12, 40)) == alerts
+
+
+def test_severity_follows_the_detector_threshold():
+    detector = AnomalyDetector(threshold=1.5)
+    for day in range(25):
+        detector.update("Oslo", snapshot(day, 12, 15 + day % 4 * 0.5))
+    anomalies = detector.update("Oslo", snapshot(30, 12, 18))
+    assert [a.metric for a in anomalies] == ["temp"] and 3 < anomalies[0].z < 6
+    assert [alert.severity for alert in anomaly_alerts(anomalies)] == ["danger"]
+
+
+def test_fit_matches_streaming_updates():
+    rng = np.random.default_rng(0)
+    dt = np.arange(80) * 3 * 3600 + 1_700_000_000
+    values = np.column_stack([rng.normal(15, 2, 80), rng.normal(60, 5, 80),
+                              rng.normal(1010, 3, 80), rng.normal(4, 1, 80)])
+    values[7, 1] = np.nan
+    for mode in ("welford", "ewm"):
+        streamed, fitted = AnomalyDetector(mode), AnomalyDetector(mode)
+        for t, row in zip(dt, values):
+            if not np.isnan(row).any():
+                streamed.update("Oslo", {"dt": int(t), "main": dict(zip(METRICS[:3], row[:3])),
+                                         "wind": {"speed": row[3]}})
+        # Shuffled input, and a second pass over the same history adds nothing
+        order = rng.permutation(len(dt))
+        assert fitted.fit("Oslo", dt[order], values[order]) == 79
+        assert fitted.fit("Oslo", dt, values) == 0
+        for hour in range(24):
+            expected, actual = streamed.baseline("Oslo", hour), fitted.baseline("Oslo", hour)
+            assert (expected is None) == (actual is None)
+            for metric in METRICS if expected else ():
+                np.testing.assert_allclose(actual[metric], expected[metric])
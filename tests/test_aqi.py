@@ -0,0 +1,32 @@
+"""AQI sub-indices at the breakpoints of each standard"""
+import numpy as np
+
+from meteo.aqi import IN_NAQI, MOLAR_MASS, MOLAR_VOLUME, US_EPA, compute_aqi, sub_index
+
+
+def ugm3(ppb, pollutant):
+    return np.asarray(ppb, dtype=np.float64) * MOLAR_MASS[pollutant] / MOLAR_VOLUME
+
+
+def test_us_epa_breakpoints():
+    np.testing.assert_array_equal(sub_index([0, 9.0, 9.1, 35.4, 55.5, 325.4, 900], "pm2_5", US_EPA),
+                                  [0, 50, 51, 100, 151, 500, 500])
+    np.testing.assert_array_equal(sub_index([54, 55, 424, 425, 604], "pm10", US_EPA), [50, 51, 300, 301, 500])
+    np.testing.assert_array_equal(sub_index(ugm3([4400, 9400, 50400], "co"), "co", US_EPA), [50, 100, 500])
+
+
+def test_us_epa_ozone_above_the_8_hour_table_follows_the_1_hour_table():
+    ppb = [54, 70, 105, 106, 200, 300, 404, 405, 504, 604]
+    np.testing.assert_array_equal(sub_index(ugm3(ppb, "o3"), "o3", US_EPA),
+                                  [50, 100, 200, 201, 300, 249, 300, 301, 400, 500])
+
+
+def test_india_naqi_breakpoints():
+    np.testing.assert_array_equal(sub_index([30, 31, 60, 250, 251, 380], "pm2_5", IN_NAQI),
+                                  [50, 51, 100, 400, 401, 500])
+    np.testing.assert_array_equal(sub_index([100, 168, 169, 748], "o3", IN_NAQI), [100, 200, 201, 400])
+
+    # NAQI needs three pollutants, one of them PM
+    aq = compute_aqi({"pm2_5": 61.0, "pm10": 40.0, "no2": 10.0}, IN_NAQI)
+    assert aq.index == 101 and aq.dominant == "pm2_5"
+    assert np.isnan(compute_aqi({"pm2_5": 61.0, "no2": 10.0}, IN_NAQI).index)
@@ -0,0 +1,55 @@
+"""Snapshot archive round trips"""
+import hashlib
+import itertools
+
+from meteo.archive import SnapshotArchive, canonical
+
+
+def payload_with_digest_ending(byte: bytes):
+    for i in itertools.count():
+        payload = {"list": [{"dt": i, "main": {"temp": 20.5}}], "pad": "x" * 4000}
+        if hashlib.sha256(canonical(payload)).digest().endswith(byte):
+            return payload
+
+
+def test_digest_ending_in_nul_round_trips(tmp_path):
+    archive = SnapshotArchive(str(tmp_path))
+    zero = payload_with_digest_ending(b"\x00")
+    other = {"list": [{"dt": -1, "main": {"temp": 1.0}}], "pad": "y" * 4000}
+    digest = archive.put("Oslo", "forecast", zero, fetched_at=100)
+    archive.put("Oslo", "forecast", other, fetched_at=200)
+
+    assert len(bytes(archive.index("Oslo", "forecast")["digest"][0])) == 32
+    assert archive.at("Oslo", "forecast", 150) == zero
+    assert [p for _, p in archive.history("Oslo", "forecast")] == [zero, other]
+    assert archive.get(digest) == zero
+
+    # A fresh instance reads the stream head back from the index file
+    reopened = SnapshotArchive(str(tmp_path))
+    reopened.put("Oslo", "forecast", zero, fetched_at=300)
+    assert reopened.at("Oslo", "forecast", 300) == zero
+    stats = reopened.stats()
+    assert stats["snapshots"] == 3 and stats["unique_blobs"] == 2
+    assert stats["logical_mb"] == round((2 * len(canonical(zero)) + len(canonical(other))) / 1e6, 3)
+
+
+def test_repeated_payloads_are_stored_once(tmp_path):
+    archive = SnapshotArchive(str(tmp_path))
+    payload = {"list": [{"dt": 1, "main": {"temp": 3.0}}]}
+    for t in range(5):
+        archive.put("Lima", "current", payload, fetched_at=t)
+    stats = archive.stats()
+    assert stats["snapshots"] == 5 and stats["unique_blobs"] == 1
+    assert [t for t, _ in archive.history("Lima", "current")] == list(range(5))
+
+
+def test_writers_sharing_a_root_keep_each_others_cities(tmp_path):
+    dashboard, fleet = SnapshotArchive(str(tmp_path)), SnapshotArchive(str(tmp_path))
+    dashboard.put("Oslo", "current", {"temp": 1.0}, fetched_at=10)
+    fleet.put("Lima", "current", {"temp": 2.0}, fetched_at=10)
+    dashboard.put("Quito", "current", {"temp": 3.0}, fetched_at=10)     # after fleet's new city
+
+    reader = SnapshotArchive(str(tmp_path))
+    assert sorted(reader.cities()) == ["Lima", "Oslo", "Quito"]
+    assert reader.at("Lima", "current", 10) == {"temp": 2.0}
+    assert dashboard.at("Lima", "current", 10) == {"temp": 2.0}
@@ -0,0 +1,43 @@
+"""Batched current-weather lookups"""
+import re
+from urllib.parse import parse_qs, urlsplit
+
+from meteo.batcher import CityIds, GroupBatcher
+from meteo.client import WeatherClient
+
+
+class Response:
+    def __init__(self, payload):
+        self.payload = payload
+
+    def json(self):
+        return self.payload
+
+
+class GroupSession:
+    """Answers group requests for any IDs with one payload per ID"""
+
+    def __init__(self):
+        self.calls = []
+
+    def get(self, url, timeout=None):
+        endpoint = re.search(r"/2\.5/(\w+)", url).group(1)
+        self.calls.append(endpoint)
+        ids = [int(i) for i in parse_qs(urlsplit(url).query)["id"][0].split(",")]
+        return Response({"list": [{"id": i, "name": f"City {i}", "main": {"temp": 10.0 + i}} for i in ids]})
+
+
+def test_batched_lookups_are_cached_apart_from_the_client():
+    session = GroupSession()
+    client = WeatherClient(session=session, rate_limit=0, max_entries=4)
+    client.store("Oslo", {"current": {"name": "Oslo"}})
+    ids = CityIds({f"city {i}": i for i in range(1, 31)})
+    batcher = GroupBatcher(client, ids)
+
+    currents = batcher.current_many([f"City {i}" for i in range(1, 31)], timeout=5)
+    assert len(currents) == 30 and set(session.calls) == {"group"}
+    assert client.cached("Oslo") is not None                # the city bundle was not evicted
+
+    session.calls.clear()
+    assert batcher.current("city 7", timeout=5)["main"]["temp"] == 17.0
+    assert session.calls == []
@@ -0,0 +1,47 @@
+"""Climatology tables built from observation files"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from meteo.climatology import ClimatologyStore, main
+
+
+def test_streamed_build_matches_in_memory_build(tmp_path):
+    rng = np.random.default_rng(3)
+    dt = 1_600_000_000 + np.arange(0, 3 * 365 * 86400, 3 * 3600)
+    frame = pd.DataFrame({
+        "city": np.where(np.arange(len(dt)) % 3, "Oslo", "Bergen"),
+        "dt": dt,
+        "temp": np.round(8 + 10 * np.sin(dt / 86400 / 365 * 2 * np.pi) + rng.normal(0, 2, len(dt)), 2),
+        "humidity": rng.integers(40, 100, len(dt)),
+    })
+    path = tmp_path / "observations.csv"
+    frame.to_csv(path, index=False)
+
+    expected = ClimatologyStore(str(tmp_path / "expected"))
+    expected.build_frame(frame, utc_offset=3600)
+    assert main(["build", str(path), "--out", str(tmp_path / "streamed"), "--utc-offset", "3600"]) == 0
+    streamed = ClimatologyStore(str(tmp_path / "streamed"))
+
+    assert sorted(streamed.cities()) == ["Bergen", "Oslo"]
+    for city in ("Oslo", "Bergen"):
+        assert streamed.info(city)["variables"] == ["temp", "humidity"]
+        assert streamed.info(city)["samples"] == expected.info(city)["samples"]
+        np.testing.assert_array_equal(streamed.table(city), expected.table(city))
+
+
+def test_build_frame_rejects_rows_without_a_city(tmp_path):
+    frame = pd.DataFrame({"city": ["Oslo", None], "dt": [1_600_000_000, 1_600_003_600], "temp": [4.0, 5.0]})
+    store = ClimatologyStore(str(tmp_path))
+    with pytest.raises(ValueError, match="city"):
+        store.build_frame(frame)
+    assert store.cities() == []
+
+
+def test_index_written_by_another_store_is_picked_up(tmp_path):
+    reader = ClimatologyStore(str(tmp_path))
+    assert reader.cities() == []                              # no index yet
+    local = 1_600_000_000 + np.arange(0, 400 * 86400, 3600)
+    ClimatologyStore(str(tmp_path)).build("Oslo", local, {"temp": np.full(len(local), 5.0)})
+    assert reader.cities() == ["Oslo"]
+    assert reader.classify("Oslo", 1_600_000_000, 9.0) is not None
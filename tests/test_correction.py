@@ -0,0 +1,49 @@
+"""Forecast bias correction fits"""
+import time
+
+import numpy as np
+
+from meteo.correction import CorrectionCache, design_matrix, fit_corrections
+
+
+class History:
+    def __init__(self, pairs):
+        self._pairs = pairs
+        self.version = 1
+
+    def cities(self):
+        return list(self._pairs)
+
+    def pairs(self, city):
+        return self._pairs[city]
+
+
+def synthetic(rng, n, coef):
+    lead = rng.uniform(3, 120, n)
+    hour = rng.integers(0, 24, n)
+    return lead, hour, design_matrix(lead, hour) @ coef + rng.normal(0, 0.5, n)
+
+
+def test_fit_recovers_each_citys_bias():
+    rng = np.random.default_rng(1)
+    coefs = {"Oslo": np.array([0.5, 0.2, -1.0, 0.3]), "Lima": np.array([-1.0, 0.0, 0.4, 0.8])}
+    pairs = {"Oslo": synthetic(rng, 3000, coefs["Oslo"]), "Lima": synthetic(rng, 200, coefs["Lima"]),
+             "Quito": synthetic(rng, 5, coefs["Lima"])}                     # too few pairs
+    model = fit_corrections(pairs)
+    assert "Quito" not in model and model.samples.tolist() == [200, 3000]  # sorted city keys
+    for city, coef in coefs.items():
+        np.testing.assert_allclose(model.bias_coef[model.cities[city.lower()]], coef, atol=0.15)
+        lead, hour, err = pairs[city]
+        X = design_matrix(lead, hour)
+        expected = np.linalg.solve(X.T @ X + 1e-3 * np.eye(4), X.T @ err)
+        np.testing.assert_allclose(model.bias_coef[model.cities[city.lower()]], expected)
+
+
+def test_cache_refits_in_the_background():
+    rng = np.random.default_rng(2)
+    cache = CorrectionCache(History({"Oslo": synthetic(rng, 100, np.zeros(4))}))
+    assert "Oslo" not in cache.model()                  # returns at once, fit starts behind it
+    deadline = time.time() + 5
+    while "Oslo" not in cache.model() and time.time() < deadline:
+        time.sleep(0.01)
+    assert "Oslo" in cache.model()
@@ -0,0 +1,54 @@
+"""On-demand CPU profile captures"""
+import threading
+
+from meteo.cpuprofile import CpuProfiler
+
+
+def busy(n=20000):
+    return sum(i * i for i in range(n))
+
+
+def test_concurrent_cprofile_request_falls_back_to_sampling():
+    profiler = CpuProfiler()
+    first = profiler.begin_run("cprofile")
+    modes = []
+
+    def other_session():
+        capture = profiler.begin_run("cprofile")
+        busy()
+        modes.append(capture.finish("other").mode)
+
+    thread = threading.Thread(target=other_session)
+    thread.start()
+    thread.join()
+    busy()
+    assert first.finish("first").mode == "cprofile"
+    assert modes == ["sample"]
+
+    # The hook is free again once the first capture is done
+    again = profiler.begin_run("cprofile")
+    assert again.finish("again").mode == "cprofile"
+    assert [p.label for p in profiler.recent()] == ["again", "first", "other"]
+
+
+def test_cancelled_cprofile_capture_releases_the_hook():
+    profiler = CpuProfiler()
+    profiler.begin_run("cprofile")
+    capture = profiler.begin_run("cprofile")                    # cancels the stale one first
+    assert capture.mode == "cprofile"
+    capture.cancel()
+
+
+def test_capture_of_an_exited_script_thread_is_cancelled():
+    profiler = CpuProfiler()
+    for mode in ("cprofile", "sample"):
+        leaked = []
+        thread = threading.Thread(target=lambda: leaked.append(profiler.begin_run(mode)))
+        thread.start()
+        thread.join()                                   # the run died without finishing
+        capture = profiler.begin_run("cprofile")
+        assert capture.mode == "cprofile"               # the hook was freed, not fallen back
+        assert leaked[0]._done
+        capture.cancel()
+        profiler.begin_run(None)
+        assert not profiler._active
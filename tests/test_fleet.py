@@ -0,0 +1,103 @@
+"""Fleet job evaluation: worker pool, time budget and late sites"""
+import time
+
+import requests
+
+from meteo.client import WeatherClient
+from meteo.fleet import evaluate_site, run_fleet
+from meteo.workers import AnalyticsPool
+
+START = 1_700_000_000
+
+
+class FakeClient:
+    """Stands in for WeatherClient.fetch with canned payloads"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+
+    def fetch(self, city, timeout=None, on_error=None, current=None, deadline=None):
+        time.sleep(self.delay)
+        n = len(city)
+        return {
+            "current": {"name": city, "coord": {"lat": 1.0, "lon": 2.0}, "dt": START,
+                        "main": {"temp": 30.0 + n, "feels_like": 31.0, "humidity": 50, "pressure": 1010},
+                        "wind": {"speed": 4.0}, "weather": [{"main": "Clear", "description": "clear sky"}]},
+            "forecast": {"list": [
+                {"dt": START + i * 10800,
+                 "main": {"temp": n + i % 5, "feels_like": n, "humidity": 60, "pressure": 1012},
+                 "wind": {"speed": 2.0}, "clouds": {"all": 10},
+                 "weather": [{"main": "Clouds", "description": "few clouds"}]}
+                for i in range(40)]},
+            "pollution": {"list": [{"main": {"aqi": 2}, "components": {}}]},
+        }
+
+
+def test_pool_results_match_in_thread_results():
+    sites = [f"City{'x' * i}" for i in range(6)]
+    inline, _ = run_fleet(sites, workers=3, client=FakeClient())
+    pool = AnalyticsPool(2)
+    try:
+        pooled, stats = run_fleet(sites, workers=3, client=FakeClient(), pool=pool)
+    finally:
+        pool.shutdown()
+    assert stats["ok"] == len(sites)
+    assert pooled.equals(inline)
+    assert list(pooled["forecast_max"]) == [len(s) + 4 for s in sites]
+
+
+class SlowSession:
+    """Each request takes ``delay`` seconds, or fails once its timeout is shorter"""
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.timeouts = []
+
+    def get(self, url, timeout=None):
+        self.timeouts.append(timeout)
+        time.sleep(min(self.delay, timeout))
+        if timeout < self.delay:
+            raise requests.Timeout(url)
+        return FakeResponse(url)
+
+
+class FakeResponse:
+    def __init__(self, url):
+        self.url = url
+
+    def json(self):
+        data = FakeClient().fetch("Oslo")
+        if "/forecast" in self.url:
+            return {"cod": "200", **data["forecast"]}
+        if "/air_pollution" in self.url:
+            return data["pollution"]
+        return {"cod": 200, **data["current"]}
+
+
+def test_requests_share_the_site_budget():
+    session = SlowSession(0.2)
+    client = WeatherClient(session=session, rate_limit=0)
+    started = time.monotonic()
+    row = evaluate_site("Oslo", client, started + 0.5)
+    assert time.monotonic() - started < 0.6
+    assert row["status"] == "timeout"
+    # Each request only gets what the previous ones left: 0.5, then ~0.3, then ~0.1
+    assert len(session.timeouts) == 3
+    assert session.timeouts[0] <= 0.5 and session.timeouts[2] < 0.15
+
+
+class RecordingHistory:
+    def __init__(self):
+        self.cities = []
+
+    def record(self, city, data):
+        self.cities.append(city)
+
+
+def test_sites_finishing_after_the_budget_write_nothing():
+    history = RecordingHistory()
+    results, stats = run_fleet(["Oslo", "Bergen"], workers=2, budget=0.1, client=FakeClient(delay=0.3),
+                               history=history)
+    assert stats["timed_out"] == 2
+    time.sleep(0.4)                         # let the abandoned threads finish their fetches
+    assert history.cities == []
@@ -0,0 +1,29 @@
+"""Regional grid sampling limits"""
+import itertools
+
+from meteo.grid import MAX_SPAN_DEG, MAX_TILES, TILE_DEG, BBox, GridSampler, tile_range
+
+
+class PointClient:
+    """Answers every coordinate with a flat temperature field"""
+    ttl = 600.0
+
+    def __init__(self):
+        self.calls = 0
+
+    def current_at(self, lat, lon, cache=True):
+        self.calls += 1
+        return {"cod": 200, "main": {"temp": 20.0}, "wind": {"speed": 3.0}}
+
+
+def test_widest_ui_span_fits_the_tile_cap():
+    # Aligned and unaligned centres alike
+    for lat, lon in itertools.product((0.0, 0.1, 0.25, 12.37, -33.9), (0.0, 0.2, 0.25, 72.88, -0.01)):
+        rows, cols = tile_range(BBox.around(lat, lon, MAX_SPAN_DEG))
+        assert len(rows) * len(cols) <= MAX_TILES
+    assert MAX_SPAN_DEG == 3.5 and TILE_DEG == 0.5
+
+    client = PointClient()
+    lat, lon, values, tiles, fetched = GridSampler(client).sample(BBox.around(19.07, 72.88, MAX_SPAN_DEG))
+    assert tiles == fetched <= MAX_TILES
+    assert len(values) == client.calls == tiles * 9 and (values == 20.0).all()
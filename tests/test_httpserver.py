@@ -0,0 +1,33 @@
+"""Request parsing and JSON responses of the local HTTP server"""
+import asyncio
+import json
+
+from meteo.httpserver import json_response, make_connection_handler
+
+
+async def exchange(raw: bytes, routes=None) -> bytes:
+    server = await asyncio.start_server(make_connection_handler(routes or {}), "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    try:
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(raw)
+        await writer.drain()
+        reply = await asyncio.wait_for(reader.read(), 5)
+        writer.close()
+        return reply
+    finally:
+        server.close()
+        await server.wait_closed()
+
+
+def test_invalid_content_length_is_a_bad_request():
+    for value in (b"abc", b"-5"):
+        reply = asyncio.run(exchange(b"POST /x HTTP/1.1\r\nContent-Length: " + value + b"\r\n\r\n"))
+        assert reply.startswith(b"HTTP/1.1 400 ")
+        assert b"Content-Length" in reply.split(b"\r\n\r\n", 1)[1]
+
+
+def test_non_finite_floats_are_null():
+    response = json_response({"v": float("nan"), "rows": [1.5, float("inf"), (float("-inf"),)]})
+    assert json.loads(response.body) == {"v": None, "rows": [1.5, None, [None]]}
+    assert b"NaN" not in response.body
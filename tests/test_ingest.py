@@ -0,0 +1,20 @@
+"""Bulk import of observation files into partitions"""
+import numpy as np
+
+from meteo.ingest import PartitionStore, main
+
+
+def test_city_column_without_default_city(tmp_path):
+    path = tmp_path / "history.csv"
+    path.write_text("city_name,dt,temp,humidity\n"
+                    "Oslo,1700000000,4.5,80\n"
+                    "Bergen,1700003600,6.0,91\n"
+                    ",1700007200,5.0,85\n"
+                    "Oslo,1700010800,3.9,82\n")
+
+    assert main([str(path), "--out", str(tmp_path / "parts")]) == 0
+    store = PartitionStore(str(tmp_path / "parts"))
+
+    assert sorted(store.cities()) == ["Bergen", "Oslo"]         # the row without a city is rejected
+    np.testing.assert_array_equal(store.columns("Oslo", ("dt",))["dt"], [1_700_000_000, 1_700_010_800])
+    np.testing.assert_allclose(store.columns("Bergen", ("temp",))["temp"], [6.0])
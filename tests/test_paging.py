@@ -0,0 +1,58 @@
+"""Data Explorer paging against the frames the dashboard used to build"""
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+from meteo.compact import CompactForecast
+from meteo.forecast import process_forecast
+from meteo.paging import Table, fetch_page, mask
+
+START = 1_700_000_000
+
+
+def payload(n=40):
+    return {"list": [
+        {"dt": START + i * 10800,
+         "main": {"temp": 10.0 + i % 7, "feels_like": 9.5, "humidity": 40 + i % 50, "pressure": 1010},
+         "wind": {"speed": 3.2}, "clouds": {"all": 20},
+         "weather": [{"main": ("Rain", "Clear", "Clouds")[i % 3], "description": f"desc {i % 4}"}]}
+        for i in range(n)]}
+
+
+def forecast_table(data):
+    return Table.from_record(SimpleNamespace(forecast=CompactForecast.from_payload(data)))
+
+
+def test_page_timestamps_match_process_forecast():
+    data = payload()
+    expected = process_forecast(data)
+    table = forecast_table(data)
+    keep = mask(table)
+
+    rows, cursor = [], None
+    while True:
+        page = fetch_page(table, keep, size=15, after=cursor, columns=["timestamp", "temp", "weather"])
+        rows.append(page.frame)
+        if page.next is None:
+            break
+        cursor = page.next
+    got = pd.concat(rows, ignore_index=True)
+
+    assert len(got) == len(expected)
+    np.testing.assert_array_equal(got["timestamp"].to_numpy("datetime64[s]"),
+                                  expected["timestamp"].to_numpy("datetime64[s]"))
+    np.testing.assert_allclose(got["temp"], expected["temp"])
+    assert got["weather"].tolist() == expected["weather"].tolist()
+
+
+def test_backward_page_matches_forward_page():
+    table = forecast_table(payload())
+    keep = mask(table, labels={"weather": ["Rain", "Clouds"]})
+    first = fetch_page(table, keep, "temp", True, size=5)
+    second = fetch_page(table, keep, "temp", True, size=5, after=first.next)
+    back = fetch_page(table, keep, "temp", True, size=5, before=second.prev)
+
+    assert second.start == 5
+    assert back.start == 0 and back.prev is None
+    pd.testing.assert_frame_equal(back.frame, first.frame)
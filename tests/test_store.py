@@ -0,0 +1,62 @@
+"""Forecast store ingest against the client cache"""
+import re
+import time
+
+from meteo.client import WeatherClient, payload_nbytes
+from meteo.store import ForecastStore
+
+START = 1_700_000_000
+
+
+class Response:
+    def __init__(self, payload):
+        self.payload = payload
+
+    def json(self):
+        return self.payload
+
+
+class FakeSession:
+    """Canned OpenWeather responses, counting requests per endpoint"""
+
+    def __init__(self):
+        self.calls = []
+
+    def get(self, url, timeout=None):
+        endpoint = re.search(r"/2\.5/(\w+)", url).group(1)
+        self.calls.append(endpoint)
+        if endpoint == "weather":
+            return Response({"cod": 200, "name": "Oslo", "coord": {"lat": 59.9, "lon": 10.7}, "dt": START,
+                             "timezone": 3600, "main": {"temp": 5.0, "feels_like": 3.0, "humidity": 80,
+                                                        "pressure": 1005},
+                             "wind": {"speed": 4.0}, "weather": [{"main": "Rain", "description": "rain"}]})
+        if endpoint == "forecast":
+            return Response({"cod": "200", "city": {"timezone": 3600}, "list": [
+                {"dt": START + i * 10800,
+                 "main": {"temp": 4.0 + i % 6, "feels_like": 2.0, "humidity": 75, "pressure": 1008},
+                 "wind": {"speed": 5.0}, "clouds": {"all": 90},
+                 "weather": [{"main": "Rain", "description": "light rain"}], "pop": 0.4,
+                 "dt_txt": "2023-11-14 22:13:20"}
+                for i in range(40)]})
+        return Response({"list": [{"main": {"aqi": 2}, "components": {"pm2_5": 8.0}}]})
+
+
+def test_ingest_releases_raw_forecast_and_keeps_fetch_time():
+    session = FakeSession()
+    client = WeatherClient(session=session, rate_limit=0)
+    data = client.fetch("Oslo")
+    forecast_bytes = payload_nbytes(data["forecast"])
+    time.sleep(0.05)
+
+    store = ForecastStore(client=client)
+    record = store.get("Oslo")
+    assert record.fetched_at == data["fetched_at"]          # the cached bundle's age, not ingest time
+    assert "forecast" not in client.cached("Oslo")
+    report = store.memory_report()
+    assert 0 < report.loc[0, "cached_bytes"] < forecast_bytes
+
+    # A consumer that needs the forecast again refetches it, reusing the cached current conditions
+    session.calls.clear()
+    again = client.fetch("Oslo")
+    assert session.calls == ["forecast", "air_pollution"]
+    assert len(again["forecast"]["list"]) == 40